@@ -0,0 +1,103 @@
+'''
+Compares the time needed to ingest the models computed by clingo
+during exact inference when they are converted into strings and
+parsed (str(m).split(' ')) and when their symbols are used directly
+(m.symbols(shown=True)), as done by ModelsHandler, which then
+computes the probabilities of all the worlds at once.
+Usage (from this folder):
+    python3 ingestion_benchmark.py [repetitions]
+'''
+import sys
+import time
+
+import clingo
+
+sys.path.append("../../")
+
+from pastasolver.pasta_parser import PastaParser
+from pastasolver.models_handler import ModelsHandler
+from pastasolver import utils
+
+EXAMPLES_FOLDER = "../../examples/inference/"
+
+# file, query
+PROGRAMS = [
+    ("alarm.lp", "calls(mary)"),
+    ("bird_4.lp", "fly(1)"),
+    ("bird_10.lp", "fly(1)"),
+    ("clique.lp", "in(1)"),
+    ("graph_coloring.lp", "qr"),
+    ("path.lp", "path(1,4)"),
+    ("shop.lp", "qr"),
+    ("smoke.lp", "qry"),
+    ("transmission.lp", "transmit(a,e)"),
+    ("viral_marketing_5.lp", "buy(5)")
+]
+
+
+def string_path_add_value(mh : ModelsHandler, line : str) -> None:
+    '''
+    Ingestion of a model by parsing its string representation.
+    '''
+    id_w = 0
+    probability = 1
+    model_query = False
+    for term in line.split(' '):
+        if term == "q":
+            model_query = True
+        elif term == "nq":
+            model_query = False
+        elif term in ("e", "ne"):
+            pass
+        else:
+            term, positive = utils.clean_term(term)
+            index, p, np = mh.prob_facts_index[term]
+            if positive:
+                id_w |= 1 << (mh.n_prob_facts - 1 - index)
+            probability = probability * (p if positive else np)
+    mh.manage_worlds_dict(mh.worlds_dict, id_w, probability, model_query, False)
+
+
+def enumerate_models(program : 'list[str]', prob_facts : 'dict[str,float]', use_symbols : bool) -> 'tuple[float,int]':
+    '''
+    Enumerates the projected answer sets and returns the elapsed
+    time and the number of worlds.
+    '''
+    mh = ModelsHandler(prob_facts, "")
+    start_time = time.perf_counter()
+    ctl = clingo.Control(["0", "-Wnone", "--project"])
+    for clause in program:
+        ctl.add('base', [], clause)
+    ctl.ground([("base", [])])
+    with ctl.solve(yield_=True) as handle:  # type: ignore
+        for m in handle:  # type: ignore
+            if use_symbols:
+                mh.add_value(m.symbols(shown=True))  # type: ignore
+            else:
+                string_path_add_value(mh, str(m))  # type: ignore
+        handle.get()  # type: ignore
+    if use_symbols:
+        # the probabilities of the worlds are computed at the end
+        mh.compute_worlds_probabilities()
+    return time.perf_counter() - start_time, len(mh.worlds_dict)
+
+
+if __name__ == "__main__":
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print(f"{'program':<24}{'worlds':>8}{'string (s)':>14}{'symbols (s)':>14}{'speedup':>10}")
+    for filename, query in PROGRAMS:
+        parser = PastaParser(EXAMPLES_FOLDER + filename, query)
+        parser.parse()
+        program = parser.get_asp_program()
+        times_string : 'list[float]' = []
+        times_symbols : 'list[float]' = []
+        n_worlds = 0
+        for _ in range(repetitions):
+            t, n_worlds = enumerate_models(program, parser.probabilistic_facts, False)
+            times_string.append(t)
+            t, _ = enumerate_models(program, parser.probabilistic_facts, True)
+            times_symbols.append(t)
+        best_string = min(times_string)
+        best_symbols = min(times_symbols)
+        print(f"{filename:<24}{n_worlds:>8}{best_string:>14.4f}{best_symbols:>14.4f}{best_string / best_symbols:>10.2f}")
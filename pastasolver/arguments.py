@@ -44,6 +44,12 @@ def parse_args_wrapper():
         help="Query",
         type=str, default=""
     )
+    command_parser.add_argument(
+        "--queries",
+        help="Comma separated list of queries, answered with a single\
+            enumeration (exact inference)",
+        type=str, default=""
+    )
     command_parser.add_argument(
         "-e",
         "--evidence",
@@ -82,10 +88,30 @@ def parse_args_wrapper():
         default=1000
     )
     command_parser.add_argument("--processes",
-        help="Number of processes",
+        help="Number of processes (sampling and exact inference)",
         type=int,
         default=1
     )
+    command_parser.add_argument("--target-ci-width",
+        help="Sampling without evidence and rejection sampling: stop\
+            when the confidence intervals of the lower and upper\
+            probability are tighter than this value (--samples is\
+            the maximum number of samples)",
+        type=float,
+        default=-1
+    )
+    command_parser.add_argument("--confidence",
+        help="Confidence of the intervals computed by sampling\
+            (default 0.95)",
+        type=float,
+        default=0.95
+    )
+    command_parser.add_argument("--seed",
+        help="Seed for sampling: with the same seed (and number of\
+            processes) the results are the same",
+        type=int,
+        default=None
+    )
     command_parser.add_argument(
         "--mh",
         help="Use Metropolis Hastings sampling",
@@ -155,6 +181,89 @@ def parse_args_wrapper():
         action=argparse.BooleanOptionalAction,
         default=True
     )
+    command_parser.add_argument(
+        "--slice",
+        help="Exact inference: remove the probabilistic facts that\
+            cannot influence the query and the evidence before\
+            enumerating the worlds. The independent components of\
+            the program are solved separately.",
+        action="store_true",
+        default=False
+    )
+    command_parser.add_argument(
+        "--missing-page",
+        help="With --pedantic and --stop-if-inconsistent, page of the\
+            listed worlds without answer sets (20 for each page)",
+        type=int,
+        default=1
+    )
+    command_parser.add_argument(
+        "--streaming",
+        help="Exact inference: aggregate the worlds while they are computed\
+            instead of storing them (bounded memory, no --pedantic)",
+        action="store_true",
+        default=False
+    )
+    command_parser.add_argument(
+        "--logspace",
+        help="Exact inference and MAP: accumulate the probabilities of the\
+            worlds in log-space (for programs with many probabilistic facts)",
+        action="store_true",
+        default=False
+    )
+    command_parser.add_argument(
+        "--anytime-epsilon",
+        help="Exact inference: stop when the bounds on the lower and on\
+            the upper probability are tighter than this value (anytime\
+            mode, no --pedantic)",
+        type=float,
+        default=-1
+    )
+    command_parser.add_argument(
+        "--sensitivity",
+        help="Exact inference: print also the partial derivatives of the\
+            lower and upper probability with respect to the probability\
+            of every probabilistic fact",
+        action="store_true",
+        default=False
+    )
+    command_parser.add_argument(
+        "--cache-dir",
+        help="Exact inference, MAP and optimization: directory where the\
+            worlds are stored, to skip the enumeration when the same\
+            program is solved again (not used with --streaming)",
+        type=str,
+        default=""
+    )
+    command_parser.add_argument(
+        "--threads",
+        help="Number of threads for clingo (--parallel-mode), not used\
+            with --streaming",
+        type=int,
+        default=1
+    )
+    command_parser.add_argument(
+        "--solver-configuration",
+        help="Configuration portfolio for clingo (for example tweety,\
+            trendy, frumpy, crafty, jumpy, handy, many), overrides the\
+            default one of the task and the one selected by --autotune",
+        type=str,
+        default=""
+    )
+    command_parser.add_argument(
+        "--solver-arguments",
+        help="Other options for clingo, separated by spaces (for example\
+            \"--heuristic=Vsids --restarts=L,100\")",
+        type=str,
+        default=""
+    )
+    command_parser.add_argument(
+        "--autotune",
+        help="Select the clingo configuration of the task by timing\
+            some candidates on the program",
+        action="store_true",
+        default=False
+    )
     command_parser.add_argument(
         "--solver",
         help="Uses an ASP solver for the task",
@@ -199,11 +308,26 @@ def parse_args_wrapper():
     )
     command_parser.add_argument(
         "--test",
-        help="Check the consistency by sampling: 1 stops when an\
-            inconsistent world is found, 0 keeps sampling.",
+        help="Check the consistency with the solver: 1 stops when an\
+            inconsistent world is found, 0 looks for all of them.",
         type = int,
         choices=range(0,2)
     )
+    command_parser.add_argument(
+        "--p-inconsistent",
+        help="Compute the probability of the worlds without answer sets\
+            (and the normalizing factor) with the solver or, with\
+            --approximate, by sampling.",
+        action="store_true",
+        default=False
+    )
+    command_parser.add_argument(
+        "--test-sampling",
+        help="With --test, check the consistency by sampling --samples\
+            worlds instead of with the solver.",
+        action="store_true",
+        default=False
+    )
     command_parser.add_argument(
         "--uxor",
         help="Check the consistency by XOR sampling.",
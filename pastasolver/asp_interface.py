@@ -2,35 +2,47 @@
 
 import clingo
 import math
-import random
+import numpy as np
+import statistics
 import time
 
+from typing import Callable, Iterator
+
 from . import utils
-from .continuous_cdfs import take_sample, evaluate_sample
+from . import world_probabilities
+from . import worlds_cache
+from .compiled_query import CompiledQuery
+from .continuous_cdfs import take_samples, evaluate_sample, evaluate_samples
 from .generator import ComparisonPredicate
-from .models_handler import ModelsHandler
+from .models_handler import ModelsHandler, QUERY_SYMBOL
 from .optimizable import compute_optimal_probability
 from .reducible import reduce_pasp_up
+from .shared_worlds import SharedWorldsCache
+from .solver_config import SolverConfig, ENUMERATION_TASK, OPTIMIZATION_TASK
 
-def reconstruct_atom(atm) -> str:  # type: ignore
-    '''
-    Reconstructs a probabilistic fact from a clingo representation
-    of its. This is needed since a(1) is stored as a with 1 argument
-    and not as a(1) (string)
-    '''
-    s = f"{atm.symbol.name}("  # type: ignore
-    for arg in atm.symbol.arguments:  # type: ignore
-        s = s + str(arg) + ","  # type: ignore
-    if s[len(s) - 1] == '(':
-        return s[:-1]
-    return s[:-1] + ')'
+# anytime exact inference: number of worlds computed between two
+# checks of the bounds
+ANYTIME_CHECK_WORLDS = 256
+
+# number of worlds sampled at once (see sample_worlds)
+SAMPLES_BATCH_SIZE = 10000
+
+# adaptive sampling: number of samples taken between two checks of
+# the confidence intervals
+CI_CHECK_SAMPLES = 1000
 
+# number of worlds without answer sets listed in the pedantic report
+MISSING_WORLDS_PAGE_SIZE = 20
 
-def pick_random_index(block : int, w_id : str) -> 'list[int]':
+# atoms marking the query and the evidence in the approximate encoding
+QE_SYMBOL = clingo.Function("qe")
+NQE_SYMBOL = clingo.Function("nqe")
+
+def pick_random_index(block : int, w_id : str, rng : np.random.Generator) -> 'list[int]':
     '''
     Pick a random index, used in Gibbs sampling.
     '''
-    return sorted(set([random.randint(0, len(w_id) - 1) for _ in range(0, block)]))
+    return sorted(set(rng.integers(0, len(w_id), block).tolist()))
 
 
 def compute_conditional_lp_up(
@@ -60,6 +72,63 @@ def compute_conditional_lp_up(
     return lp, up
 
 
+def subtract_cube(cube : str, other : str) -> 'list[str]':
+    '''
+    Returns disjoint cubes (strings with T, F or - for every fact)
+    covering the worlds of cube that are not in other.
+    '''
+    if any(a != '-' and b != '-' and a != b for a, b in zip(cube, other)):
+        return [cube]
+    res : 'list[str]' = []
+    current = list(cube)
+    for i, (a, b) in enumerate(zip(cube, other)):
+        if a == '-' and b != '-':
+            res.append("".join(current[:i]) + ('F' if b == 'T' else 'T') + "".join(current[i + 1:]))
+            current[i] = b
+    return res
+
+
+def wilson_interval(successes : int, n : int, confidence : float = 0.95) -> 'tuple[float,float]':
+    '''
+    Wilson score interval for the probability of success estimated
+    with n samples.
+    '''
+    if n == 0:
+        return 0, 1
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / n
+    center = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+    half_width = z * math.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / (1 + z**2 / n)
+    return max(0, center - half_width), min(1, center + half_width)
+
+
+def get_lp_up_from_counts(counts : 'tuple[int,int,int,int]') -> 'tuple[float,float]':
+    '''
+    Computes the lower and upper probability from the counts returned
+    by the samplers: the samples where the lower probability is 1 and
+    the samples considered for it, and the same for the upper.
+    '''
+    n_lower, n_lower_trials, n_upper, n_upper_trials = counts
+    lp = n_lower / n_lower_trials if n_lower_trials > 0 else 0
+    up = n_upper / n_upper_trials if n_upper_trials > 0 else 0
+    return lp, up
+
+
+def get_lp_up_intervals(
+    counts : 'tuple[int,int,int,int]',
+    confidence : float = 0.95
+    ) -> 'tuple[tuple[float,float],tuple[float,float]]':
+    '''
+    Computes the Wilson intervals of the lower and upper probability
+    from the counts returned by the samplers (see
+    get_lp_up_from_counts). With evidence, the samples considered
+    are the ones contributing to the denominators of
+    compute_conditional_lp_up, so the intervals are approximate.
+    '''
+    n_lower, n_lower_trials, n_upper, n_upper_trials = counts
+    return wilson_interval(n_lower, n_lower_trials, confidence), wilson_interval(n_upper, n_upper_trials, confidence)
+
+
 class AspInterface:
     '''
     Parameters:
@@ -86,7 +155,12 @@ class AspInterface:
         continuous_facts : 'dict[str,tuple[str,float,float]]' = {},
         # objective_function : str = "", # for the optimizable task
         optimizable_facts : 'dict[str,tuple[float,float]]' = {}, # for the optimizable task
-        reducible_facts : 'dict[str,float]' = {} # for the reducible task
+        reducible_facts : 'dict[str,float]' = {}, # for the reducible task
+        streaming : bool = False,
+        logspace : bool = False,
+        solver_config : 'SolverConfig|None' = None,
+        cache_dir : str = "",
+        seed : 'int|None' = None
         ) -> None:
         self.cautious_consequences : 'list[str]' = []
         self.program_minimal_set : 'list[str]' = sorted(set(program_minimal_set))
@@ -107,6 +181,8 @@ class AspInterface:
         self.stop_if_inconsistent : bool = stop_if_inconsistent
         self.normalize_prob : bool = normalize_prob
         self.normalizing_factor : float = 1
+        # probability of the worlds with at least one answer set
+        self.consistent_prob : float = 1
         self.xor: bool = xor
         self.decision_atoms_selected : 'list[str]' = []
         self.utility : 'list[float]' = [-math.inf,-math.inf]
@@ -121,6 +197,42 @@ class AspInterface:
         # self.objective_function : str = objective_function
         self.optimizable_facts : 'dict[str,tuple[float,float]]' = optimizable_facts
         self.reducible_facts : 'dict[str,float]' = reducible_facts
+        # aggregate the worlds while they are enumerated, without
+        # storing them (not compatible with pedantic mode)
+        self.streaming : bool = streaming and not pedantic
+        # accumulate the probabilities in log-space (exact inference and MAP)
+        self.logspace : bool = logspace
+        # used by PastaSession: the program is grounded once in this
+        # control and the rules for every (query, evidence) pair are
+        # added as a program part, activated by an external atom
+        self.session_ctl : 'clingo.Control|None' = None
+        self.session_queries : 'dict[tuple[str,str],int]' = {}
+        # threads, configuration and options for clingo
+        self.solver_config : SolverConfig = solver_config if solver_config is not None else SolverConfig()
+        # directory of the on-disk cache of the worlds (exact inference,
+        # not used with streaming and sessions)
+        self.cache_dir : str = cache_dir
+        # key of the program in the cache (see get_cache_key)
+        self.cache_key : str = ""
+        # anytime exact inference (streaming): stop the enumeration when
+        # the bounds on the lower and upper probability are tighter
+        # than anytime_epsilon (-1: compute the exact values)
+        self.anytime_epsilon : float = -1
+        self.anytime_bounds : 'tuple[tuple[float,float],tuple[float,float]]' = ((0, 0), (0, 0))
+        # page of the worlds without answer sets listed in pedantic mode
+        self.missing_worlds_page : int = 1
+        # random generator for sampling: with the same seed the
+        # sampled worlds are the same (see set_seed)
+        self.rng : np.random.Generator = np.random.default_rng(seed)
+        # adaptive sampling (sample_query_counts and
+        # rejection_sampling_counts): stop when the confidence
+        # intervals of the lower and upper probability are tighter
+        # than target_ci_width (-1: take all the samples)
+        self.target_ci_width : float = -1
+        self.confidence : float = 0.95
+        # results of the sampled worlds shared by the sampling
+        # processes (see approximate_solve)
+        self.shared_cache : 'SharedWorldsCache|None' = None
 
         self.model_handler : ModelsHandler = \
             ModelsHandler(
@@ -128,7 +240,8 @@ class AspInterface:
                 self.evidence,
                 self.abducibles_list,
                 self.decision_atoms_list,
-                self.utilities_dict
+                self.utilities_dict,
+                logspace
             )
 
     def init_clingo_ctl(self, clingo_arguments : 'list[str]', clauses : 'list[str]' = []) -> 'clingo.Control':
@@ -168,67 +281,166 @@ class AspInterface:
                 self.cautious_consequences.append(el)
 
 
-    def compute_probabilities(self) -> None:
+    def get_exact_inference_setup(self) -> 'tuple[list[str],list[str]]':
         '''
-        Computes the lower and upper bound for the query
+        Returns the clingo arguments and the clauses for exact inference
+        with projected answer set enumeration.
         '''
         clingo_arguments : 'list[str]' = ["0","-Wnone"]
         clingo_arguments.append("--project")
-        clauses = self.asp_program
+        if self.streaming:
+            clingo_arguments.extend(["--heuristic=Domain", "--enum-mode=bt"])
+        clauses = self.get_exact_inference_clauses()
+
+        # the streaming mode needs the models of a world in sequence
+        clingo_arguments = self.solver_config.get_arguments(ENUMERATION_TASK, clingo_arguments, clauses, sequential=self.streaming)
+
+        return clingo_arguments, clauses
+
+
+    def get_exact_inference_clauses(self) -> 'list[str]':
+        '''
+        Returns the clauses for exact inference (without selecting the
+        clingo arguments, that may run the auto-tuner).
+        '''
+        clauses = list(self.asp_program)
         for c in self.cautious_consequences:
             clauses.append(f':- not {c}.')
 
-        ctl = self.init_clingo_ctl(clingo_arguments, clauses)
+        if self.streaming:
+            # the probabilistic facts are decided first and the models are
+            # enumerated by backtracking (see get_exact_inference_setup),
+            # so the models of the same world are computed consecutively
+            if self.anytime_epsilon > 0:
+                # the facts are assigned to their most likely value and
+                # the ones with probability closer to 0.5 are decided last,
+                # so they are the first to be flipped by backtracking:
+                # the most probable worlds are computed first
+                ranked = sorted(self.prob_facts_dict, key=lambda fact: abs(self.prob_facts_dict[fact] - 0.5))
+                clauses = clauses + [f"#heuristic {fact}. [{level + 1},level]" for level, fact in enumerate(ranked)]
+                clauses = clauses + [f"#heuristic {fact}. [{1 if prob >= 0.5 else -1},sign]" for fact, prob in self.prob_facts_dict.items()]
+            else:
+                clauses = clauses + [f"#heuristic {fact}. [1,level]" for fact in self.prob_facts_dict]
+
+        return clauses
 
-        with ctl.solve(yield_=True) as handle:  # type: ignore
-            for m in handle:  # type: ignore
-                self.model_handler.add_value(str(m))  # type: ignore
-                self.computed_models = self.computed_models + 1
-            handle.get()   # type: ignore
 
+    def init_session(self) -> None:
+        '''
+        Grounds the program (without query and evidence) once, to
+        answer multiple queries with compute_probabilities_session.
+        '''
+        clingo_arguments, clauses = self.get_exact_inference_setup()
+        self.session_ctl = self.init_clingo_ctl(clingo_arguments, clauses)
+        self.check_reserved_atoms(self.session_ctl)
+
+
+    def check_reserved_atoms(self, ctl : clingo.Control) -> None:
+        '''
+        Checks that the grounded program does not contain the atoms
+        q/1, nq/1, e/1, and ne/1, used to mark the queries when they
+        are added after the grounding of the program.
+        '''
+        for name in ["q", "nq", "e", "ne"]:
+            if any(True for _ in ctl.symbolic_atoms.by_signature(name, 1)):
+                utils.print_error_and_exit(f"Cannot use {name}/1 in the program when asking more queries.")
+
+
+    def compute_probabilities_session(self, query : str, evidence : str = "") -> None:
+        '''
+        Computes the lower and upper bound for the query in the
+        session: the rules for the query and the evidence are grounded
+        only the first time the pair is asked and are then switched on
+        and off with the external atom active_query(index).
+        '''
+        if self.session_ctl is None:
+            self.init_session()
+        ctl : clingo.Control = self.session_ctl # type: ignore
+
+        if (query, evidence) not in self.session_queries:
+            index = len(self.session_queries)
+            active = f"active_query({index})"
+            part = [
+                f"#external {active}.",
+                f"q({index}):- {active}, {query}.",
+                f"nq({index}):- {active}, not {query}.",
+                "#show q/1.",
+                "#show nq/1."
+            ]
+            if evidence:
+                part.extend([
+                    f"e({index}):- {active}, {evidence}.",
+                    f"ne({index}):- {active}, not {evidence}.",
+                    "#show e/1.",
+                    "#show ne/1."
+                ])
+            try:
+                ctl.add(f"query_{index}", [], '\n'.join(part))
+                ctl.ground([(f"query_{index}", [])])
+            except RuntimeError:
+                utils.print_error_and_exit('Syntax error, parsing failed.')
+            self.session_queries[(query, evidence)] = index
+
+        index = self.session_queries[(query, evidence)]
+        index_symbol = [clingo.Number(index)]
+        self.evidence = evidence
+        self.computed_models = 0
+        self.model_handler = ModelsHandler(
+            self.prob_facts_dict,
+            evidence,
+            logspace=self.logspace,
+            query_symbols=(
+                clingo.Function("q", index_symbol),
+                clingo.Function("nq", index_symbol),
+                clingo.Function("e", index_symbol),
+                clingo.Function("ne", index_symbol)
+            )
+        )
+
+        active_symbol = clingo.Function("active_query", index_symbol)
+        ctl.assign_external(active_symbol, True)
+        try:
+            self.compute_probabilities()
+        finally:
+            ctl.assign_external(active_symbol, False)
+
+
+    def check_computed_worlds(self, n_worlds : int) -> bool:
+        '''
+        Checks whether all the worlds have at least one answer set and
+        sets the probability of the consistent worlds and the
+        normalizing factor. Returns False if no world has an answer
+        set.
+        '''
         self.normalizing_factor = 1
+        self.consistent_prob = 1
         # print(self.model_handler.worlds_dict)
 
-        if len(self.model_handler.worlds_dict) != 2**len(self.prob_facts_dict):
-            if len(self.model_handler.worlds_dict) == 0 and len(self.prob_facts_dict) > 0:
+        if n_worlds != 2**len(self.prob_facts_dict):
+            if n_worlds == 0 and len(self.prob_facts_dict) > 0:
                 self.lower_probability_query = 0
                 self.upper_probability_query = 0
+                self.consistent_prob = 0
                 utils.print_pathological_program()
-                return
+                return False
 
-            missing = []
             if self.pedantic:
-                ks = sorted(self.model_handler.worlds_dict.keys())
-                l : 'list[int]' = []
-                for el in ks:
-                    if el != '':
-                        l.append(int(el,2))
-                missing = sorted(set(range(0, 2**len(self.prob_facts_dict))).difference(l), key=lambda x: bin(x)[2:].count('1'))
-
                 ntw = len(self.model_handler.worlds_dict) + 2**(len(self.prob_facts_dict) - len(self.cautious_consequences))
                 nw = 2**len(self.prob_facts_dict)
 
                 # TODO: check this case
                 if len(self.cautious_consequences) > 0 and (ntw != nw) and not self.xor and not self.upper:
                     utils.print_inconsistent_program(self.stop_if_inconsistent)
-            
+
+            norm_fact = self.model_handler.get_computed_worlds_prob()
+            self.consistent_prob = norm_fact
+
             if self.stop_if_inconsistent and not self.normalize_prob and len(self.prob_facts_dict) > 0:
-                res = ""
-                for el in missing:
-                    s = "0"*(len(self.prob_facts_dict) - len(bin(el)[2:])) + bin(el)[2:]
-                    i = 0
-                    res = res + s + "{ "
-                    for el in self.prob_facts_dict:
-                        if s[i] == '1':
-                            res += el + " "
-                        i = i + 1
-                    res += "}\n"
+                n_missing = 2**len(self.prob_facts_dict) - n_worlds
                 if self.pedantic:
-                    utils.print_error_and_exit(f"Found {len(missing)} worlds without answer sets: {missing}\n{res[:-1]}.")
+                    utils.print_error_and_exit(self.get_missing_worlds_report(n_missing, 1 - norm_fact))
                 else:
-                    utils.print_error_and_exit(f"Found {2**len(self.prob_facts_dict) - len(self.model_handler.worlds_dict)} worlds without answer sets.")
-
-            norm_fact = sum([x.prob for x in self.model_handler.worlds_dict.values()])
+                    utils.print_error_and_exit(f"Found {n_missing} worlds without answer sets.")
             
             if self.normalize_prob:
                 self.normalizing_factor = norm_fact
@@ -241,6 +453,157 @@ class AspInterface:
                 elif not self.stop_if_inconsistent:
                     print(f"P(inc) = {1 - norm_fact}")
 
+        return True
+
+
+    def get_missing_worlds_report(self, n_missing : int, missing_prob : float) -> str:
+        '''
+        Describes the worlds without answer sets: their number and
+        probability, and one page (missing_worlds_page) of witnesses.
+        '''
+        n_facts = len(self.prob_facts_dict)
+        offset = (self.missing_worlds_page - 1) * MISSING_WORLDS_PAGE_SIZE
+        witnesses = self.model_handler.get_missing_worlds(offset, MISSING_WORLDS_PAGE_SIZE)
+        probs = world_probabilities.ids_probabilities(witnesses, list(self.prob_facts_dict.values())).tolist() if witnesses else []
+
+        lines = [f"Found {n_missing} worlds without answer sets (probability {missing_prob})."]
+        if witnesses:
+            lines.append(f"Worlds {offset + 1}-{offset + len(witnesses)} of {n_missing} (page {self.missing_worlds_page}):")
+        for w_id, prob in zip(witnesses, probs):
+            true_facts = [fact for fact, value in zip(self.prob_facts_dict, utils.world_id_to_str(w_id, n_facts)) if value == '1']
+            lines.append(f"{utils.world_id_to_str(w_id, n_facts)} {{ {' '.join(true_facts)} }} {prob}")
+        if offset + len(witnesses) < n_missing:
+            lines.append(f"Use --missing-page {self.missing_worlds_page + 1} for the next worlds.")
+        return '\n'.join(lines)
+
+
+    def compute_probabilities(self, aggregate_cached : bool = False) -> None:
+        '''
+        Computes the lower and upper bound for the query.
+        If aggregate_cached, the worlds loaded from the cache are only
+        aggregated (see load_cached_worlds): use it only when the
+        worlds are not needed after the probabilities are computed.
+        '''
+        if self.load_cached_worlds(aggregate_cached):
+            self.compute_probabilities_from_worlds()
+            return
+
+        if self.session_ctl is not None:
+            ctl = self.session_ctl
+        else:
+            clingo_arguments, clauses = self.get_exact_inference_setup()
+            ctl = self.init_clingo_ctl(clingo_arguments, clauses)
+
+        if self.streaming:
+            self.model_handler.k_credal = self.k_credal
+
+        if not self.enumerate_worlds(ctl):
+            # anytime mode, the enumeration was stopped
+            self.anytime_bounds = self.model_handler.get_anytime_bounds()
+            self.lower_probability_query = self.anytime_bounds[0][0]
+            self.upper_probability_query = self.anytime_bounds[1][1]
+            return
+        self.store_cached_worlds()
+        self.compute_probabilities_from_worlds()
+        lp, up = self.lower_probability_query, self.upper_probability_query
+        self.anytime_bounds = ((lp, lp), (up, up))
+
+
+    def get_cache_key(self) -> str:
+        '''
+        Returns the key of the program for the cache of the worlds,
+        computed only once (both to load and to store the worlds).
+        '''
+        if not self.cache_key:
+            clauses = self.get_exact_inference_clauses()
+            self.cache_key = worlds_cache.get_key(sorted(set(clauses)), list(self.prob_facts_dict), self.evidence)
+        return self.cache_key
+
+
+    def load_cached_worlds(self, aggregate_cached : bool = False) -> bool:
+        '''
+        Loads the worlds from the cache into the models handler,
+        if present. Returns True if the worlds were loaded.
+        If aggregate_cached, the worlds are aggregated into the lower
+        and upper probability without storing them in worlds_dict,
+        except in pedantic mode, where they are listed: the other
+        tasks (MAP, compilation, optimization) need the worlds.
+        '''
+        if not self.cache_dir or self.streaming or self.session_ctl is not None:
+            return False
+        cached = worlds_cache.load_worlds(self.cache_dir, self.get_cache_key())
+        if cached is None:
+            return False
+        ids, counts, self.computed_models = cached
+        if self.pedantic or not aggregate_cached:
+            self.model_handler.worlds_dict = worlds_cache.to_worlds_dict(ids, counts)
+        else:
+            self.model_handler.k_credal = self.k_credal
+            self.model_handler.add_cached_worlds(ids, counts)
+        if self.verbose:
+            print(f"Loaded {ids.shape[0]} worlds from the cache")
+        return True
+
+
+    def store_cached_worlds(self) -> None:
+        '''
+        Stores the worlds of the models handler in the cache.
+        '''
+        if not self.cache_dir or self.streaming or self.session_ctl is not None:
+            return
+        worlds_cache.store_worlds(
+            self.cache_dir,
+            self.get_cache_key(),
+            self.model_handler.worlds_dict,
+            len(self.prob_facts_dict),
+            self.computed_models
+        )
+
+
+    def enumerate_worlds(self, ctl : clingo.Control, assumptions : 'list[tuple[clingo.Symbol,bool]]' = []) -> bool:
+        '''
+        Enumerates the answer sets and stores (or aggregates, if
+        streaming) the worlds into the models handler.
+        Returns False if the enumeration is stopped since the anytime
+        bounds are tight enough: the world currently computed is
+        discarded, since some of its models may be missing.
+        '''
+        anytime = self.streaming and self.anytime_epsilon > 0
+        with ctl.solve(yield_=True, assumptions=assumptions) as handle:  # type: ignore
+            for m in handle:  # type: ignore
+                if self.streaming:
+                    self.model_handler.add_value_streaming(m.symbols(shown=True))  # type: ignore
+                else:
+                    self.model_handler.add_value(m.symbols(shown=True))  # type: ignore
+                self.computed_models = self.computed_models + 1
+                if anytime and len(self.model_handler.streamed_worlds_buffer) >= ANYTIME_CHECK_WORLDS:
+                    self.model_handler.flush_streamed_worlds()
+                    (lp_min, lp_max), (up_min, up_max) = self.model_handler.get_anytime_bounds()
+                    if lp_max - lp_min < self.anytime_epsilon and up_max - up_min < self.anytime_epsilon:
+                        if self.verbose:
+                            print(f"Enumeration stopped after {self.model_handler.n_streamed_worlds} worlds")
+                        return False
+            handle.get()   # type: ignore
+        return True
+
+
+    def compute_probabilities_from_worlds(self) -> None:
+        '''
+        Computes the lower and upper bound for the query from the
+        worlds collected in the models handler.
+        '''
+        if self.streaming:
+            self.model_handler.close_streaming()
+            n_worlds = self.model_handler.n_streamed_worlds
+        else:
+            self.model_handler.compute_worlds_probabilities()
+            # the worlds loaded from the cache are aggregated as the
+            # streamed ones
+            n_worlds = len(self.model_handler.worlds_dict) + self.model_handler.n_streamed_worlds
+
+        if not self.check_computed_worlds(n_worlds):
+            return
+
         if self.pedantic:
             print(utils.RED + "lp" + utils.END + utils.YELLOW + " up" + utils.END)
             for el in self.prob_facts_dict:
@@ -249,16 +612,17 @@ class AspInterface:
             for el in self.prob_facts_dict:
                 print(el, end="\t")
             print("#pf", end="\t")
+            prob_header = "Log-probability" if self.logspace else "Probability"
             if not self.evidence:
-                print("LP/UP\tProbability")
+                print(f"LP/UP\t{prob_header}")
             else:
-                print("Probability")
+                print(prob_header)
             lp_count = 0
             up_count = 0
-            for el in sorted(self.model_handler.worlds_dict, key= lambda x: x.count('1')):
-                for val in el:
+            for el in sorted(self.model_handler.worlds_dict, key= lambda x: bin(x).count('1')):
+                for val in utils.world_id_to_str(el, len(self.prob_facts_dict)):
                     print(f"{val}", end="\t")
-                print(f"{el.count('1')}", end="\t")
+                print(f"{bin(el).count('1')}", end="\t")
                 if not self.evidence:
                     if self.model_handler.worlds_dict[el].model_query_count > 0 and \
                         self.model_handler.worlds_dict[el].model_not_query_count == 0:
@@ -280,14 +644,139 @@ class AspInterface:
             if not self.evidence:
                 print(f"Only LP: {lp_count}, Only UP: {up_count}")
         
-        self.lower_probability_query, self.upper_probability_query = self.model_handler.compute_lower_upper_probability(self.k_credal)
+        self.lower_probability_query, self.upper_probability_query = self.normalize_lower_upper(
+            *self.model_handler.compute_lower_upper_probability(self.k_credal))
+
+
+    def select_splitting_facts(self, n_facts : int) -> 'list[str]':
+        '''
+        Selects the n_facts probabilistic facts used to split the
+        worlds among the processes: the ones that occur in more rules
+        of the ground program.
+        '''
+        occurrences : 'dict[int,int]' = {}
+
+        class OccurrencesObserver:
+            '''
+            Counts the occurrences of the literals in the ground rules.
+            '''
+            def rule(self, choice : bool, head : 'list[int]', body : 'list[int]') -> None:
+                for lit in body:
+                    occurrences[abs(lit)] = occurrences.get(abs(lit), 0) + 1
+
+            def weight_rule(self, choice : bool, head : 'list[int]', lower_bound : int, body : 'list[tuple[int,int]]') -> None:
+                for lit, _ in body:
+                    occurrences[abs(lit)] = occurrences.get(abs(lit), 0) + 1
+
+        clingo_arguments, clauses = self.get_exact_inference_setup()
+        ctl = clingo.Control(clingo_arguments)
+        ctl.register_observer(OccurrencesObserver())
+        try:
+            for clause in clauses:
+                ctl.add('base', [], clause)
+            ctl.ground([("base", [])])
+        except RuntimeError:
+            utils.print_error_and_exit('Syntax error, parsing failed.')
+
+        candidates : 'list[tuple[int,str]]' = []
+        for fact in self.prob_facts_dict:
+            atom = ctl.symbolic_atoms[clingo.parse_term(fact)]
+            # facts simplified away by the grounder cannot be assumed
+            if atom is not None and not atom.is_fact:
+                candidates.append((occurrences.get(atom.literal, 0), fact))
+
+        # stable sort: with the same count, keep the order of the program
+        candidates.sort(key=lambda x: x[0], reverse=True)
+        return [fact for _, fact in candidates[:n_facts]]
+
+
+    def get_cubes(self, n_processes : int) -> 'list[list[tuple[str,bool]]]':
+        '''
+        Splits the worlds into disjoint cubes, each one fixing the truth
+        value of some probabilistic facts. There are (about) four cubes
+        for every process, to balance the load.
+        '''
+        n_facts = min(len(self.prob_facts_dict), math.ceil(math.log2(n_processes)) + 2)
+        splitting_facts = self.select_splitting_facts(n_facts)
+        n_splitting = len(splitting_facts)
+        cubes : 'list[list[tuple[str,bool]]]' = []
+        for cube_id in range(2**n_splitting):
+            cubes.append([(fact, (cube_id >> (n_splitting - 1 - i)) & 1 == 1) for i, fact in enumerate(splitting_facts)])
+        return cubes
+
+
+    def compute_probabilities_cube(self, cube : 'list[tuple[str,bool]]') -> 'tuple[int,ModelsHandler]':
+        '''
+        Enumerates the worlds of a cube (run by a worker process).
+        Returns the number of computed models and the models handler
+        with the worlds (or their aggregates, if streaming).
+        '''
+        clingo_arguments, clauses = self.get_exact_inference_setup()
+        ctl = self.init_clingo_ctl(clingo_arguments, clauses)
+        if self.streaming:
+            self.model_handler.k_credal = self.k_credal
+        self.enumerate_worlds(ctl, [(clingo.parse_term(fact), value) for fact, value in cube])
+        if self.streaming:
+            self.model_handler.close_streaming()
+        return self.computed_models, self.model_handler
+
+
+    def merge_cubes(self, results : 'list[tuple[int,ModelsHandler]]') -> None:
+        '''
+        Merges the worlds computed by the processes (see
+        compute_probabilities_cube) and computes the lower and
+        upper bound for the query.
+        '''
+        for computed_models, cube_handler in results:
+            self.computed_models += computed_models
+            self.model_handler.merge(cube_handler)
+        self.store_cached_worlds()
+        self.compute_probabilities_from_worlds()
+
+
+    def normalize_lower_upper(self, lp : float, up : float) -> 'tuple[float,float]':
+        '''
+        Divides the lower and upper probability by the normalizing factor.
+        '''
         if self.normalizing_factor == 0:
-            self.lower_probability_query = 1
-            self.upper_probability_query = 1
             # utils.print_warning("No worlds have > 1 answer sets")
-        else:
-            self.lower_probability_query = self.lower_probability_query / self.normalizing_factor
-            self.upper_probability_query = self.upper_probability_query / self.normalizing_factor
+            return 1, 1
+        return lp / self.normalizing_factor, up / self.normalizing_factor
+
+
+    def compute_probabilities_many(self, queries : 'list[str]') -> 'list[tuple[float,float]]':
+        '''
+        Computes the lower and upper bound for all the queries with a
+        single enumeration: the i-th query is marked by q(i) and, for
+        every world, ModelsHandler keeps which queries are true in some
+        or all the answer sets.
+        '''
+        clingo_arguments, clauses = self.get_exact_inference_setup()
+        ctl = self.init_clingo_ctl(clingo_arguments, clauses)
+        self.check_reserved_atoms(ctl)
+
+        rules : 'list[str]' = [f"q({index}):- {query}." for index, query in enumerate(queries)]
+        rules.append("#show q/1.")
+        if self.evidence:
+            rules.extend([f"e:- {self.evidence}.", "#show e/0.", f"ne:- not {self.evidence}.", "#show ne/0."])
+        try:
+            ctl.add("queries", [], '\n'.join(rules))
+            ctl.ground([("queries", [])])
+        except RuntimeError:
+            utils.print_error_and_exit('Syntax error, parsing failed.')
+
+        self.model_handler.init_queries(len(queries))
+        with ctl.solve(yield_=True) as handle:  # type: ignore
+            for m in handle:  # type: ignore
+                self.model_handler.add_value_queries(m.symbols(shown=True))  # type: ignore
+                self.computed_models = self.computed_models + 1
+            handle.get()   # type: ignore
+
+        self.model_handler.compute_worlds_probabilities()
+        if not self.check_computed_worlds(len(self.model_handler.worlds_dict)):
+            return [(0, 0)] * len(queries)
+
+        return [self.normalize_lower_upper(lp, up) for lp, up in self.model_handler.compute_lower_upper_probabilities_queries()]
 
 
     def compute_mpe_asp_solver(self, one : bool = False) -> 'tuple[str,bool]':
@@ -295,7 +784,9 @@ class AspInterface:
         Computes the upper MPE state by using an ASP solver.
         Assumes that every world has at least one answer set.
         '''
-        ctl = self.init_clingo_ctl(["-Wnone","--opt-mode=opt","--models=0", "--output-debug=none"])
+        clingo_arguments = self.solver_config.get_arguments(
+            OPTIMIZATION_TASK, ["-Wnone","--opt-mode=opt","--models=0", "--output-debug=none"], self.asp_program)
+        ctl = self.init_clingo_ctl(clingo_arguments)
         opt : str = " "
         unsat : bool = True
         with ctl.solve(yield_=True) as handle:  # type: ignore
@@ -307,6 +798,29 @@ class AspInterface:
         return opt, unsat
 
 
+    def get_shared_cache_stats(self) -> 'tuple[int,int]':
+        '''
+        Returns the lookups and hits of the shared cache in this
+        process.
+        '''
+        if self.shared_cache is None:
+            return 0, 0
+        return self.shared_cache.lookups, self.shared_cache.hits
+
+
+    def set_seed(self, seed : 'np.random.SeedSequence|None') -> None:
+        '''
+        Sets the generator of a sampling process. The interface is
+        copied in every process with the state of its generator, so
+        every process needs its own seed, spawned from the one of
+        the solver: the processes sample independent streams and,
+        with the same seed, always the same worlds.
+        If seed is None, the generator is left unchanged.
+        '''
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+
+
     def sample_world(self, randomly : bool = False) -> 'tuple[dict[str,bool],str]':
         '''
         Samples a world for approximate probability computation.
@@ -317,7 +831,7 @@ class AspInterface:
         # sample a value for continuous facts
         samples_continuous : dict[str,float] = {}
         for el in self.continuous_facts:
-            samples_continuous[el] = take_sample(self.continuous_facts[el])
+            samples_continuous[el] = float(take_samples(self.continuous_facts[el], 1, self.rng)[0])
         
         for key in self.prob_facts_dict:
             possibly_continuous_fact = key.split('_')[0] 
@@ -337,7 +851,7 @@ class AspInterface:
                     w_id_key = w_id_key + "F"
             else:
                 comp = 0.5 if randomly else self.prob_facts_dict[key]
-                if random.random() < comp:
+                if self.rng.random() < comp:
                     w_id[key] = True
                     w_id_key = w_id_key + "T"
                 else:
@@ -347,6 +861,31 @@ class AspInterface:
         return w_id, w_id_key
 
 
+    def sample_worlds(self, n_samples : int, randomly : bool = False) -> 'Iterator[tuple[str,int]]':
+        '''
+        Samples n_samples worlds (as sample_world) in batches of
+        SAMPLES_BATCH_SIZE: every batch is drawn as a boolean matrix
+        with a row for every sample and a column for every fact.
+        Yields the distinct worlds of every batch, as strings with T or
+        F for every fact, and their number of occurrences.
+        '''
+        probs = np.array([0.5 if randomly else prob for prob in self.prob_facts_dict.values()])
+        # facts obtained from comparison predicates on continuous facts
+        comparisons = [(i, key, key.split('_')[0]) for i, key in enumerate(self.prob_facts_dict) if key.split('_')[0] in self.continuous_facts]
+
+        for start in range(0, n_samples, SAMPLES_BATCH_SIZE):
+            batch_size = min(SAMPLES_BATCH_SIZE, n_samples - start)
+            worlds = self.rng.random((batch_size, len(probs))) < probs
+            samples_continuous = {var: take_samples(self.continuous_facts[var], batch_size, self.rng) for var in self.continuous_facts}
+            for i, key, var in comparisons:
+                worlds[:, i] = evaluate_samples(samples_continuous[var], key)
+
+            distinct_worlds, counts = np.unique(worlds, axis=0, return_counts=True)
+            chars = np.where(distinct_worlds, ord('T'), ord('F')).astype(np.uint8)
+            for w_chars, count in zip(chars, counts.tolist()):
+                yield w_chars.tobytes().decode(), count
+
+
     def resample(self, i : int) -> 'tuple[str,str]':
         '''
         Resamples a fact. Used in Gibbs sampling.
@@ -358,21 +897,43 @@ class AspInterface:
             if i < 0:
                 break
 
-        if random.random() < self.prob_facts_dict[key]:
+        if self.rng.random() < self.prob_facts_dict[key]:
             return 'T', key
         return 'F', key
 
 
+    def get_facts_literals(self, ctl : clingo.Control) -> 'list[int]':
+        '''
+        Returns the literals of the external atoms of the probabilistic
+        facts, in the order of the facts (0 if a fact is not an external
+        of the program). Computed once for every control, to assign the
+        sampled worlds with assign_world.
+        '''
+        literals : 'list[int]' = []
+        for fact in self.prob_facts_dict:
+            atom = ctl.symbolic_atoms[clingo.parse_term(fact)]
+            literals.append(atom.literal if atom is not None and atom.is_external else 0)
+        return literals
+
+
     @staticmethod
-    def assign_T_F_and_get_count(ctl : clingo.Control, w_assignments: 'dict[str,bool]') -> 'tuple[int,int,int,int]':
+    def assign_world(ctl : clingo.Control, literals : 'list[int]', w_id : str) -> None:
+        '''
+        Assigns the externals of the probabilistic facts (literals, see
+        get_facts_literals) with the values of the world w_id (a string
+        with T or F for every fact).
+        '''
+        for literal, value in zip(literals, w_id):
+            if literal != 0:
+                ctl.assign_external(literal, value == 'T')
+
+
+    @staticmethod
+    def assign_T_F_and_get_count(ctl : clingo.Control, literals : 'list[int]', w_id : str) -> 'tuple[int,int,int,int]':
         '''
         It does what it is specified in its name.
         '''
-        i = 0
-        for atm in ctl.symbolic_atoms:
-            if atm.is_external:
-                ctl.assign_external(atm.literal, w_assignments[reconstruct_atom(atm)])
-                i = i + 1
+        AspInterface.assign_world(ctl, literals, w_id)
 
         qe_count = 0
         qe_false_count = 0
@@ -382,12 +943,11 @@ class AspInterface:
         # I can have: qe or qe_false, nqe or nqe_false
         with ctl.solve(yield_=True) as handle:  # type: ignore
             for m in handle:  # type: ignore
-                m1 = str(m).split(' ')  # type: ignore
-                if 'qe' in m1:
+                if m.contains(QE_SYMBOL):  # type: ignore
                     qe_count = qe_count + 1
                 else:
                     qe_false_count = qe_false_count + 1
-                if 'nqe' in m1:
+                if m.contains(NQE_SYMBOL):  # type: ignore
                     nqe_count = nqe_count + 1
                 else:
                     nqe_false_count = nqe_false_count + 1
@@ -396,21 +956,17 @@ class AspInterface:
 
 
     @staticmethod
-    def assign_T_F_and_check_if_evidence(ctl : clingo.Control, w_assignments: 'dict[str,bool]') -> bool:
+    def assign_T_F_and_check_if_evidence(ctl : clingo.Control, literals : 'list[int]', w_id : str) -> bool:
         '''
         Assigns T or F to facts and checks whether q and e or not q and e
         is true.
         Used in Gibbs sampling.
         '''
-
-        for atm in ctl.symbolic_atoms:
-            if atm.is_external:
-                ctl.assign_external(atm.literal, w_assignments[reconstruct_atom(atm)])
+        AspInterface.assign_world(ctl, literals, w_id)
 
         with ctl.solve(yield_=True) as handle:  # type: ignore
             for m in handle:  # type: ignore
-                m1 = str(m).split(' ')  # type: ignore
-                if 'qe' in m1 or 'nqe' in m1:
+                if m.contains(QE_SYMBOL) or m.contains(NQE_SYMBOL):  # type: ignore
                     return True
 
         return False
@@ -420,23 +976,31 @@ class AspInterface:
     def get_val_or_compute_and_update_dict(
         sampled : 'dict[str,list[int]]',
         ctl : clingo.Control,
-        w_assignments: 'dict[str,bool]',
-        w_id : str
+        literals : 'list[int]',
+        w_id : str,
+        shared_cache : 'SharedWorldsCache|None' = None
         ) -> 'tuple[int,int,int,int]':
         '''
         If the world is has been already considered, retrieve it; otherwise
-        compute its contribution.
+        compute its contribution (if not in shared_cache).
         Used for sampling
         '''
         if w_id in sampled:
             return sampled[w_id][0], sampled[w_id][1], sampled[w_id][2], sampled[w_id][3]
 
-        qe_count, qe_false_count, nqe_count, nqe_false_count = AspInterface.assign_T_F_and_get_count(ctl, w_assignments)
-
-        lower_qe = (1 if qe_false_count == 0 else 0)
-        upper_qe = (1 if qe_count > 0 else 0)
-        lower_nqe = (1 if nqe_false_count == 0 else 0)
-        upper_nqe = (1 if nqe_count > 0 else 0)
+        # stored in the shared cache with one bit for each value
+        value = shared_cache.get(w_id) if shared_cache is not None else None
+        if value is None:
+            qe_count, qe_false_count, nqe_count, nqe_false_count = AspInterface.assign_T_F_and_get_count(ctl, literals, w_id)
+
+            lower_qe = (1 if qe_false_count == 0 else 0)
+            upper_qe = (1 if qe_count > 0 else 0)
+            lower_nqe = (1 if nqe_false_count == 0 else 0)
+            upper_nqe = (1 if nqe_count > 0 else 0)
+            if shared_cache is not None:
+                shared_cache.put(w_id, 8 * lower_qe + 4 * upper_qe + 2 * lower_nqe + upper_nqe)
+        else:
+            lower_qe, upper_qe, lower_nqe, upper_nqe = (value >> 3) & 1, (value >> 2) & 1, (value >> 1) & 1, value & 1
 
         # update sampled table
         # [n_lower_qe, n_upper_qe, n_lower_nqe, n_upper_nqe]
@@ -450,20 +1014,22 @@ class AspInterface:
         return lower_qe, upper_qe, lower_nqe, upper_nqe
 
 
-    def mh_sampling(self, dummy: int = True) -> 'tuple[float, float]':
+    def mh_sampling(self, seed : 'np.random.SeedSequence|None' = None) -> 'tuple[float, float]':
         '''
         MH sampling.
-        The argument dummy is for multiprocessing, to use imap
+        seed is the seed of the process (see set_seed).
         '''
+        self.set_seed(seed)
         # each element has the structure
         # [n_lower_qe, n_upper_qe, n_lower_nqe, n_upper_nqe, T_count]
         sampled : 'dict[str,list[int]]' = {}
 
         ctl = self.init_clingo_ctl(["0", "--project"])
+        literals = self.get_facts_literals(ctl)
 
         n_samples = self.n_samples
 
-        w_assignments, w_id = self.sample_world()
+        _, w_id = self.sample_world()
         t_count = w_id.count('T')
         previous_t_count = t_count if t_count > 0 else 1
 
@@ -479,13 +1045,13 @@ class AspInterface:
         previous_t_count : int = 1
 
         while k < n_samples:
-            w_assignments, w_id = self.sample_world()
+            _, w_id = self.sample_world()
             k = k + 1
 
             if w_id in sampled:
                 current_t_count = sampled[w_id][4]
 
-                if random.random() < min(1, current_t_count / previous_t_count):
+                if self.rng.random() < min(1, current_t_count / previous_t_count):
                     n_lower_qe = n_lower_qe + sampled[w_id][0]
                     n_upper_qe = n_upper_qe + sampled[w_id][1]
                     n_lower_nqe = n_lower_nqe + sampled[w_id][2]
@@ -493,13 +1059,13 @@ class AspInterface:
 
                 previous_t_count = current_t_count
             else:
-                qe_count, qe_false_count, nqe_count, nqe_false_count = AspInterface.assign_T_F_and_get_count(ctl, w_assignments)
+                qe_count, qe_false_count, nqe_count, nqe_false_count = AspInterface.assign_T_F_and_get_count(ctl, literals, w_id)
 
                 if qe_count > 0 or nqe_count > 0:
                     t_count = w_id.count('T')
                     current_t_count = t_count if t_count > 0 else 1
 
-                    if random.random() < min(1, current_t_count / previous_t_count):
+                    if self.rng.random() < min(1, current_t_count / previous_t_count):
                         # k = k + 1
                         n_lower_qe = n_lower_qe + (1 if qe_false_count == 0 else 0)
                         n_upper_qe = n_upper_qe + (1 if qe_count > 0 else 0)
@@ -520,10 +1086,12 @@ class AspInterface:
         return compute_conditional_lp_up(n_lower_qe, n_upper_qe, n_lower_nqe, n_upper_nqe, n_samples)
 
 
-    def gibbs_sampling(self, block: int) -> 'tuple[float, float]':
+    def gibbs_sampling(self, block: int, seed : 'np.random.SeedSequence|None' = None) -> 'tuple[float, float]':
         '''
         Gibbs sampling
+        seed is the seed of the process (see set_seed).
         '''
+        self.set_seed(seed)
         # list of samples for the evidence
         # correspondence str -> bool
         sampled_evidence : 'dict[str,bool]' = {}
@@ -533,6 +1101,7 @@ class AspInterface:
         sampled_query: 'dict[str,list[int]]' = {}
 
         ctl = self.init_clingo_ctl(["0", "--project"])
+        literals = self.get_facts_literals(ctl)
 
         n_samples = self.n_samples
 
@@ -547,7 +1116,6 @@ class AspInterface:
 
         w_id : str = ""
         idNew : str = ""
-        w_assignments: 'dict[str,bool]' = {}
 
         while k < n_samples:
             k = k + 1
@@ -555,11 +1123,11 @@ class AspInterface:
             # Step 0: sample evidence
             ev = False
             while ev is False:
-                w_assignments, w_id = self.sample_world()
+                _, w_id = self.sample_world()
                 if w_id in sampled_evidence:
                     ev = sampled_evidence[w_id]
                 else:
-                    ev = AspInterface.assign_T_F_and_check_if_evidence(ctl, w_assignments)
+                    ev = AspInterface.assign_T_F_and_check_if_evidence(ctl, literals, w_id)
                     sampled_evidence[w_id] = ev
 
             # Step 1: switch samples but keep the evidence true
@@ -567,21 +1135,20 @@ class AspInterface:
 
             while ev is False:
                 # blocked gibbs
-                to_resample = pick_random_index(block, w_id)
+                to_resample = pick_random_index(block, w_id, self.rng)
                 idNew = w_id
                 for i in to_resample:
-                    value, key = self.resample(i)
+                    value, _ = self.resample(i)
                     idNew = idNew[:i] + value + idNew[i + 1:]
-                    w_assignments[key] = False if value == 'F' else True
 
                 if idNew in sampled_evidence:
                     ev = sampled_evidence[idNew]
                 else:
-                    ev = AspInterface.assign_T_F_and_check_if_evidence(ctl, w_assignments)
+                    ev = AspInterface.assign_T_F_and_check_if_evidence(ctl, literals, idNew)
                     sampled_evidence[idNew] = ev
 
             # step 2: ask query
-            lower_qe, upper_qe, lower_nqe, upper_nqe = AspInterface.get_val_or_compute_and_update_dict(sampled_query, ctl, w_assignments, idNew)
+            lower_qe, upper_qe, lower_nqe, upper_nqe = AspInterface.get_val_or_compute_and_update_dict(sampled_query, ctl, literals, idNew)
 
             n_lower_qe = n_lower_qe + lower_qe
             n_upper_qe = n_upper_qe + upper_qe
@@ -591,147 +1158,365 @@ class AspInterface:
         return compute_conditional_lp_up(n_lower_qe, n_upper_qe, n_lower_nqe, n_upper_nqe, n_samples)
 
 
-    def rejection_sampling(self, dummy : int = True) -> 'tuple[float, float]':
+    def get_sampling_batches(self, get_counts : 'Callable[[],tuple[int,int,int,int]]') -> 'Iterator[int]':
+        '''
+        Yields the number of samples of every batch: all the samples
+        at once or, with target_ci_width, batches of CI_CHECK_SAMPLES
+        until the intervals of the lower and upper probability,
+        computed from the current counts (get_counts), are tighter
+        than target_ci_width.
+        '''
+        if self.target_ci_width < 0:
+            yield self.n_samples
+            return
+        n_taken = 0
+        while n_taken < self.n_samples:
+            batch_size = min(CI_CHECK_SAMPLES, self.n_samples - n_taken)
+            yield batch_size
+            n_taken += batch_size
+            (lp_min, lp_max), (up_min, up_max) = get_lp_up_intervals(get_counts(), self.confidence)
+            if lp_max - lp_min <= self.target_ci_width and up_max - up_min <= self.target_ci_width:
+                return
+
+
+    def rejection_sampling(self, seed : 'np.random.SeedSequence|None' = None) -> 'tuple[float, float]':
         '''
         Rejection Sampling.
-        The argument dummy is for multiprocessing, for imap.
+        seed is the seed of the process (see set_seed).
+        '''
+        counts, _, _ = self.rejection_sampling_counts(seed)
+        return get_lp_up_from_counts(counts)
+
+
+    def rejection_sampling_counts(self, seed : 'np.random.SeedSequence|None' = None) -> 'tuple[tuple[int,int,int,int],int,tuple[int,int]]':
+        '''
+        Rejection Sampling, stopped earlier with target_ci_width.
+        Returns the counts for the lower and upper probability (see
+        get_lp_up_from_counts), the number of samples taken, and the
+        lookups and hits of the shared cache.
+        seed is the seed of the process (see set_seed).
         '''
         # each element has the structure
         # [n_lower_qe, n_upper_qe, n_lower_nqe, n_upper_nqe]
         sampled = {}
 
+        self.set_seed(seed)
         ctl = self.init_clingo_ctl(["0", "--project"])
+        literals = self.get_facts_literals(ctl)
 
         n_lower_qe : int = 0
         n_upper_qe : int = 0
         n_lower_nqe : int = 0
         n_upper_nqe : int = 0
+        n_taken : int = 0
 
-        k : int = 0
+        def get_counts() -> 'tuple[int,int,int,int]':
+            return n_lower_qe, n_lower_qe + n_upper_nqe, n_upper_qe, n_upper_qe + n_lower_nqe
 
-        while k < self.n_samples:
-            w_assignments, w_id = self.sample_world()
-            k = k + 1
-            lower_qe, upper_qe, lower_nqe, upper_nqe = AspInterface.get_val_or_compute_and_update_dict(sampled, ctl, w_assignments, w_id)
+        for batch_size in self.get_sampling_batches(get_counts):
+            for w_id, count in self.sample_worlds(batch_size):
+                lower_qe, upper_qe, lower_nqe, upper_nqe = AspInterface.get_val_or_compute_and_update_dict(sampled, ctl, literals, w_id, self.shared_cache)
 
-            n_lower_qe = n_lower_qe + lower_qe
-            n_upper_qe = n_upper_qe + upper_qe
-            n_lower_nqe = n_lower_nqe + lower_nqe
-            n_upper_nqe = n_upper_nqe + upper_nqe
+                n_lower_qe = n_lower_qe + lower_qe * count
+                n_upper_qe = n_upper_qe + upper_qe * count
+                n_lower_nqe = n_lower_nqe + lower_nqe * count
+                n_upper_nqe = n_upper_nqe + upper_nqe * count
+            n_taken += batch_size
 
-        return compute_conditional_lp_up(n_lower_qe, n_upper_qe, n_lower_nqe, n_upper_nqe, self.n_samples)
+        return get_counts(), n_taken, self.get_shared_cache_stats()
 
 
-    def sample_query(self, dummy : int = True) -> 'tuple[float, float]':
+    def sample_query(self, seed : 'np.random.SeedSequence|None' = None) -> 'tuple[float, float]':
         '''
         Samples the query self.n_samples times.
-        dummy is a dummy argument for imap_unordered, that requires
-        an iterator as argument.
+        seed is the seed of the process (see set_seed).
+        '''
+        counts, _, _ = self.sample_query_counts(seed)
+        return get_lp_up_from_counts(counts)
+
+
+    def sample_query_counts(self, seed : 'np.random.SeedSequence|None' = None) -> 'tuple[tuple[int,int,int,int],int,tuple[int,int]]':
+        '''
+        Samples the query self.n_samples times (less with
+        target_ci_width). Returns the counts for the lower and upper
+        probability (see get_lp_up_from_counts), the number of
+        samples taken, and the lookups and hits of the shared cache.
+        seed is the seed of the process (see set_seed).
         '''
         # sampled worlds
         # each element is a list [lower, upper]
         sampled : 'dict[str,list[int]]' = {}
 
+        self.set_seed(seed)
         ctl = self.init_clingo_ctl(["0", "--project"])
+        literals = self.get_facts_literals(ctl)
 
         n_lower : int = 0
         n_upper : int = 0
+        n_taken : int = 0
         
         n_inconsistent : int = 0
-        
-        inc_sampled : 'dict[str,int]' = {}
+
         if self.pedantic:
             print(f"Taking {self.n_samples} samples")
 
-        # for _ in utils.progressbar(range(self.n_samples), "Computing: ", 40):
-        for _ in range(self.n_samples):
-            w_assignments, w_id = self.sample_world()
+        def get_counts() -> 'tuple[int,int,int,int]':
+            # with normalize, the worlds without answer sets are discarded
+            if self.normalize_prob:
+                return n_lower, n_taken - n_inconsistent, n_upper, n_taken - n_inconsistent
+            return n_lower, n_taken, n_upper, n_taken
+
+        for batch_size in self.get_sampling_batches(get_counts):
+            for w_id, count in self.sample_worlds(batch_size):
+                if w_id not in sampled:
+                    # stored in the shared cache as 2 (no answer sets)
+                    # or 2 * lp + up
+                    value = self.shared_cache.get(w_id) if self.shared_cache is not None else None
+                    if value is None:
+                        AspInterface.assign_world(ctl, literals, w_id)
+
+                        upper_count = 0
+                        lower_count = 0
+                        with ctl.solve(yield_=True) as handle:  # type: ignore
+                            for m in handle:  # type: ignore
+                                if m.contains(QUERY_SYMBOL):  # type: ignore
+                                    upper_count = upper_count + 1
+                                else:
+                                    lower_count = lower_count + 1
+
+                        up = 1 if upper_count > 0 else 0
+                        lp = 1 if up and lower_count == 0 else 0
+                        value = 2 * lp + up if lower_count + upper_count > 0 else 2
+                        if self.shared_cache is not None:
+                            self.shared_cache.put(w_id, value)
+
+                    if value == 2:
+                        # no answer sets
+                        if not self.normalize_prob:
+                            utils.print_inconsistent_program_approx(self.stop_if_inconsistent, w_id)
+                        sampled[w_id] = [-1, -1]
+                    else:
+                        sampled[w_id] = [value // 2, value % 2]
 
-            if w_id in sampled:
                 if sampled[w_id][0] == -1 and sampled[w_id][1] == -1:
-                    n_inconsistent += 1
-                    inc_sampled[w_id] += 1
-                else:
-                    n_lower = n_lower + sampled[w_id][0]
-                    n_upper = n_upper + sampled[w_id][1]
-            else:
-                for atm in ctl.symbolic_atoms:
-                    if atm.is_external:
-                        atom = reconstruct_atom(atm)
-                        if atom in self.prob_facts_dict:
-                            ctl.assign_external(atm.literal, w_assignments[atom])
-
-                upper_count = 0
-                lower_count = 0
-                with ctl.solve(yield_=True) as handle:  # type: ignore
-                    for m in handle:  # type: ignore
-                        if str(m) == "q":  # type: ignore
-                            upper_count = upper_count + 1
-                        else:
-                            lower_count = lower_count + 1
-
-                        handle.get()  # type: ignore
-
-                # if lower_count == 0 and upper_count == 0:
-                if str(ctl.solve()) == "UNSAT":
-                    if not self.normalize_prob:
-                        utils.print_inconsistent_program_approx(self.stop_if_inconsistent, w_id)
-                    n_inconsistent += 1
-                    inc_sampled[w_id] = 1
-
-                if lower_count + upper_count > 0:
-                    up = 1 if upper_count > 0 else 0
-                    lp = 1 if up and lower_count == 0 else 0
-                    n_lower = n_lower + lp
-                    n_upper = n_upper + up
+                    n_inconsistent += count
                 else:
-                    lp = -1
-                    up = -1
+                    n_lower = n_lower + sampled[w_id][0] * count
+                    n_upper = n_upper + sampled[w_id][1] * count
+            n_taken += batch_size
 
-                sampled[w_id] = [lp, up]
+        return get_counts(), n_taken, self.get_shared_cache_stats()
 
-        if self.normalize_prob:
-            p_inc = n_inconsistent / self.n_samples
-            lp_u = n_lower / self.n_samples
-            up_u = n_upper / self.n_samples
-            return lp_u / (1 - p_inc), up_u / (1 - p_inc)
 
-        return n_lower / self.n_samples, n_upper / self.n_samples
+    def get_cube_str(self, cube : 'dict[str,bool]') -> str:
+        '''
+        Returns a string with T (true), F (false) or - (any value) for
+        every probabilistic fact, in the order of the program.
+        '''
+        return "".join(("T" if cube[fact] else "F") if fact in cube else "-" for fact in self.prob_facts_dict)
 
 
-    def check_inconsistency_by_sampling(self, just_test: bool = False) -> 'tuple[list[str],list[str],int]':
+    def check_consistency(self, just_test : bool = False) -> 'tuple[list[str],int]':
         '''
-        If just_test = True, then stops as soon as it founds and inconsistent world.
+        Checks whether every world has at least one answer set with a
+        loop between a generator, that proposes a world not covered yet,
+        and the solver, that checks the program for that world.
+        An answer set covers all the worlds that differ only in facts
+        whose rules are blocked by another literal false in the answer
+        set, since these worlds have the same answer set (up to the
+        facts). An unsatisfiable core covers all the worlds that agree
+        with it.
+        Returns the cubes of inconsistent worlds (see get_cube_str) and
+        the number of calls to the solver: no cubes proves that the
+        program is consistent. If just_test, stops at the first one.
         '''
+        rules : 'list[list[int]]' = []
+        # atoms that cannot be generalized: heads and atoms in aggregates
+        fixed_atoms : 'set[int]' = set()
+
+        class RulesObserver:
+            '''
+            Collects the bodies of the ground rules.
+            '''
+            def rule(self, choice : bool, head : 'list[int]', body : 'list[int]') -> None:
+                fixed_atoms.update(head)
+                rules.append(body)
+
+            def weight_rule(self, choice : bool, head : 'list[int]', lower_bound : int, body : 'list[tuple[int,int]]') -> None:
+                fixed_atoms.update(head)
+                fixed_atoms.update(abs(lit) for lit, _ in body)
+
+        ctl = clingo.Control(["-Wnone"])
+        ctl.register_observer(RulesObserver())
+        try:
+            for clause in self.asp_program:
+                ctl.add('base', [], clause)
+            ctl.ground([("base", [])])
+        except RuntimeError:
+            utils.print_error_and_exit('Syntax error, parsing failed.')
+
+        facts_literals : 'dict[str,int]' = {}
+        for fact in self.prob_facts_dict:
+            atom = ctl.symbolic_atoms[clingo.parse_term(fact)]
+            if atom is not None and atom.is_external:
+                # the value is set by the assumptions
+                ctl.assign_external(atom.literal, None)
+                facts_literals[fact] = atom.literal
+        literals_facts = {lit: fact for fact, lit in facts_literals.items()}
+
+        facts_rules : 'dict[int,list[list[int]]]' = {lit: [] for lit in literals_facts}
+        for body in rules:
+            for lit in body:
+                if abs(lit) in facts_rules:
+                    facts_rules[abs(lit)].append(body)
+
+        # the generator has a choice rule for every fact and a
+        # constraint for every cube already covered
+        generator = clingo.Control(["-Wnone"])
+        generator_literals : 'dict[str,int]' = {}
+        with generator.backend() as backend:
+            for fact in facts_literals:
+                generator_literals[fact] = backend.add_atom(clingo.parse_term(fact))
+                backend.add_rule([generator_literals[fact]], choice=True)
+
         inconsistent : 'list[str]' = []
-        tested : 'list[str]' = []
-        unsat_count : int = 0
-        iterations : int = 0
+        n_calls : int = 0
 
-        ctl = self.init_clingo_ctl(["-Wnone"])
-        # for _ in range(self.n_samples):
         while True:
-            w_assignments, w_id = self.sample_world(True)
-            
-            if w_id not in tested:
-                tested.append(w_id)
-
-            for atm in ctl.symbolic_atoms:
-                if atm.is_external:
-                    atom = reconstruct_atom(atm)
-                    if atom in self.prob_facts_dict:
-                        ctl.assign_external(atm.literal, w_assignments[atom])
-            if str(ctl.solve()) == "UNSAT":
-                unsat_count += 1
-                if w_id not in inconsistent:
-                    inconsistent.append(w_id)
+            world : 'dict[str,bool]|None' = None
+            with generator.solve(yield_=True) as handle:  # type: ignore
+                for m in handle:  # type: ignore
+                    world = {fact: m.is_true(lit) for fact, lit in generator_literals.items()}  # type: ignore
+                    break
+            if world is None:
+                break
+
+            cube : 'dict[str,bool]' = {}
+            def on_model(m : clingo.Model) -> bool:
+                # a fact is dropped from the cube if all its rules are
+                # blocked by a false literal of an atom that is not a
+                # fact or of a fact that stays in the cube
+                kept : 'set[int]' = set(literals_facts)
+                needed : 'set[int]' = set()
+                for lit in literals_facts:
+                    if lit in fixed_atoms or lit in needed:
+                        continue
+                    blockers : 'list[int]' = []
+                    for body in facts_rules[lit]:
+                        false_atoms = [abs(l) for l in body if abs(l) != lit and m.is_true(abs(l)) != (l > 0)]
+                        not_facts = [atom for atom in false_atoms if atom not in literals_facts]
+                        facts = [atom for atom in false_atoms if atom in kept]
+                        if len(not_facts) == 0 and len(facts) == 0:
+                            break
+                        if len(not_facts) == 0:
+                            blockers.append(facts[0])
+                    else:
+                        kept.remove(lit)
+                        needed.update(blockers)
+                for lit in kept:
+                    cube[literals_facts[lit]] = world[literals_facts[lit]]  # type: ignore
+                return False
+
+            core : 'list[int]' = []
+            n_calls += 1
+            result = ctl.solve(
+                assumptions=[lit if world[fact] else -lit for fact, lit in facts_literals.items()],
+                on_model=on_model,
+                on_core=core.extend
+            )
+            if result.unsatisfiable:  # type: ignore
+                cube = {literals_facts[abs(lit)]: world[literals_facts[abs(lit)]] for lit in core if abs(lit) in literals_facts}
+                inconsistent.append(self.get_cube_str(cube))
+                if self.verbose:
+                    print(f"Inconsistent worlds: {inconsistent[-1]}")
                 if just_test:
-                    return tested, inconsistent, iterations
+                    break
 
-            if len(tested) == 2**len(self.prob_facts_dict):
-                return tested, inconsistent, iterations
+            with generator.backend() as backend:
+                backend.add_rule([], [generator_literals[fact] if value else -generator_literals[fact] for fact, value in cube.items()])
 
+        return inconsistent, n_calls
+
+
+    def get_cube_probability(self, cube : str) -> float:
+        '''
+        Probability of the worlds of a cube (see get_cube_str).
+        '''
+        prob = 1.0
+        for value, fact_prob in zip(cube, self.prob_facts_dict.values()):
+            if value == 'T':
+                prob *= fact_prob
+            elif value == 'F':
+                prob *= 1 - fact_prob
+        return prob
+
+
+    def compute_probability_inconsistent(self) -> 'tuple[float,int]':
+        '''
+        Computes the probability of the worlds without answer sets
+        from the cubes of check_consistency, without enumerating the
+        worlds. The cubes may overlap, so they are split into disjoint
+        ones. Returns the probability and the number of solver calls.
+        '''
+        inconsistent, n_calls = self.check_consistency()
+        disjoint_cubes : 'list[str]' = []
+        for cube in inconsistent:
+            parts = [cube]
+            for other in disjoint_cubes:
+                parts = [part for current in parts for part in subtract_cube(current, other)]
+            disjoint_cubes.extend(parts)
+        return math.fsum(self.get_cube_probability(cube) for cube in disjoint_cubes), n_calls
+
+
+    def sample_probability_inconsistent(self) -> 'tuple[int,int]':
+        '''
+        Samples n_samples worlds (with the probabilities of the facts)
+        and tests whether they have an answer set. Every distinct world
+        is solved once (see sample_worlds).
+        Returns the number of inconsistent samples and of solved worlds.
+        '''
+        consistent_worlds : 'dict[str,bool]' = {}
+        n_inconsistent : int = 0
+
+        ctl = self.init_clingo_ctl(["-Wnone"])
+        literals = self.get_facts_literals(ctl)
+        for w_id, count in self.sample_worlds(self.n_samples):
+            if w_id not in consistent_worlds:
+                AspInterface.assign_world(ctl, literals, w_id)
+                consistent_worlds[w_id] = ctl.solve().satisfiable  # type: ignore
+            if not consistent_worlds[w_id]:
+                n_inconsistent += count
+
+        return n_inconsistent, len(consistent_worlds)
+
+
+    def check_inconsistency_by_sampling(self, just_test: bool = False) -> 'tuple[set[str],set[str],int]':
+        '''
+        Tests the consistency of n_samples random worlds (see
+        check_consistency for a complete test).
+        If just_test = True, then stops as soon as it founds and inconsistent world.
+        '''
+        inconsistent : 'set[str]' = set()
+        tested : 'set[str]' = set()
+        iterations : int = 0
+        n_worlds = 2**len(self.prob_facts_dict)
+
+        ctl = self.init_clingo_ctl(["-Wnone"])
+        literals = self.get_facts_literals(ctl)
+        while iterations < self.n_samples and len(tested) < n_worlds:
+            _, w_id = self.sample_world(True)
             iterations += 1
+            if w_id in tested:
+                continue
+            tested.add(w_id)
+
+            AspInterface.assign_world(ctl, literals, w_id)
+            if ctl.solve().unsatisfiable:  # type: ignore
+                inconsistent.add(w_id)
+                if just_test:
+                    break
+
+        return tested, inconsistent, iterations
 
 
     def extract_best_utility(
@@ -826,6 +1611,9 @@ class AspInterface:
         # enumerate the worlds
         all_worlds : 'list[int]' = list(range(0, 2**len(self.prob_facts_dict)))
         w_list : 'list[str]' = list(self.prob_facts_dict.keys())
+        # the probabilities of all the worlds are computed at once
+        worlds_probabilities : 'list[float]' = world_probabilities.ids_probabilities(
+            all_worlds, list(self.prob_facts_dict.values())).tolist()
         lr = 0
         ur = 0
         p_unsat = 0 # probability of the UNSAT worlds
@@ -834,7 +1622,7 @@ class AspInterface:
             
             # compute the encoding of the world
             bin_value_w = bin(w)[2:].zfill(len(self.prob_facts_dict))
-            world_probability : float = 1
+            world_probability : float = worlds_probabilities[w]
 
             # impose the constraint on the probabilistic facts true in the world
             w_str = ""
@@ -844,10 +1632,6 @@ class AspInterface:
                     w_str += f"{w_list[index]} "
                 c = f":- {mode} {w_list[index]}."
                 self.asp_program.append(c)
-                if int(v) == 1:
-                    world_probability *= self.prob_facts_dict[w_list[index]]
-                else:
-                    world_probability *= (1-self.prob_facts_dict[w_list[index]])
             
             # remove the show statements and insert only the ones on the utility
             self.asp_program = [s for s in self.asp_program if not s.startswith('#show')]
@@ -929,11 +1713,11 @@ class AspInterface:
             '''
             st = list(s)
             if one:
-                idx = random.randint(0,len(st) - 1)
+                idx = int(self.rng.integers(0, len(st)))
                 st[idx] = '1' if st[idx] == '0' else '0'
             else:
                 for idx in range(0, len(st)):
-                    if random.random() > 0.5:
+                    if self.rng.random() > 0.5:
                         st[idx] = '1' if st[idx] == '0' else '0'
                     
             return ''.join(st)
@@ -958,8 +1742,7 @@ class AspInterface:
             
             return self.extract_best_utility_opt(computed_utilities_dict)
         else:
-            current_strategy = random.randint(0, 2**len(self.decision_atoms_list) - 1)
-            bin_value_current_strategy = bin(current_strategy)[2:].zfill(len(self.decision_atoms_list))
+            bin_value_current_strategy = ''.join(str(bit) for bit in self.rng.integers(0, 2, len(self.decision_atoms_list)))
             lr, ur, p_unsat = self._evaluate_strategy_dtopt(bin_value_current_strategy)
             # print(f"add: {bin_value_current_strategy} -> {(lr, ur, p_unsat)}")
             computed_utilities_dict[bin_value_current_strategy] = (lr, ur, p_unsat)
@@ -1118,19 +1901,22 @@ class AspInterface:
         '''
         Decision theory by computing the projective solutions.
         '''
-        ctl = self.init_clingo_ctl(["0", "--project"])
+        clingo_arguments = self.solver_config.get_arguments(ENUMERATION_TASK, ["0", "--project"], self.asp_program)
+        ctl = self.init_clingo_ctl(clingo_arguments)
 
         with ctl.solve(yield_=True) as handle:  # type: ignore
             for m in handle:  # type: ignore
                 # print((str(m)))
-                self.model_handler.add_decision_model(str(m))  # type: ignore
+                self.model_handler.add_decision_model(m.symbols(shown=True))  # type: ignore
                 self.computed_models = self.computed_models + 1
                 # n_models = n_models + 1
             handle.get()  # type: ignore
 
         selected_strategy, self.utility = self.model_handler.compute_best_strategy()
-        for i in range(0,len(selected_strategy)):
-            self.decision_atoms_selected.append(self.decision_atoms_list[i] if int(selected_strategy[i]) == 1 else f"not {self.decision_atoms_list[i]}")
+        if selected_strategy >= 0:
+            n_decisions = len(self.decision_atoms_list)
+            for i in range(0, n_decisions):
+                self.decision_atoms_selected.append(self.decision_atoms_list[i] if utils.is_bit_set(selected_strategy, i, n_decisions) else f"not {self.decision_atoms_list[i]}")
             self.decision_atoms_selected
         return self.utility, self.decision_atoms_selected
 
@@ -1238,7 +2024,7 @@ class AspInterface:
             '''
             id_individual : str = ""
             for _ in self.decision_atoms_list:
-                if random.random() < 0.5:
+                if self.rng.random() < 0.5:
                     id_individual += "1"
                 else:
                     id_individual += "0"
@@ -1277,13 +2063,13 @@ class AspInterface:
                 print(f"Iteration {it} - best: {population[0]}")
             best_a = population[0]
             best_b = population[1]
-            crossover_position = random.randint(0, len(best_a.id_individual) - 1)
+            crossover_position = int(self.rng.integers(0, len(best_a.id_individual)))
             # combine the two ids
             l_id = list(best_a.id_individual[:crossover_position] + best_b.id_individual[crossover_position:])
             
             # mutation
             for i in range(0,len(l_id)):
-                if random.random() < mutation_probability:
+                if self.rng.random() < mutation_probability:
                     l_id[i] = '0' if l_id[i] == '1' else '1'
             new_element_id = ''.join(l_id)
             
@@ -1430,7 +2216,7 @@ class AspInterface:
             '''
             id_individual : str = ""
             for _ in self.abducibles_list:
-                if random.random() < 0.5:
+                if self.rng.random() < 0.5:
                     id_individual += "1"
                 else:
                     id_individual += "0"
@@ -1483,7 +2269,7 @@ class AspInterface:
 
             best_a = population[0]
             best_b = population[1]
-            crossover_position = random.randint(0, len(best_a.id_individual) - 1)
+            crossover_position = int(self.rng.integers(0, len(best_a.id_individual)))
             
             # combine the two ids
             l_id_0 = list(best_a.id_individual[:crossover_position] + best_b.id_individual[crossover_position:])
@@ -1491,11 +2277,11 @@ class AspInterface:
 
             # mutation
             for i in range(0, len(l_id_0)):
-                if random.random() < mutation_probability:
+                if self.rng.random() < mutation_probability:
                     l_id_0[i] = '0' if l_id_0[i] == '1' else '1'
             new_element_id_0 = ''.join(l_id_0)
             for i in range(0, len(l_id_1)):
-                if random.random() < mutation_probability:
+                if self.rng.random() < mutation_probability:
                     l_id_1[i] = '0' if l_id_1[i] == '1' else '1'
             new_element_id_1 = ''.join(l_id_1)
             
@@ -1547,14 +2333,14 @@ class AspInterface:
             if target_prob > threshold - epsilon:
                 if self.pedantic:
                     print(f"added {el.id_individual,el.id_individual.count('1'), target_prob}")
-                self.abductive_explanations.append(self.model_handler.get_abducibles_from_id(el.id_individual))
+                self.abductive_explanations.append(self.model_handler.get_abducibles_from_id(int(el.id_individual, 2)))
 
 
     def __abduction_iter(self,
         n_abd: int,
-        previously_computed : 'list[str]',
+        previously_computed : 'list[list[str]]',
         one_shot : bool = False
-        ) -> 'list[str]':
+        ) -> 'list[list[clingo.Symbol]]':
         '''
         Loop for exact abduction.
         If one_shot is true then it does not insert the constraint since we
@@ -1586,11 +2372,11 @@ class AspInterface:
 
         ctl.ground([("base", [])])
 
-        computed_models : 'list[str]' = []
+        computed_models : 'list[list[clingo.Symbol]]' = []
 
         with ctl.solve(yield_=True) as handle:  # type: ignore
             for m in handle:  # type: ignore
-                computed_models.append(str(m))  # type: ignore
+                computed_models.append(m.symbols(shown=True))  # type: ignore
                 # n_models = n_models + 1
             handle.get()  # type: ignore
 
@@ -1613,7 +2399,7 @@ class AspInterface:
         if len(self.abducibles_list) == 0:
             utils.print_error_and_exit("Specify at least one abducible.")
 
-        computed_abducibles_list : 'list[str]' = []
+        computed_abducibles_list : 'list[list[str]]' = []
 
         for i in range(0, len(self.abducibles_list) + 1):
             currently_computed = self.__abduction_iter(i, computed_abducibles_list, one_shot)
@@ -1630,19 +2416,17 @@ class AspInterface:
 
             if len(self.prob_facts_dict) == 0:
                 # deterministic abduction
-                for i in range(0, len(currently_computed)):
-                    currently_computed[i] = currently_computed[i].split(' ')  # type: ignore
-                    self.abductive_explanations.append(currently_computed[i])  # type: ignore
+                for cc in currently_computed:
+                    explanation = [str(symbol) for symbol in cc]
+                    self.abductive_explanations.append(explanation)
+                    computed_abducibles_list.append(explanation)
 
                 self.computed_models = self.computed_models + len(currently_computed)
-
-                for cc in currently_computed:
-                    computed_abducibles_list.append(cc)
             else:
                 # if i == 0 and len(currently_computed) != 2**(len(self.prob_facts_dict) - self.n_probabilistic_ics):
                 #     utils.print_inconsistent_program(self.stop_if_inconsistent)
                 for el in currently_computed:
-                    self.model_handler.add_model_abduction(str(el))
+                    self.model_handler.add_model_abduction(el)
 
             # keep the best model
             self.lower_probability_query, self.upper_probability_query = self.model_handler.keep_best_model(threshold=threshold)
@@ -1682,7 +2466,7 @@ class AspInterface:
         nf : float = 0
         with ctl.solve(yield_=True) as handle:  # type: ignore
             for m in handle:  # type: ignore
-                nf += self.model_handler.add_value_lpmln(str(m), query)  # type: ignore
+                nf += self.model_handler.add_value_lpmln(m.symbols(shown=True), query)  # type: ignore
                 self.computed_models = self.computed_models + 1
             handle.get()   # type: ignore
         self.model_handler.normalize_weights_as(nf)
@@ -1710,7 +2494,7 @@ class AspInterface:
         for k, w in self.model_handler.worlds_dict.items():
             if (target == "upper" and w.model_query_count > 0) or \
                     (target == "lower" and w.model_query_count > 0 and w.model_not_query_count == 0):
-                for pf_0_1, pf_data in zip(k, pf_as_list):
+                for pf_0_1, pf_data in zip(utils.world_id_to_str(k, len(self.prob_facts_dict)), pf_as_list):
                     cleaned_fact = pf_data[0].replace('(', '_').replace(')', '_').replace(',', '_')
                     considered_facts = self.optimizable_facts if task == "optimizable" else self.reducible_facts
                     if f"P({cleaned_fact})" in considered_facts:
@@ -1794,6 +2578,35 @@ class AspInterface:
         return found, sel, computed_prob
     
 
+    def get_query_jacobians(self, target : str, credal_facts : bool) -> 'tuple[Callable[[list[float]],list[float]],Callable[[list[float]],list[float]]]|None':
+        '''
+        Returns the functions computing the gradient of the lower and
+        upper probability of the query with respect to the optimizable
+        facts, from the classification of the worlds (see
+        CompiledQuery.gradient). Without credal facts, the first one
+        is for the target. None if there is evidence, since the
+        equation of the query does not consider it.
+        '''
+        if self.evidence:
+            return None
+
+        compiled = CompiledQuery(self.model_handler)
+        # from the names of the optimizable facts to the facts
+        cleaned_facts = {f"P({fact.replace('(', '_').replace(')', '_').replace(',', '_')})": fact for fact in self.prob_facts_dict}
+        facts = [cleaned_facts[name] for name in self.optimizable_facts]
+
+        def get_jacobian(index : int) -> 'Callable[[list[float]],list[float]]':
+            def jacobian(x : 'list[float]') -> 'list[float]':
+                gradient = compiled.gradient(dict(zip(facts, [float(el) for el in x])))
+                return [gradient[fact][index] for fact in facts]
+            return jacobian
+
+        if credal_facts:
+            return get_jacobian(0), get_jacobian(1)
+        target_index = 0 if target == "lower" else 1
+        return get_jacobian(target_index), get_jacobian(target_index)
+
+
     def optimize_prob(self,
             target : str,
             threshold: float,
@@ -1844,7 +2657,8 @@ class AspInterface:
             epsilon,
             method,
             chunk,
-            credal_facts
+            credal_facts,
+            self.get_query_jacobians(target, credal_facts)
         )
         elapsed_time = time.time() - start_time
         if self.verbose:
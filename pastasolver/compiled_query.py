@@ -0,0 +1,139 @@
+'''
+Compiled query: the classification of the worlds for a query,
+computed with a single enumeration, that can be evaluated for
+different probabilities of the facts without calling clingo.
+'''
+
+import numpy as np
+
+from . import utils
+from . import world_probabilities
+from .models_handler import ModelsHandler, conditional_lower_upper
+
+
+class CompiledQuery:
+    '''
+    Stores, for every world with at least one answer set, whether
+    it contributes to the lower and upper probability of the query
+    (and of the evidence).
+    Parameters:
+        - models_handler: handler with the enumerated worlds
+        - normalize_prob: divide by the probability of the worlds
+          with at least one answer set
+    '''
+    def __init__(self, models_handler : ModelsHandler, normalize_prob : bool = False) -> None:
+        self.prob_facts_dict : 'dict[str,float]' = dict(models_handler.prob_facts_dict)
+        self.evidence : bool = models_handler.evidence != ""
+        self.normalize_prob : bool = normalize_prob
+        worlds = list(models_handler.worlds_dict.values())
+        # one row for each world, one column for each fact
+        self.worlds_matrix : np.ndarray = world_probabilities.ids_to_matrix(
+            list(models_handler.worlds_dict), len(self.prob_facts_dict))
+        # one row for each of lower_query_prob, upper_query_prob,
+        # lower_evidence_prob, upper_evidence_prob (the last two
+        # only with evidence)
+        self.masks : np.ndarray = np.array(
+            [mask for _, mask in models_handler.get_contribution_masks(worlds)], dtype=bool).reshape(-1, len(worlds))
+
+
+    def get_probabilities_vector(self, prob_dict : 'dict[str,float]') -> 'list[float]':
+        '''
+        Returns the probabilities of the facts, in order, where the
+        ones not in prob_dict have the value of the program.
+        '''
+        for fact in prob_dict:
+            if fact not in self.prob_facts_dict:
+                utils.print_error_and_exit(f"{fact} is not a probabilistic fact.")
+        return [prob_dict.get(fact, prob) for fact, prob in self.prob_facts_dict.items()]
+
+
+    def evaluate(self, prob_dict : 'dict[str,float]' = {}) -> 'tuple[float,float]':
+        '''
+        Computes the lower and upper probability of the query
+        with the probabilities of the facts in prob_dict.
+        '''
+        return self.evaluate_many([prob_dict])[0]
+
+
+    def evaluate_many(self, prob_dicts : 'list[dict[str,float]]') -> 'list[tuple[float,float]]':
+        '''
+        Same as evaluate for many assignments of probabilities,
+        computed at once.
+        '''
+        probabilities = np.array([self.get_probabilities_vector(el) for el in prob_dicts], dtype=np.float64)
+        worlds_probs = world_probabilities.world_probabilities_many(self.worlds_matrix, probabilities)
+        # one row for each mask, one column for each assignment
+        sums = self.masks.astype(np.float64) @ worlds_probs
+        totals = worlds_probs.sum(axis=0)
+
+        results : 'list[tuple[float,float]]' = []
+        for i in range(len(prob_dicts)):
+            if self.worlds_matrix.shape[0] == 0:
+                # no world has an answer set
+                results.append((0, 0))
+                continue
+            if self.evidence:
+                lp, up = conditional_lower_upper(*sums[:, i].tolist())
+            else:
+                lp, up = float(sums[0, i]), float(sums[1, i])
+            # as in AspInterface.normalize_lower_upper
+            if self.normalize_prob:
+                lp, up = (lp / float(totals[i]), up / float(totals[i])) if totals[i] > 0 else (1, 1)
+            results.append((lp, up))
+        return results
+
+
+    def gradient(self, prob_dict : 'dict[str,float]' = {}) -> 'dict[str,tuple[float,float]]':
+        '''
+        Computes the partial derivatives of the lower and upper
+        probability of the query with respect to the probability
+        of every fact, with the probabilities in prob_dict (see
+        evaluate). Returns a dict fact -> (d lower, d upper).
+        '''
+        facts = list(self.prob_facts_dict)
+        if self.worlds_matrix.shape[0] == 0:
+            return {fact: (0, 0) for fact in facts}
+
+        probabilities = self.get_probabilities_vector(prob_dict)
+        # the last row is for the probability of all the worlds
+        weights = np.vstack([self.masks, np.ones((1, self.worlds_matrix.shape[0]), dtype=bool)]).astype(np.float64)
+        worlds_probs = world_probabilities.world_probabilities(self.worlds_matrix, probabilities)
+        sums = (weights @ worlds_probs).tolist()
+        gradients = world_probabilities.sums_gradient(self.worlds_matrix, probabilities, weights)
+
+        if self.evidence:
+            lower_query, upper_query, lower_evidence, upper_evidence = sums[:4]
+            lp, up = conditional_lower_upper(lower_query, upper_query, lower_evidence, upper_evidence)
+            if ((upper_query + lower_evidence == 0) and upper_evidence > 0) or \
+                ((lower_query + upper_evidence == 0) and upper_query > 0):
+                # constant values (0 or 1)
+                d_lp = np.zeros(len(facts))
+                d_up = np.zeros(len(facts))
+            else:
+                d_lp = quotient_gradient(lower_query, lower_query + upper_evidence, gradients[0], gradients[0] + gradients[3])
+                d_up = quotient_gradient(upper_query, upper_query + lower_evidence, gradients[1], gradients[1] + gradients[2])
+        else:
+            lp, up = sums[0], sums[1]
+            d_lp, d_up = gradients[0], gradients[1]
+
+        # as in AspInterface.normalize_lower_upper
+        if self.normalize_prob:
+            total = sums[-1]
+            d_lp = quotient_gradient(lp, total, d_lp, gradients[-1])
+            d_up = quotient_gradient(up, total, d_up, gradients[-1])
+
+        return {fact: (float(dl), float(du)) for fact, dl, du in zip(facts, d_lp, d_up)}
+
+
+def quotient_gradient(
+    numerator : float,
+    denominator : float,
+    d_numerator : np.ndarray,
+    d_denominator : np.ndarray
+    ) -> np.ndarray:
+    '''
+    Gradient of numerator / denominator (0 if the denominator is 0).
+    '''
+    if denominator == 0:
+        return np.zeros_like(d_numerator)
+    return (d_numerator * denominator - numerator * d_denominator) / denominator**2
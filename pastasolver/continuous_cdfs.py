@@ -1,4 +1,5 @@
 import math
+import numpy as np
 import scipy.stats  # type: ignore
 
 from . import utils
@@ -114,7 +115,33 @@ def take_sample(distribution_parameters : 'tuple[str, float, float]') -> float:
         utils.print_error_and_exit(f"Distribution {distribution} not supported")
         return -math.inf # only to make the linter happy, since the previous call calls sys exit
 
-def evaluate_sample(sample : float, fact : str) -> bool:
+def take_samples(
+    distribution_parameters : 'tuple[str, float, float]',
+    n_samples : int,
+    rng : np.random.Generator
+    ) -> np.ndarray:
+    '''
+    Takes n_samples samples from the specified distribution at once,
+    with the random generator rng (same parameters of take_sample).
+    '''
+    distribution = distribution_parameters[0]
+    if distribution == "gaussian":
+        return rng.normal(distribution_parameters[1], distribution_parameters[2], n_samples)
+    elif distribution == "uniform":
+        return rng.uniform(distribution_parameters[1], distribution_parameters[1] + distribution_parameters[2], n_samples)
+    elif distribution == "exponential":
+        return rng.exponential(1 / distribution_parameters[1], n_samples)
+    elif distribution == "gamma":
+        return rng.gamma(distribution_parameters[1], 1 / distribution_parameters[2], n_samples)
+    else:
+        utils.print_error_and_exit(f"Distribution {distribution} not supported")
+        return np.empty(0) # only to make the linter happy, since the previous call calls sys exit
+
+def get_comparison(fact : str) -> 'tuple[str,float]':
+    '''
+    Returns the type of comparison (above or below) and the value
+    of a fact obtained from a comparison predicate.
+    '''
     # the variables have the form
     # var_type_before_after where
     # var is the name of the variable
@@ -130,11 +157,21 @@ def evaluate_sample(sample : float, fact : str) -> bool:
     else:
         val = float(f[2] + '.' + f[3])
 
-    comparison_type = f[1]
+    if f[1] not in ["above", "below"]:
+        utils.print_error_and_exit("Sample to evaluate not conform")
+    return f[1], val
+
+def evaluate_sample(sample : float, fact : str) -> bool:
+    comparison_type, val = get_comparison(fact)
     if comparison_type == "above":
         return sample > val
-    elif comparison_type == "below":
-        return sample < val
-    else:
-        utils.print_error_and_exit("Sample to evaluate not conform")
-        return False
\ No newline at end of file
+    return sample < val
+
+def evaluate_samples(samples : np.ndarray, fact : str) -> np.ndarray:
+    '''
+    Vectorized version of evaluate_sample.
+    '''
+    comparison_type, val = get_comparison(fact)
+    if comparison_type == "above":
+        return samples > val
+    return samples < val
\ No newline at end of file
@@ -2,7 +2,11 @@ import math
 import sys
 import typing # for the Any type for the type hint
 import random # to assign a random probability fo facts to construct the mapping for CNF
+
+import numpy as np
+
 from . import pasta_solver
+from . import world_probabilities
 
 interpretation_string = "interpretation"
 LOGZERO = 0.001
@@ -35,6 +39,10 @@ class ParameterLearner:
         # I need one entry for every CNF
         self.cnf_idx_to_pf : 'dict[typing.Any,dict[int,str]]' = dict()
 
+        # (dict, key) -> (matrix of the stored worlds, counts of their
+        # models), built once and evaluated at every EM iteration
+        self.worlds_matrices : 'dict[tuple[int,typing.Any],tuple[np.ndarray,np.ndarray]]' = dict()
+
 
     def generate_program_string(
             self,
@@ -58,15 +66,25 @@ class ParameterLearner:
 
 
 
-    def get_prob_from_id(self, id_w: str) -> float:
+    def get_worlds_probabilities(
+            self,
+            dict_with_data, # type: ignore
+            key # type: ignore
+        ) -> 'tuple[np.ndarray,np.ndarray]':
         '''
-        Given a world id, extracts its probability
+        Computes the probability of all the worlds stored for key
+        with the current probabilities of the facts. Returns the
+        probabilities and a matrix with, for each world, the number
+        of models for the not query, for the query and in total.
         '''
-        probability = 1
-        for index, el in enumerate(self.prob_facts_dict):
-            contribution = self.prob_facts_dict[el] if id_w[index] == '1' else (1 - self.prob_facts_dict[el])
-            probability = probability * contribution
-        return probability
+        cache_key = (id(dict_with_data), key)
+        if cache_key not in self.worlds_matrices:
+            worlds_list = dict_with_data[key] # type: ignore
+            matrix = world_probabilities.ids_to_matrix([world[0] for world in worlds_list], len(self.prob_facts_dict)) # type: ignore
+            counts = np.array([world[1:4] for world in worlds_list], dtype=np.int64).reshape(-1, 3) # type: ignore
+            self.worlds_matrices[cache_key] = (matrix, counts)
+        matrix, counts = self.worlds_matrices[cache_key]
+        return world_probabilities.world_probabilities(matrix, list(self.prob_facts_dict.values())), counts
 
 
     def add_element_to_dict(self,
@@ -105,21 +123,11 @@ class ParameterLearner:
         Retrieves the probability of the query by looking into
         the already computed worlds.
         '''
-        lp = 0
-        up = 0
-        worlds_list = dict_with_data[key] # type: ignore
-        for world in worlds_list: # type: ignore
-            w_id = world[0] # type: ignore
-            mnqc = world[1] # type: ignore
-            mqc = world[2] # type: ignore
-            # mc = world[3]
-            lpw = 1 if (mnqc == 0 and mqc > 0) else 0
-            upw = 1 if mqc > 0 else 0
-
-            current_prob = self.get_prob_from_id(w_id) # type: ignore
-
-            lp = lp + current_prob * lpw
-            up = up + current_prob * upw
+        probs, counts = self.get_worlds_probabilities(dict_with_data, key)
+        mnqc = counts[:, 0]
+        mqc = counts[:, 1]
+        lp = float(probs[(mnqc == 0) & (mqc > 0)].sum())
+        up = float(probs[mqc > 0].sum())
         return lp, up
 
 
@@ -156,38 +164,15 @@ class ParameterLearner:
         # if key not in dict_with_data:
         #     return 0,0
 
-        worlds_list = dict_with_data[key]
-
-        lqp = 0
-        uqp = 0
-        lep = 0
-        uep = 0
-
-        for world in worlds_list:
-            id_w = world[0]
-            mnqe = world[1]
-            mqe = world[2]
-            nm = world[3]
-            # print(world)
-            # ['110', 0, 1]
-            # [ID, Lower, Upper]
-            # sys.exit()
-
-            # print(facts_prob)
-            current_prob = self.get_prob_from_id(id_w)
-
-            if mqe > 0:
-                if mqe == nm:
-                    lqp = lqp + current_prob
-                    # self.increment_lower_query_prob(p)
-                uqp = uqp + current_prob
-                # self.increment_upper_query_prob(p)
-            if mnqe > 0:
-                if mnqe == nm:
-                    lep = lep + current_prob
-                    # self.increment_lower_evidence_prob(p)
-                uep = uep + current_prob
-                # self.increment_upper_evidence_prob(p)
+        probs, counts = self.get_worlds_probabilities(dict_with_data, key)
+        mnqe = counts[:, 0]
+        mqe = counts[:, 1]
+        nm = counts[:, 2]
+
+        lqp = float(probs[(mqe > 0) & (mqe == nm)].sum())
+        uqp = float(probs[mqe > 0].sum())
+        lep = float(probs[(mnqe > 0) & (mnqe == nm)].sum())
+        uep = float(probs[mnqe > 0].sum())
 
         if (uqp + lep == 0) and uep > 0:
             return 0, 0
@@ -2,27 +2,77 @@
 Class to identify a world.
 '''
 
+import itertools
 import math
+
+import clingo
+import numpy as np
+
 from . import utils
+from . import world_probabilities
+
+# atoms added to the program to mark the query and the evidence
+QUERY_SYMBOL = clingo.Function("q")
+NOT_QUERY_SYMBOL = clingo.Function("nq")
+EVIDENCE_SYMBOL = clingo.Function("e")
+NOT_EVIDENCE_SYMBOL = clingo.Function("ne")
+
+# kinds of the atoms in an answer set
+FACT_ATOM = 0
+ABDUCIBLE_ATOM = 1
+QUERY_ATOM = 2
+NOT_QUERY_ATOM = 3
+EVIDENCE_ATOM = 4
+NOT_EVIDENCE_ATOM = 5
+
+def conditional_lower_upper(
+    lower_query_prob : float,
+    upper_query_prob : float,
+    lower_evidence_prob : float,
+    upper_evidence_prob : float
+    ) -> 'tuple[float,float]':
+    '''
+    Computes the lower and upper conditional probability of the query
+    from the lower and upper probability of (q,e) and (not q,e).
+    '''
+    if (upper_query_prob + lower_evidence_prob == 0) and upper_evidence_prob > 0:
+        return 0,0
+
+    if (lower_query_prob + upper_evidence_prob == 0) and upper_query_prob > 0:
+        return 1,1
+
+    if lower_query_prob + upper_evidence_prob > 0:
+        lqp = lower_query_prob / (lower_query_prob + upper_evidence_prob)
+    else:
+        lqp = 0
+
+    if upper_query_prob + lower_evidence_prob > 0:
+        uqp = upper_query_prob / (upper_query_prob + lower_evidence_prob)
+    else:
+        uqp = 0
+
+    return lqp, uqp
+
 
 class DecisionWorld:
     '''
     Class for storing the worlds defined by decision facts.
     '''
+    __slots__ = ("id_strategy", "probabilistic_worlds", "probabilistic_worlds_to_utility")
+
     def __init__(self,
-        id_strategy : str,
-        id_prob : str,
-        prob : float,
-        id_utilities : str
+        id_strategy : int,
+        id_prob : int,
+        id_utilities : int
         ) -> None:
-        self.id_strategy : str = id_strategy
+        self.id_strategy : int = id_strategy
         # each strategy has an associated set of worlds
-        self.probabilistic_worlds : 'dict[str,World]' = {}
+        self.probabilistic_worlds : 'dict[int,World]' = {}
         # each world has an associated set of utility atoms true
         # or false, needed for the computation of the contribution
         # of the atoms
-        self.probabilistic_worlds_to_utility : 'dict[str,list[str]]' = {}
-        wrld = World(prob)
+        self.probabilistic_worlds_to_utility : 'dict[int,list[int]]' = {}
+        wrld = World(0)
         self.probabilistic_worlds[id_prob] = wrld
         self.probabilistic_worlds_to_utility[id_prob] = [id_utilities]
 
@@ -52,17 +102,18 @@ class AbdWorld:
     '''
     Class for the worlds defined by abducibles
     '''
+    __slots__ = ("id_inst", "model_query_count", "model_not_query_count", "probabilistic_worlds")
+
     def __init__(self,
-        id_abd : str,
-        id_prob : str,
-        prob : float,
+        id_abd : int,
+        id_prob : int,
         model_query : bool
         ) -> None:
-        self.id_inst : str = id_abd
+        self.id_inst : int = id_abd
         self.model_query_count : int = 0  # needed?
         self.model_not_query_count : int = 0  # needed?
-        self.probabilistic_worlds : 'dict[str,World]' = {}
-        self.probabilistic_worlds[id_prob] = World(prob)
+        self.probabilistic_worlds : 'dict[int,World]' = {}
+        self.probabilistic_worlds[id_prob] = World(0)
         if model_query is True:
             self.probabilistic_worlds[id_prob].increment_model_query_count()
         else:
@@ -70,7 +121,7 @@ class AbdWorld:
 
 
     def __str__(self) -> str:
-        s = "id: " + self.id_inst + " mqc: " + str(self.model_query_count) + \
+        s = "id: " + str(self.id_inst) + " mqc: " + str(self.model_query_count) + \
             " mnqc: " + str(self.model_not_query_count) + "\n"
 
         for worlds in self.probabilistic_worlds.values():
@@ -85,8 +136,14 @@ class AbdWorld:
 
 class World:
     '''
-    id is the string composed by the occurrences of the variables
+    A world, identified by an integer whose bits are the truth values
+    of the probabilistic facts (the first fact is the most significant
+    bit).
+    The attributes are stored in slots since there can be millions
+    of worlds.
     '''
+    __slots__ = ("prob", "model_not_query_count", "model_query_count", "model_count")
+
     def __init__(self, prob : float) -> None:
         # self.id : str = id
         self.prob: float = prob
@@ -128,6 +185,42 @@ class World:
         return self.__str__()
 
 
+class QueriesWorld:
+    '''
+    A world when many queries are asked with a single enumeration.
+    The i-th bit of the masks (the first query is the most significant
+    bit) states whether the i-th query is true in some (brave) or in
+    all (cautious) the answer sets of the world. With evidence, the
+    query masks consider the answer sets with q and e, the not query
+    masks the ones with not q and e.
+    '''
+    __slots__ = ("prob", "brave_query", "cautious_query", "brave_not_query", "cautious_not_query")
+
+    def __init__(self, query_mask : int, not_query_mask : int) -> None:
+        self.prob : float = 0
+        self.brave_query : int = query_mask
+        self.cautious_query : int = query_mask
+        self.brave_not_query : int = not_query_mask
+        self.cautious_not_query : int = not_query_mask
+
+    def update(self, query_mask : int, not_query_mask : int) -> None:
+        '''
+        Updates the masks with a new answer set.
+        '''
+        self.brave_query |= query_mask
+        self.cautious_query &= query_mask
+        self.brave_not_query |= not_query_mask
+        self.cautious_not_query &= not_query_mask
+
+    def __str__(self) -> str:
+        return "probability: " + str(self.prob) + \
+            " brave: " + bin(self.brave_query) + \
+            " cautious: " + bin(self.cautious_query)
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
 class ModelsHandler():
     '''
     Class to handle the models computed by clingo
@@ -137,23 +230,81 @@ class ModelsHandler():
         evidence : str,
         abducibles_list : 'list[str]' = [],
         decision_atoms_list : 'list[str]' = [],
-        utilities_dict : 'dict[str,float]' = {}
+        utilities_dict : 'dict[str,float]' = {},
+        logspace : bool = False,
+        query_symbols : 'tuple[clingo.Symbol,clingo.Symbol,clingo.Symbol,clingo.Symbol]' = \
+            (QUERY_SYMBOL, NOT_QUERY_SYMBOL, EVIDENCE_SYMBOL, NOT_EVIDENCE_SYMBOL)
         ) -> None:
-        self.worlds_dict : 'dict[str,World]' = {}
-        self.abd_worlds_dict : 'dict[str,AbdWorld]' = {}
+        # if logspace, the probabilities of the worlds and the
+        # accumulated probabilities are stored as logarithms
+        self.logspace : bool = logspace
+        zero : float = -math.inf if logspace else 0
+        self.worlds_dict : 'dict[int,World]' = {}
+        self.abd_worlds_dict : 'dict[int,AbdWorld]' = {}
         self.prob_facts_dict = prob_facts_dict
+        self.n_prob_facts : int = len(prob_facts_dict)
         self.best_lp : float = 0
         self.best_up : float = 0
-        self.best_abd_combinations : 'list[str]' = []
-        self.upper_query_prob : float = 0
-        self.lower_query_prob : float = 0
-        self.upper_evidence_prob : float = 0
-        self.lower_evidence_prob : float = 0
+        self.best_abd_combinations : 'list[int]' = []
+        self.upper_query_prob : float = zero
+        self.lower_query_prob : float = zero
+        self.upper_evidence_prob : float = zero
+        self.lower_evidence_prob : float = zero
         self.evidence : str = evidence
         self.abducibles_list : 'list[str]' = abducibles_list # list of abducibles
         self.decision_atoms_list: 'list[str]' = decision_atoms_list
         self.utilities_dict: 'dict[str,float]' = utilities_dict
-        self.decision_worlds_dict : 'dict[str,DecisionWorld]' = {}
+        self.decision_worlds_dict : 'dict[int,DecisionWorld]' = {}
+        # number of queries asked at once (see init_queries)
+        self.n_queries : int = 0
+        # streaming mode: only the world currently enumerated is kept
+        self.current_world_id : int = -1
+        self.current_world : 'World|None' = None
+        # closed worlds whose probability is still to be computed
+        self.streamed_worlds_buffer : 'list[tuple[int,World]]' = []
+        self.n_streamed_worlds : int = 0
+        # ids of the closed worlds, to detect a world whose models
+        # are not consecutive (it would be counted twice)
+        self.closed_worlds : 'set[int]' = set()
+        self.streamed_worlds_prob : float = zero
+        self.k_credal : int = 100
+        # hash indexes built once to avoid scanning the lists for
+        # every atom of every answer set
+        # fact -> (index, p, 1 - p)
+        self.prob_facts_index : 'dict[str,tuple[int,float,float]]' = {
+            fact : (index, prob, 1 - prob) for index, (fact, prob) in enumerate(prob_facts_dict.items())
+        }
+        self.abducibles_index : 'dict[str,int]' = {
+            abd : index for index, abd in enumerate(abducibles_list)
+        }
+        self.decision_atoms_index : 'dict[str,int]' = {
+            decision : index for index, decision in enumerate(decision_atoms_list)
+        }
+        self.utilities_index : 'dict[str,int]' = {
+            utility : index for index, utility in enumerate(utilities_dict)
+        }
+        # the symbols of the answer sets are mapped to their contribution
+        # to the ids the first time they are encountered, so models are
+        # never converted to strings
+        # query_symbols are the atoms marking the query and the evidence
+        # (q, nq, e, ne), which are different in a PastaSession
+        query_symbol, not_query_symbol, evidence_symbol, not_evidence_symbol = query_symbols
+        # symbol -> (kind, mask)
+        self.world_symbols : 'dict[clingo.Symbol,tuple[int,int]]' = {
+            query_symbol : (QUERY_ATOM, 0),
+            not_query_symbol : (NOT_QUERY_ATOM, 0),
+            evidence_symbol : (EVIDENCE_ATOM, 0),
+            not_evidence_symbol : (NOT_EVIDENCE_ATOM, 0)
+        }
+        # symbol -> (kind, mask abducibles, mask world)
+        self.abduction_symbols : 'dict[clingo.Symbol,tuple[int,int,int]]' = {
+            query_symbol : (QUERY_ATOM, 0, 0),
+            not_query_symbol : (NOT_QUERY_ATOM, 0, 0)
+        }
+        # symbol -> (mask strategy, mask world, mask utilities)
+        self.decision_symbols : 'dict[clingo.Symbol,tuple[int,int,int]]' = {}
+        # symbol -> (index of the fact or -1, is the query)
+        self.lpmln_symbols : 'dict[clingo.Symbol,tuple[int,bool]]' = {}
 
 
     def keep_best_model(
@@ -167,6 +318,7 @@ class ModelsHandler():
         of facts such that the probability of the query is above the
         threshold.
         '''
+        self.compute_worlds_probabilities()
         # current_number_abducibles = list(self.abd_worlds_dict.keys())[0].count('1')
         for el in self.abd_worlds_dict:
             acc_lp = 0
@@ -177,7 +329,7 @@ class ModelsHandler():
             sum_p_worlds = 0
             world_prob = 0
             if current_worlds > 0:
-                expected_worlds = 2**(len(list(worlds_comb.keys())[0]))
+                expected_worlds = 2**self.n_prob_facts
                 # condition to maintain the consistency
             for w_id in worlds_comb:
                 world_prob = worlds_comb[w_id].prob
@@ -231,60 +383,54 @@ class ModelsHandler():
         return self.best_lp, self.best_up
 
 
-    def extract_pos_and_prob(self, term : str) -> 'tuple[int,int,float]':
+    def extract_pos_fact(self, term : str) -> 'tuple[int,int]':
         '''
-        Computes the position in the dict to generate the string and the
-        probability of the current fact
+        Computes the position of the current probabilistic fact in the
+        dict and its sign (positive or negative)
         '''
-        index = 0
-        probability = 0
-
         term, positive = utils.clean_term(term)
 
-        found = False
-        for el in self.prob_facts_dict:
-            if term == el:
-                probability = self.prob_facts_dict[el] if positive else 1 - self.prob_facts_dict[el]
-                found = True
-                break
-            index = index + 1
-
-        if found is False:
+        if term not in self.prob_facts_index:
             utils.print_error_and_exit(f"Probabilistic fact {term} not found")
 
-        return index, 1 if positive else 0, probability
+        return self.prob_facts_index[term][0], 1 if positive else 0
 
 
     # this could be static or removed from the method
-    def extract_pos(self, term : str, data_list : 'list[str]') -> 'tuple[int,int]':
+    def extract_pos(self, term : str, data_index : 'dict[str,int]') -> 'tuple[int,int]':
         '''
-        Computes the position in the list to get the index and the
-        sign (positive or negative) for the current term.
+        Computes the position in the list (given as an index
+        element -> position) and the sign (positive or negative)
+        for the current term.
         '''
-        index = 0
-
         term, positive = utils.clean_term(term)
 
-        for el in data_list:
-            if term == el:
-                break
+        return data_index.get(term, len(data_index)), 1 if positive else 0
 
-            index = index + 1
 
-        return index, 1 if positive else 0
+    def resolve_world_symbol(self, symbol : clingo.Symbol) -> 'tuple[int,int]':
+        '''
+        Computes (and caches) the contribution of a symbol to the id
+        of the world.
+        '''
+        position, true_or_false = self.extract_pos_fact(str(symbol))
+        entry = (FACT_ATOM, true_or_false << (self.n_prob_facts - 1 - position))
+        self.world_symbols[symbol] = entry
+        return entry
 
 
-    def get_id_prob_world(self,
-        line: str,
+    def get_id_world(self,
+        symbols: 'list[clingo.Symbol]',
         evidence: str
-        ) -> 'tuple[str, float, bool, bool]':
+        ) -> 'tuple[int, bool, bool]':
         '''
-        From a line representing an answer set returns its id as a 01 string, its probability
-        and whether it contributes to the lower and upper probability
+        From the shown symbols of an answer set returns its id as an integer
+        (bitmask over the probabilistic facts) and whether it contributes
+        to the lower and upper probability. The probability of the world
+        is computed later, once for all the worlds (see
+        compute_worlds_probabilities)
         '''
-        line_list = line.split(' ')
-
-        if len(line_list) < len(self.prob_facts_dict):
+        if len(symbols) < self.n_prob_facts:
             # this because with the project statment the result will not
             # be correct: 0.5::a(1). a(X):- c(X). c(1). will provide a
             # wrong result
@@ -292,110 +438,199 @@ class ModelsHandler():
 
         model_query = False  # model q and e for evidence, q without evidence
         model_evidence = False  # model nq and e for evidence, nq without evidence
-        id_str = "0" * len(self.prob_facts_dict)
-        probability = 1
-        for term in line_list:
-            if term == "q":
+        id_w = 0
+        world_symbols = self.world_symbols
+        for symbol in symbols:
+            if symbol in world_symbols:
+                kind, mask = world_symbols[symbol]
+            else:
+                kind, mask = self.resolve_world_symbol(symbol)
+            if kind == FACT_ATOM:
+                id_w |= mask
+            elif kind == QUERY_ATOM:
                 model_query = True
-            elif term == "nq":
+            elif kind == NOT_QUERY_ATOM:
                 model_query = False
-            elif term == "e":
+            elif kind == EVIDENCE_ATOM:
                 model_evidence = True
-            elif term == "ne":
-                model_evidence = False
             else:
-                position, true_or_false, prob = self.extract_pos_and_prob(term)
-                id_str = id_str[:position] + str(true_or_false) + id_str[position + 1 :]
-                probability = probability * prob
+                model_evidence = False
 
         if evidence == "":
             # query without evidence
-            return id_str, probability, model_query, False
+            return id_w, model_query, False
 
         # can I return directly model_query and model_evidence?
         # also in the case of evidence == ""?
         if (model_query is True) and (model_evidence is True):
-            return id_str, probability, True, True
+            return id_w, True, True
         if (model_query is False) and (model_evidence is True):
-            return id_str, probability, False, True
+            return id_w, False, True
 
         # all the other cases, don't care
-        return id_str, probability, False, False
+        return id_w, False, False
+
+
+    def init_queries(self, n_queries : int) -> None:
+        '''
+        Prepares the handler to answer n_queries at once: the i-th
+        query is marked by the atom q(i).
+        '''
+        self.n_queries = n_queries
+        for index in range(n_queries):
+            self.world_symbols[clingo.Function("q", [clingo.Number(index)])] = (QUERY_ATOM, 1 << (n_queries - 1 - index))
+
+
+    def get_id_queries_world(self, symbols : 'list[clingo.Symbol]') -> 'tuple[int,int,bool]':
+        '''
+        From the shown symbols of an answer set returns the id of
+        the world, the mask of the true queries and whether the
+        evidence is true. Similar to get_id_world
+        '''
+        id_w = 0
+        queries = 0
+        model_evidence = False
+        world_symbols = self.world_symbols
+        for symbol in symbols:
+            if symbol in world_symbols:
+                kind, mask = world_symbols[symbol]
+            else:
+                kind, mask = self.resolve_world_symbol(symbol)
+            if kind == FACT_ATOM:
+                id_w |= mask
+            elif kind == QUERY_ATOM:
+                queries |= mask
+            elif kind == EVIDENCE_ATOM:
+                model_evidence = True
+
+        return id_w, queries, model_evidence
 
 
-    def get_weight_as(self, line : str, query : str) -> 'tuple[float,bool]':
+    def get_weight_as(self, symbols : 'list[clingo.Symbol]', query : str) -> 'tuple[float,bool]':
         '''
         Extracts the weight of a stable model
         '''
-        l_splitted = line.split(' ')
         weight : float = 0.0
+        model_query = False
+        facts_in_model : 'list[int]' = []
+
+        for symbol in symbols:
+            if symbol not in self.lpmln_symbols:
+                name = str(symbol)
+                index = self.prob_facts_index[name][0] if name in self.prob_facts_index else -1
+                self.lpmln_symbols[symbol] = (index, name == query)
+            index, is_query = self.lpmln_symbols[symbol]
+            if index >= 0:
+                facts_in_model.append(index)
+            model_query = model_query or is_query
+
+        # the weight is accumulated following the order of the facts
+        probabilities = list(self.prob_facts_dict.values())
+        for index in sorted(facts_in_model):
+            weight += weight + math.e**probabilities[index]
 
-        for wr in self.prob_facts_dict:
-            if wr in l_splitted:
-                weight += weight + math.e**self.prob_facts_dict[wr]
+        return weight if weight > 0 else 1, model_query
 
-        return weight if weight > 0 else 1, query in l_splitted
 
+    def resolve_abduction_symbol(self, symbol : clingo.Symbol) -> 'tuple[int,int,int]':
+        '''
+        Computes (and caches) the contribution of a symbol to the ids
+        of the abducibles and of the world.
+        '''
+        term = str(symbol)
+        if term.startswith('abd_') or term.startswith('not_abd_'):
+            n_abd = len(self.abducibles_list)
+            position, true_or_false = self.extract_pos(term, self.abducibles_index)
+            entry = (ABDUCIBLE_ATOM, true_or_false << (n_abd - 1 - position), 0)
+        else:
+            position, true_or_false = self.extract_pos_fact(term)
+            entry = (FACT_ATOM, 0, true_or_false << (self.n_prob_facts - 1 - position))
+        self.abduction_symbols[symbol] = entry
+        return entry
 
-    def get_ids_abduction(self, line : str) -> 'tuple[str,str,float,bool]':
+
+    def get_ids_abduction(self, symbols : 'list[clingo.Symbol]') -> 'tuple[int,int,bool]':
         '''
-        From a line representing an answer set returns the id for both
-        abducibles and worlds as a 01 string. Similar to get_id_prob_world
+        From the shown symbols of an answer set returns the id for both
+        abducibles and worlds as integers. Similar to get_id_world
         '''
-        line_list = line.split(' ')
         model_query = False
-        id_abd = "0" * len(self.abducibles_list)
-        id_prob = "0" * len(self.prob_facts_dict)
+        id_abd = 0
+        id_prob = 0
 
-        probability = 1
-        for term in line_list:
-            if term == "q":
+        abduction_symbols = self.abduction_symbols
+        for symbol in symbols:
+            if symbol in abduction_symbols:
+                kind, mask_abd, mask_prob = abduction_symbols[symbol]
+            else:
+                kind, mask_abd, mask_prob = self.resolve_abduction_symbol(symbol)
+            if kind == QUERY_ATOM:
                 model_query = True
-            elif term == "nq":
+            elif kind == NOT_QUERY_ATOM:
                 model_query = False
-            elif term.startswith('abd_') or term.startswith('not_abd_'):
-                position, true_or_false = self.extract_pos(term, self.abducibles_list)
-                id_abd = id_abd[:position] + str(true_or_false) + id_abd[position + 1:]
+            elif kind == ABDUCIBLE_ATOM:
+                id_abd |= mask_abd
             else:
-                position, true_or_false, prob = self.extract_pos_and_prob(term)
-                id_prob = id_prob[:position] + str(true_or_false) + id_prob[position + 1:]
-                probability = probability * prob
+                id_prob |= mask_prob
 
-        return id_abd, id_prob, probability, model_query
+        return id_abd, id_prob, model_query
 
 
-    def get_ids_decision(self, line: str) -> 'tuple[str,str,float,str]':
+    def resolve_decision_symbol(self, symbol : clingo.Symbol) -> 'tuple[int,int,int]':
         '''
-        From an answer set returns:
-        id_strategy, id_world, prob_world, id_utilities
+        Computes (and caches) the contribution of a symbol to the ids
+        of the strategy, of the world, and of the utilities.
         '''
-        line_list = line.split(' ')
-        id_strategy = "0" * len(self.decision_atoms_list)
-        id_world = "0" * len(self.prob_facts_dict)
-        id_utilities = "0" * len(self.utilities_dict)
-        prob_world = 1
-
-        for term in line_list:
-            t1, _ = utils.clean_term(term)
-            if term.startswith("decision_"):
-                position, true_or_false = self.extract_pos(term, self.decision_atoms_list)
-                id_strategy = id_strategy[:position] + str(true_or_false) + id_strategy[position + 1:]
-                # not very clean since clean_term is called both here and in extract_pos
-            elif t1 in self.prob_facts_dict:
-                position, true_or_false, prob = self.extract_pos_and_prob(term)
-                id_world = id_world[:position] + str(true_or_false) + id_world[position + 1:]
-                prob_world = prob_world * prob
-
-            if t1 in self.utilities_dict:
-                position, true_or_false = self.extract_pos(term, list(self.utilities_dict.keys()))
-                id_utilities = id_utilities[:position] + str(true_or_false) + id_utilities[position + 1:]
+        term = str(symbol)
+        mask_strategy = 0
+        mask_world = 0
+        mask_utilities = 0
+
+        t1, _ = utils.clean_term(term)
+        if term.startswith("decision_"):
+            n_decisions = len(self.decision_atoms_list)
+            position, true_or_false = self.extract_pos(term, self.decision_atoms_index)
+            mask_strategy = true_or_false << (n_decisions - 1 - position)
+            # not very clean since clean_term is called both here and in extract_pos
+        elif t1 in self.prob_facts_index:
+            position, true_or_false = self.extract_pos_fact(term)
+            mask_world = true_or_false << (self.n_prob_facts - 1 - position)
+
+        if t1 in self.utilities_index:
+            n_utilities = len(self.utilities_dict)
+            position, true_or_false = self.extract_pos(term, self.utilities_index)
+            mask_utilities = true_or_false << (n_utilities - 1 - position)
+
+        entry = (mask_strategy, mask_world, mask_utilities)
+        self.decision_symbols[symbol] = entry
+        return entry
+
+
+    def get_ids_decision(self, symbols: 'list[clingo.Symbol]') -> 'tuple[int,int,int]':
+        '''
+        From the shown symbols of an answer set returns:
+        id_strategy, id_world, id_utilities
+        '''
+        id_strategy = 0
+        id_world = 0
+        id_utilities = 0
+
+        decision_symbols = self.decision_symbols
+        for symbol in symbols:
+            if symbol in decision_symbols:
+                mask_strategy, mask_world, mask_utilities = decision_symbols[symbol]
+            else:
+                mask_strategy, mask_world, mask_utilities = self.resolve_decision_symbol(symbol)
+            id_strategy |= mask_strategy
+            id_world |= mask_world
+            id_utilities |= mask_utilities
 
-        return id_strategy, id_world, prob_world, id_utilities
+        return id_strategy, id_world, id_utilities
 
 
     def manage_worlds_dict(self,
-        current_dict : 'dict[str,World]',
-        id_w : str,
+        current_dict : 'dict[int,World]',
+        id_w : int,
         prob : float,
         model_query : bool,
         model_evidence : bool
@@ -408,23 +643,21 @@ class ModelsHandler():
         model_evidence = True -> e in line
         model_evidence = False -> ne in line
         '''
-        if id_w in current_dict:
-            if self.evidence == "":
-                if model_query is True:
-                    current_dict[id_w].increment_model_query_count()
-                else:
-                    current_dict[id_w].increment_model_not_query_count()
-                current_dict[id_w].increment_model_count()
-            else:
-                current_dict[id_w].increment_model_count()
-                if (model_query is True) and (model_evidence is True):
-                    current_dict[id_w].increment_model_query_count()  # q e
-                elif (model_query is False) and (model_evidence is True):
-                    current_dict[id_w].increment_model_not_query_count()  # nq e
-            return
+        if id_w not in current_dict:
+            # element not found -> add a new world
+            current_dict[id_w] = World(prob)
+
+        self.update_world(current_dict[id_w], model_query, model_evidence)
+
 
-        # element not found -> add a new world
-        w = World(prob)
+    def update_world(self,
+        w : World,
+        model_query : bool,
+        model_evidence : bool
+        ) -> None:
+        '''
+        Updates the counters of the world w with a new model.
+        '''
         if self.evidence == "":
             if model_query is True:
                 w.increment_model_query_count()
@@ -438,23 +671,171 @@ class ModelsHandler():
             elif (model_query is False) and (model_evidence is True):
                 w.increment_model_not_query_count()  # nq e
 
-        current_dict[id_w] = w
 
-
-    def add_value(self, line : str) -> None:
+    def add_value(self, symbols : 'list[clingo.Symbol]') -> None:
         '''
         Analyzes the stable models and construct the world (credal semantics)
         '''
-        w_id, probability, model_query, model_evidence = self.get_id_prob_world(line, self.evidence)
-        self.manage_worlds_dict(self.worlds_dict, w_id, probability, model_query, model_evidence)
+        w_id, model_query, model_evidence = self.get_id_world(symbols, self.evidence)
+        self.manage_worlds_dict(self.worlds_dict, w_id, 0, model_query, model_evidence)
+
+
+    def add_value_queries(self, symbols : 'list[clingo.Symbol]') -> None:
+        '''
+        Same as add_value when many queries are asked at once (see
+        init_queries): the worlds are QueriesWorld.
+        '''
+        w_id, queries, model_evidence = self.get_id_queries_world(symbols)
+        if self.evidence == "" or model_evidence:
+            query_mask = queries
+            not_query_mask = ((1 << self.n_queries) - 1) & ~queries
+        else:
+            query_mask = 0
+            not_query_mask = 0
+
+        if w_id in self.worlds_dict:
+            self.worlds_dict[w_id].update(query_mask, not_query_mask) # type: ignore
+        else:
+            self.worlds_dict[w_id] = QueriesWorld(query_mask, not_query_mask) # type: ignore
+
+
+    def add_value_streaming(self, symbols : 'list[clingo.Symbol]') -> None:
+        '''
+        Same as add_value but without storing the worlds: the models of
+        the same world must arrive consecutively, so only the current
+        world is kept and, when a new world starts, the previous one
+        is added to the lower and upper probability.
+        '''
+        w_id, model_query, model_evidence = self.get_id_world(symbols, self.evidence)
+        if w_id != self.current_world_id or self.current_world is None:
+            self.close_current_world()
+            self.current_world_id = w_id
+            self.current_world = World(0)
+        self.update_world(self.current_world, model_query, model_evidence)
 
 
-    def add_value_lpmln(self, line : str, query : str) -> float:
+    def close_current_world(self) -> None:
+        '''
+        Closes the current world (streaming mode): its contribution is
+        added when the buffer of closed worlds is flushed.
+        '''
+        if self.current_world is not None:
+            if self.current_world_id in self.closed_worlds:
+                utils.print_error_and_exit(
+                    "The models of a world are not computed consecutively, streaming is not possible "
+                    "(check that --solver-arguments does not change --heuristic and --enum-mode).")
+            self.closed_worlds.add(self.current_world_id)
+            self.streamed_worlds_buffer.append((self.current_world_id, self.current_world))
+            self.n_streamed_worlds += 1
+            self.current_world = None
+            if len(self.streamed_worlds_buffer) >= world_probabilities.BATCH_SIZE:
+                self.flush_streamed_worlds()
+
+
+    def flush_streamed_worlds(self) -> None:
+        '''
+        Computes the probability of the buffered worlds at once and
+        adds their contribution to the lower and upper probability.
+        '''
+        if len(self.streamed_worlds_buffer) == 0:
+            return
+        probs = self.evaluate_worlds([w_id for w_id, _ in self.streamed_worlds_buffer])
+        for (_, w), p in zip(self.streamed_worlds_buffer, probs.tolist()):
+            w.prob = p
+        if self.logspace:
+            self.accumulate_worlds_logspace([w for _, w in self.streamed_worlds_buffer])
+            self.streamed_worlds_prob = world_probabilities.log_add(
+                self.streamed_worlds_prob, world_probabilities.log_sum_exp(probs))
+        else:
+            for _, w in self.streamed_worlds_buffer:
+                self.accumulate_world(w)
+                self.streamed_worlds_prob += w.prob
+        self.streamed_worlds_buffer = []
+
+
+    def add_cached_worlds(self, ids : np.ndarray, counts : np.ndarray) -> None:
+        '''
+        Adds the worlds loaded from the cache (see worlds_cache) as the
+        streamed ones: their probabilities are computed in batches of
+        rows of the arrays and only the sums are kept.
+        '''
+        probabilities = list(self.prob_facts_dict.values())
+        for start in range(0, ids.shape[0], world_probabilities.BATCH_SIZE):
+            matrix = world_probabilities.bytes_to_matrix(ids[start:start + world_probabilities.BATCH_SIZE], self.n_prob_facts)
+            log_probs = world_probabilities.log_world_probabilities(matrix, probabilities)
+            counts_chunk = np.asarray(counts[start:start + world_probabilities.BATCH_SIZE])
+            masks = self.get_contribution_masks_from_counts(counts_chunk[:, 0], counts_chunk[:, 1], counts_chunk[:, 2])
+            if self.logspace:
+                for attribute, mask in masks:
+                    setattr(self, attribute, world_probabilities.log_add(
+                        getattr(self, attribute), world_probabilities.log_sum_exp(log_probs[mask])))
+                self.streamed_worlds_prob = world_probabilities.log_add(
+                    self.streamed_worlds_prob, world_probabilities.log_sum_exp(log_probs))
+            else:
+                probs = np.exp(log_probs)
+                for attribute, mask in masks:
+                    setattr(self, attribute, getattr(self, attribute) + math.fsum(probs[mask]))
+                self.streamed_worlds_prob += math.fsum(probs)
+        self.n_streamed_worlds += ids.shape[0]
+
+
+    def close_streaming(self) -> None:
+        '''
+        Ends the streaming mode, adding the contribution of all the
+        worlds still to be considered.
+        '''
+        self.close_current_world()
+        self.flush_streamed_worlds()
+
+
+    def merge(self, other : 'ModelsHandler') -> None:
+        '''
+        Adds the worlds computed by another handler, on a disjoint
+        set of worlds (used when the worlds are split among processes).
+        '''
+        self.worlds_dict.update(other.worlds_dict)
+        self.n_streamed_worlds += other.n_streamed_worlds
+        self.closed_worlds.update(other.closed_worlds)
+        for attribute in ["streamed_worlds_prob", "lower_query_prob", "upper_query_prob", "lower_evidence_prob", "upper_evidence_prob"]:
+            if self.logspace:
+                setattr(self, attribute, world_probabilities.log_add(getattr(self, attribute), getattr(other, attribute)))
+            else:
+                setattr(self, attribute, getattr(self, attribute) + getattr(other, attribute))
+
+
+    def evaluate_worlds(self, ids : 'list[int]') -> np.ndarray:
+        '''
+        Computes the probabilities (or the log-probabilities, if
+        logspace) of the worlds identified by ids.
+        '''
+        matrix = world_probabilities.ids_to_matrix(ids, self.n_prob_facts)
+        probabilities = list(self.prob_facts_dict.values())
+        if self.logspace:
+            return world_probabilities.log_world_probabilities(matrix, probabilities)
+        return world_probabilities.world_probabilities(matrix, probabilities)
+
+
+    def compute_worlds_probabilities(self) -> None:
+        '''
+        Computes at once the probability of all the stored worlds,
+        including the ones of abduction and decision theory.
+        '''
+        worlds_dicts : 'list[dict[int,World]]' = [self.worlds_dict]
+        worlds_dicts.extend(el.probabilistic_worlds for el in self.abd_worlds_dict.values())
+        worlds_dicts.extend(el.probabilistic_worlds for el in self.decision_worlds_dict.values())
+        probs = self.evaluate_worlds([w_id for current_dict in worlds_dicts for w_id in current_dict])
+        worlds = (w for current_dict in worlds_dicts for w in current_dict.values())
+        for w, p in zip(worlds, probs.tolist()):
+            w.prob = p
+
+
+    def add_value_lpmln(self, symbols : 'list[clingo.Symbol]', query : str) -> float:
         '''
         Analyzes the answer set and store it, LPMLN semantics
         '''
-        weight, model_query = self.get_weight_as(line, query)
-        self.manage_worlds_dict(self.worlds_dict, line, weight, model_query, model_query)
+        weight, model_query = self.get_weight_as(symbols, query)
+        # the key is the answer set itself
+        self.manage_worlds_dict(self.worlds_dict, tuple(symbols), weight, model_query, model_query) # type: ignore
         return weight
 
 
@@ -467,9 +848,8 @@ class ModelsHandler():
 
 
     def manage_worlds_dict_abduction(self,
-        id_abd : str,
-        id_prob : str,
-        prob : float,
+        id_abd : int,
+        id_prob : int,
         model_query : bool
         ) -> None:
         '''
@@ -478,59 +858,61 @@ class ModelsHandler():
         '''
         if id_abd in self.abd_worlds_dict:
             # present
-            self.manage_worlds_dict(self.abd_worlds_dict[id_abd].probabilistic_worlds, id_prob, prob, model_query, False)
+            self.manage_worlds_dict(self.abd_worlds_dict[id_abd].probabilistic_worlds, id_prob, 0, model_query, False)
         else:
             # add new key
-            self.abd_worlds_dict[id_abd] = AbdWorld(id_abd, id_prob, prob, model_query)
+            self.abd_worlds_dict[id_abd] = AbdWorld(id_abd, id_prob, model_query)
 
 
     def manage_worlds_dict_decision(self,
-        id_strategy: str,
-        id_world: str,
-        prob_world: float,
-        id_utilities: str
+        id_strategy: int,
+        id_world: int,
+        id_utilities: int
         ) -> None:
         '''
         Checks whether the current id has been already encountered.
         If so, updates it; otherwise add a new element to the dict.
         '''
         if id_strategy in self.decision_worlds_dict:
-            self.manage_worlds_dict(self.decision_worlds_dict[id_strategy].probabilistic_worlds, id_world, prob_world, True, False)
+            self.manage_worlds_dict(self.decision_worlds_dict[id_strategy].probabilistic_worlds, id_world, 0, True, False)
             if id_world in self.decision_worlds_dict[id_strategy].probabilistic_worlds_to_utility:
                 self.decision_worlds_dict[id_strategy].probabilistic_worlds_to_utility[id_world].append(id_utilities)
             else:
                 self.decision_worlds_dict[id_strategy].probabilistic_worlds_to_utility[id_world] = [id_utilities]
         else:
-            self.decision_worlds_dict[id_strategy] = DecisionWorld(id_strategy, id_world, prob_world, id_utilities)
+            self.decision_worlds_dict[id_strategy] = DecisionWorld(id_strategy, id_world, id_utilities)
 
 
-    def add_model_abduction(self, line : str) -> None:
+    def add_model_abduction(self, symbols : 'list[clingo.Symbol]') -> None:
         '''
         Adds a model for abductive reasoning
         '''
-        id_abd, id_prob, prob, model_query = self.get_ids_abduction(line)
-        self.manage_worlds_dict_abduction(id_abd, id_prob, prob, model_query)
+        id_abd, id_prob, model_query = self.get_ids_abduction(symbols)
+        self.manage_worlds_dict_abduction(id_abd, id_prob, model_query)
 
 
-    def add_decision_model(self, line : str) -> None:
+    def add_decision_model(self, symbols : 'list[clingo.Symbol]') -> None:
         '''
         Adds a models for decision theory solving.
         Two possible options: aggregating the answer sets by worlds and,
         for each one, save which utilities are selected or viceversa.
         Here, the viceversa is used.
         '''
-        id_strategy, id_world, prob_world, id_utilities = self.get_ids_decision(line)
-        self.manage_worlds_dict_decision(id_strategy, id_world, prob_world, id_utilities)
+        id_strategy, id_world, id_utilities = self.get_ids_decision(symbols)
+        self.manage_worlds_dict_decision(id_strategy, id_world, id_utilities)
 
 
-    def compute_best_strategy(self, to_maximize : str = "upper") -> 'tuple[str,list[float]]':
+    def compute_best_strategy(self, to_maximize : str = "upper") -> 'tuple[int,list[float]]':
         '''
         Computes the best strategy for decision theory.
+        Returns -1 as strategy if there are no strategies.
         '''
         # utility_best_strategy : 'list[float]' = [-math.inf,-math.inf]
-        decisions_utilities : 'dict[str,list[float]]' = {}
-        best_strategy : str = ""
+        decisions_utilities : 'dict[int,list[float]]' = {}
+        best_strategy : int = -1
         bounds_best_strategy : 'list[float]' = [-math.inf, -math.inf]
+        n_utilities = len(self.utilities_dict)
+        self.compute_worlds_probabilities()
         # print(self.decision_worlds_dict)
 
         for dw, el in self.decision_worlds_dict.items():
@@ -539,7 +921,7 @@ class ModelsHandler():
             uu_contr = 0
             for w in el.probabilistic_worlds:
                 ual = el.probabilistic_worlds_to_utility[w]
-                contribution = utils.sum_string_list(ual)
+                contribution = utils.sum_bits_list(ual, n_utilities)
                 l_utilities_dict = list(self.utilities_dict.values())
                 current_world_prob = el.probabilistic_worlds[w].prob
 
@@ -570,14 +952,15 @@ class ModelsHandler():
         return best_strategy, bounds_best_strategy
 
 
-    def get_abducibles_from_id(self, w_id : str) -> 'list[str]':
+    def get_abducibles_from_id(self, w_id : int) -> 'list[str]':
         '''
-        From a 01 string returns the list of selected abducibles
+        From an integer id returns the list of selected abducibles
         '''
         obtained_abds : 'list[str]' = []
+        n_abd = len(self.abducibles_list)
 
-        for i in range(0,len(w_id)):
-            if w_id[i] == '1':
+        for i in range(0, n_abd):
+            if utils.is_bit_set(w_id, i, n_abd):
                 obtained_abds.append(self.abducibles_list[i])
             # else:
             #     obtained_abds.append(f"not {self.abducibles_list[i]}")
@@ -586,27 +969,27 @@ class ModelsHandler():
 
     def get_map_word_from_id(
         self,
-        w_id : str,
+        w_id : int,
         map_task : bool,
         map_id_list: 'list[int]'
         ) -> 'list[str]':
         '''
-        From a 01 string returns the atoms in the world
+        From an integer id returns the atoms in the world.
+        If map_task is True, w_id is a world over all the probabilistic
+        facts, otherwise only over the facts in map_id_list.
         '''
         obtained_atoms : 'list[str]' = []
-        ids_list : 'list[int]' = []
         keys = list(self.prob_facts_dict.keys())
 
         if map_task:
-            ids_list = [i for i in range(0,len(self.prob_facts_dict))]
-            for index, prob_fact in zip(ids_list, keys):
-                if w_id[index] == '1':
+            for index, prob_fact in enumerate(keys):
+                if utils.is_bit_set(w_id, index, self.n_prob_facts):
                     obtained_atoms.append(prob_fact)
                 else:
                     obtained_atoms.append(f"not {prob_fact}")
         else:
             for i, el in enumerate(map_id_list):
-                if w_id[i] == '1':
+                if utils.is_bit_set(w_id, i, len(map_id_list)):
                     obtained_atoms.append(keys[el])
                 else:
                     obtained_atoms.append(f"not {keys[el]}")
@@ -614,81 +997,272 @@ class ModelsHandler():
         return obtained_atoms
 
 
-    def compute_lower_upper_probability(self, k_credal : int = 100) -> 'tuple[float,float]':
+    def accumulate_world(self, w : World) -> None:
         '''
-        Computes lower and upper probability
+        Adds the contribution of the world w to the lower and upper
+        probability of the query (and evidence).
         '''
-        perc = k_credal / 100
-        for w in self.worlds_dict:
-            p = self.worlds_dict[w].prob
-
-            if self.evidence == "":
-                if self.worlds_dict[w].model_query_count != 0:
-                    if int(perc) == 1:
-                        if self.worlds_dict[w].model_not_query_count == 0:
-                            self.lower_query_prob = self.lower_query_prob + p
-                    else:
-                        if self.worlds_dict[w].model_query_count/self.worlds_dict[w].model_count >= perc:
-                            self.lower_query_prob = self.lower_query_prob + p
-                    self.upper_query_prob = self.upper_query_prob + p
-            else:
-                mqe = self.worlds_dict[w].model_query_count
-                mnqe = self.worlds_dict[w].model_not_query_count
-                nm = self.worlds_dict[w].model_count
-                if mqe > 0:
-                    if mqe == nm:
+        p = w.prob
+        if self.evidence == "":
+            if w.model_query_count != 0:
+                if int(self.k_credal / 100) == 1:
+                    if w.model_not_query_count == 0:
                         self.lower_query_prob = self.lower_query_prob + p
-                    self.upper_query_prob = self.upper_query_prob + p
-                if mnqe > 0:
-                    if mnqe == nm:
-                        self.lower_evidence_prob = self.lower_evidence_prob + p
-                    self.upper_evidence_prob = self.upper_evidence_prob + p
+                else:
+                    if w.model_query_count/w.model_count >= self.k_credal / 100:
+                        self.lower_query_prob = self.lower_query_prob + p
+                self.upper_query_prob = self.upper_query_prob + p
+        else:
+            mqe = w.model_query_count
+            mnqe = w.model_not_query_count
+            nm = w.model_count
+            if mqe > 0:
+                if mqe == nm:
+                    self.lower_query_prob = self.lower_query_prob + p
+                self.upper_query_prob = self.upper_query_prob + p
+            if mnqe > 0:
+                if mnqe == nm:
+                    self.lower_evidence_prob = self.lower_evidence_prob + p
+                self.upper_evidence_prob = self.upper_evidence_prob + p
+
+
+    def get_contribution_masks(self, worlds : 'list[World]') -> 'list[tuple[str,np.ndarray]]':
+        '''
+        For every accumulated probability (lower_query_prob, ...),
+        computes the boolean mask of the worlds that contribute to it,
+        with the same rules of accumulate_world.
+        '''
+        n_worlds = len(worlds)
+        mqc = np.fromiter((w.model_query_count for w in worlds), dtype=np.int64, count=n_worlds)
+        mnqc = np.fromiter((w.model_not_query_count for w in worlds), dtype=np.int64, count=n_worlds)
+        mc = np.fromiter((w.model_count for w in worlds), dtype=np.int64, count=n_worlds)
+        return self.get_contribution_masks_from_counts(mqc, mnqc, mc)
+
+
+    def get_contribution_masks_from_counts(self,
+        mqc : np.ndarray,
+        mnqc : np.ndarray,
+        mc : np.ndarray
+        ) -> 'list[tuple[str,np.ndarray]]':
+        '''
+        Same as get_contribution_masks from the arrays of the counts of
+        the models of the worlds (query, not query, all).
+        '''
+        if self.evidence == "":
+            up_mask = mqc != 0
+            if int(self.k_credal / 100) == 1:
+                lp_mask = up_mask & (mnqc == 0)
+            else:
+                lp_mask = up_mask & (mqc / np.maximum(mc, 1) >= self.k_credal / 100)
+            contributions = [
+                ("lower_query_prob", lp_mask),
+                ("upper_query_prob", up_mask)
+            ]
+        else:
+            contributions = [
+                ("lower_query_prob", (mqc > 0) & (mqc == mc)),
+                ("upper_query_prob", mqc > 0),
+                ("lower_evidence_prob", (mnqc > 0) & (mnqc == mc)),
+                ("upper_evidence_prob", mnqc > 0)
+            ]
+
+        return contributions
+
 
+    def accumulate_worlds_logspace(self, worlds : 'list[World]') -> None:
+        '''
+        Same as accumulate_world but for a list of worlds whose
+        probabilities are logarithms: the contributions are added
+        with log-sum-exp.
+        '''
+        log_probs = np.fromiter((w.prob for w in worlds), dtype=np.float64, count=len(worlds))
+        for attribute, mask in self.get_contribution_masks(worlds):
+            setattr(self, attribute, world_probabilities.log_add(
+                getattr(self, attribute), world_probabilities.log_sum_exp(log_probs[mask])))
+
+
+    def lower_upper_from_log_sums(self,
+        lqp : float,
+        uqp : float,
+        lep : float,
+        uep : float
+        ) -> 'tuple[float,float]':
+        '''
+        Same as lower_upper_from_sums when the accumulated
+        probabilities are logarithms.
+        '''
         if self.evidence == "":
-            return self.lower_query_prob, self.upper_query_prob
+            return math.exp(lqp), math.exp(uqp)
 
-        if (self.upper_query_prob + self.lower_evidence_prob == 0) and self.upper_evidence_prob > 0:
+        if uqp == -math.inf and lep == -math.inf and uep > -math.inf:
             return 0,0
 
-        if (self.lower_query_prob + self.upper_evidence_prob == 0) and self.upper_query_prob > 0:
+        if lqp == -math.inf and uep == -math.inf and uqp > -math.inf:
             return 1,1
 
-        if self.lower_query_prob + self.upper_evidence_prob > 0:
-            lqp = self.lower_query_prob / (self.lower_query_prob + self.upper_evidence_prob)
-        else:
-            lqp = 0
+        den_lower = world_probabilities.log_add(lqp, uep)
+        den_upper = world_probabilities.log_add(uqp, lep)
+
+        return math.exp(lqp - den_lower) if den_lower > -math.inf else 0, \
+            math.exp(uqp - den_upper) if den_upper > -math.inf else 0
+
+
+    def get_missing_worlds(self, offset : int, limit : int) -> 'list[int]':
+        '''
+        Returns at most limit ids of worlds without answer sets, in
+        increasing order, skipping the first offset ones. The gaps
+        between the sorted ids of the computed worlds are visited
+        without building the set of all the worlds.
+        '''
+        missing : 'list[int]' = []
+        gap_start = 0
+        for w_id in itertools.chain(sorted(self.worlds_dict), [2**self.n_prob_facts]):
+            gap_length = w_id - gap_start
+            if offset >= gap_length:
+                offset -= gap_length
+            else:
+                missing.extend(range(gap_start + offset, w_id)[:limit - len(missing)])
+                offset = 0
+                if len(missing) >= limit:
+                    break
+            gap_start = w_id + 1
+        return missing
+
+
+    def get_anytime_bounds(self) -> 'tuple[tuple[float,float],tuple[float,float]]':
+        '''
+        Computes the bounds on the lower and upper probability of the
+        query from the streamed worlds, since the worlds not yet
+        computed have total probability (at most) 1 minus the one of
+        the streamed worlds.
+        Returns (min, max) for the lower and for the upper probability.
+        '''
+        attributes = ["lower_query_prob", "upper_query_prob", "lower_evidence_prob", "upper_evidence_prob", "streamed_worlds_prob"]
+        values = [getattr(self, attribute) for attribute in attributes]
+        if self.logspace:
+            values = [math.exp(el) for el in values]
+        lower_query, upper_query, lower_evidence, upper_evidence, seen = values
+        unseen = max(0.0, 1 - seen)
+
+        if self.evidence == "":
+            return (lower_query, min(1.0, lower_query + unseen)), (upper_query, min(1.0, upper_query + unseen))
+
+        def ratio(num : float, other : float) -> float:
+            return num / (num + other) if num + other > 0 else 0
+
+        # the unseen worlds can contribute to any of the probabilities:
+        # the ratio num / (num + other) increases with num and
+        # decreases with other
+        return (ratio(lower_query, upper_evidence + unseen), ratio(lower_query + unseen, upper_evidence)), \
+            (ratio(upper_query, lower_evidence + unseen), ratio(upper_query + unseen, lower_evidence))
+
+
+    def get_computed_worlds_prob(self) -> float:
+        '''
+        Returns the sum of the probabilities of the computed worlds
+        (both stored and streamed).
+        '''
+        if self.logspace:
+            log_probs = np.fromiter((w.prob for w in self.worlds_dict.values()), dtype=np.float64, count=len(self.worlds_dict))
+            return math.exp(world_probabilities.log_add(self.streamed_worlds_prob, world_probabilities.log_sum_exp(log_probs)))
+        return self.streamed_worlds_prob + sum([w.prob for w in self.worlds_dict.values()])
+
+
+    def compute_lower_upper_probability(self, k_credal : int = 100) -> 'tuple[float,float]':
+        '''
+        Computes lower and upper probability
+        '''
+        self.k_credal = k_credal
+        if self.logspace:
+            self.accumulate_worlds_logspace(list(self.worlds_dict.values()))
+            return self.lower_upper_from_log_sums(
+                self.lower_query_prob, self.upper_query_prob,
+                self.lower_evidence_prob, self.upper_evidence_prob
+            )
+
+        for w in self.worlds_dict.values():
+            self.accumulate_world(w)
+
+        return self.lower_upper_from_sums(
+            self.lower_query_prob, self.upper_query_prob,
+            self.lower_evidence_prob, self.upper_evidence_prob
+        )
+
+
+    def lower_upper_from_sums(self,
+        lower_query_prob : float,
+        upper_query_prob : float,
+        lower_evidence_prob : float,
+        upper_evidence_prob : float
+        ) -> 'tuple[float,float]':
+        '''
+        Computes the lower and upper probability of the query from the
+        accumulated probabilities (conditional if there is evidence).
+        '''
+        if self.evidence == "":
+            return lower_query_prob, upper_query_prob
+
+        return conditional_lower_upper(lower_query_prob, upper_query_prob, lower_evidence_prob, upper_evidence_prob)
+
+
+    def compute_lower_upper_probabilities_queries(self) -> 'list[tuple[float,float]]':
+        '''
+        Computes the lower and upper probability of every query when
+        many queries are asked at once (see init_queries).
+        '''
+        worlds : 'list[QueriesWorld]' = list(self.worlds_dict.values()) # type: ignore
+        probs = np.fromiter((w.prob for w in worlds), dtype=np.float64, count=len(worlds))
 
-        if self.upper_query_prob + self.lower_evidence_prob > 0:
-            uqp = self.upper_query_prob / (self.upper_query_prob + self.lower_evidence_prob)
+        def queries_matrix(attribute : str) -> np.ndarray:
+            return world_probabilities.ids_to_matrix([getattr(w, attribute) for w in worlds], self.n_queries)
+
+        lq_matrix = queries_matrix("cautious_query")
+        uq_matrix = queries_matrix("brave_query")
+        if self.evidence != "":
+            le_matrix = queries_matrix("cautious_not_query")
+            ue_matrix = queries_matrix("brave_not_query")
         else:
-            uqp = 0
+            le_matrix = ue_matrix = np.zeros((len(worlds), self.n_queries), dtype=bool)
+
+        results : 'list[tuple[float,float]]' = []
+        for index in range(self.n_queries):
+            sums = [probs[matrix[:, index]] for matrix in [lq_matrix, uq_matrix, le_matrix, ue_matrix]]
+            if self.logspace:
+                results.append(self.lower_upper_from_log_sums(*[world_probabilities.log_sum_exp(el) for el in sums]))
+            else:
+                results.append(self.lower_upper_from_sums(*[float(el.sum()) for el in sums]))
 
-        return lqp, uqp
+        return results
 
 
     @staticmethod
-    def get_sub_world(super_w : str, map_id_list : 'list[int]') -> str:
+    def get_sub_world(super_w : int, map_id_list : 'list[int]', n_facts : int) -> int:
         '''
-        Extracts a string from super_w representing a sub world.
+        Extracts from super_w (a world over n_facts facts) the id
+        representing a sub world.
         Example:
-        super_w = 0101
+        super_w = 0b0101, n_facts = 4
         map_id_list = [0,2]
-        result = 00 (extracts the values in position 0 and 2 of super_w)
+        result = 0b00 (extracts the values in position 0 and 2 of super_w)
         '''
-        return ''.join([super_w[i] for i in map_id_list])
+        sub_w = 0
+        for i in map_id_list:
+            sub_w = (sub_w << 1) | ((super_w >> (n_facts - 1 - i)) & 1)
+        return sub_w
 
 
     def get_highest_prob_and_w_id_map(
         self,
-        current_worlds_dict : 'dict[str,World]',
+        current_worlds_dict : 'dict[int,World]',
         map_id_list: 'list[int]',
         lower : bool = True,
         ) -> 'tuple[float,list[list[str]]]':
         '''
         Get the world with the highest associated probability
         '''
-        max_prob : float = 0.0
-        w_id_list : 'list[str]' = []
+        zero : float = -math.inf if self.logspace else 0.0
+        max_prob : float = zero
+        w_id_list : 'list[int]' = []
         
         print(current_worlds_dict)
         for el, w in current_worlds_dict.items():
@@ -702,12 +1276,13 @@ class ModelsHandler():
                     w_id_list = []
                     w_id_list.append(el)
 
-        if max_prob == 0.0:
+        if max_prob == zero:
             return 0.0, []
 
-        map_len = len(list(current_worlds_dict)[0]) == len(list(self.worlds_dict)[0])
+        # the ids of the worlds in worlds_dict span all the facts
+        map_len = current_worlds_dict is self.worlds_dict
         l_map_worlds = map(lambda w_id : self.get_map_word_from_id(w_id, map_len, map_id_list), w_id_list)
-        return max_prob, list(l_map_worlds)
+        return math.exp(max_prob) if self.logspace else max_prob, list(l_map_worlds)
 
 
     def get_map_solution(
@@ -727,20 +1302,26 @@ class ModelsHandler():
             # map_worlds : 'dict[str,World]' = {}
             # maps the map world to the lower and upper probability obtained by
             # the probabilistic worlds
-            map_worlds_prob : 'dict[str,list[float]]' = {}
+            map_worlds_prob : 'dict[int,list[float]]' = {}
+            zero : float = -math.inf if self.logspace else 0.0
             for el, w in self.worlds_dict.items():
                 if w.model_query_count > 0:
                     # keep both lower and upper
-                    sub_w = ModelsHandler.get_sub_world(el, map_id_list)
+                    sub_w = ModelsHandler.get_sub_world(el, map_id_list, self.n_prob_facts)
                     if sub_w not in map_worlds_prob:
-                        map_worlds_prob[sub_w] = [0,0]
-                    if w.model_not_query_count == 0:
-                        map_worlds_prob[sub_w][0] += w.prob
-                    map_worlds_prob[sub_w][1] += w.prob # always increase the UP
+                        map_worlds_prob[sub_w] = [zero,zero]
+                    if self.logspace:
+                        if w.model_not_query_count == 0:
+                            map_worlds_prob[sub_w][0] = world_probabilities.log_add(map_worlds_prob[sub_w][0], w.prob)
+                        map_worlds_prob[sub_w][1] = world_probabilities.log_add(map_worlds_prob[sub_w][1], w.prob)
+                    else:
+                        if w.model_not_query_count == 0:
+                            map_worlds_prob[sub_w][0] += w.prob
+                        map_worlds_prob[sub_w][1] += w.prob # always increase the UP
 
             # get the sub-world with maximum probability
-            max_prob : float = 0.0
-            w_id_list : 'list[str]' = []
+            max_prob : float = zero
+            w_id_list : 'list[int]' = []
             target_pos = 0 if lower else 1
             
             for el, map_w in map_worlds_prob.items():
@@ -752,9 +1333,11 @@ class ModelsHandler():
                     w_id_list = []
                     w_id_list.append(el)
             
-            if max_prob == 0.0:
+            if max_prob == zero:
                 return 0.0, []
             
+            if self.logspace:
+                max_prob = math.exp(max_prob)
             l_map_worlds = map(lambda w_id : self.get_map_word_from_id(w_id, False, map_id_list), w_id_list)
             atoms_list = list(l_map_worlds)
         
@@ -795,7 +1378,7 @@ class ModelsHandler():
         if len(self.abd_worlds_dict) == 0:
             print(f"N worlds dict: {len(self.worlds_dict)}")
             for wrld in self.worlds_dict:
-                str_repr = str_repr + str(wrld) + "\n"
+                str_repr = str_repr + utils.world_id_to_str(wrld, self.n_prob_facts) + "\n"
         else:
             print(f"N abd worlds dict: {len(self.abd_worlds_dict)}")
             for abd_wrld in self.abd_worlds_dict:
@@ -7,7 +7,7 @@ from scipy.optimize import shgo
 from itertools import combinations
 import sys
 
-from typing import Any
+from typing import Any, Callable
 
 from .utils import is_number
 
@@ -38,14 +38,26 @@ def simplify_chunk(eq: str, chunk_size : int = 1_000_000) -> str:
     return sympify(new_eq)
     
 
+def negate_jacobian(
+        jacobian : 'Callable[[list[float]],list[float]]'
+    ) -> 'Callable[[list[float]],list[float]]':
+    '''
+    Returns the jacobian of the opposite function.
+    '''
+    return lambda x: [-el for el in jacobian(x)]
+
+
 class Problem:
     def __init__(
         self,
         function_to_opt : str,
-        symbolic_variables : 'list[str]'
+        symbolic_variables : 'list[str]',
+        jacobian : 'Callable[[list[float]],list[float]]|None' = None
         ) -> None:
         self.function_to_opt = function_to_opt
         self.symbolic_variables = symbolic_variables
+        # if available, computes the jacobian without sympy
+        self.jacobian = jacobian
 
 
     def eval_fn(self, x : 'list[float]', other_to_eval : str = ""):
@@ -68,6 +80,8 @@ class Problem:
         '''
         Jacobian function
         '''
+        if self.jacobian is not None:
+            return self.jacobian(x)
         j = []
         s = self.function_to_opt
         for symbolic_var in self.symbolic_variables:
@@ -83,12 +97,17 @@ def compute_optimal_probability(
         epsilon : float = -1,
         method : str = "SLSQP",
         chunk_size : int = 1_000_000,
-        credal_facts : bool = False
+        credal_facts : bool = False,
+        query_jacobians : 'tuple[Callable[[list[float]],list[float]],Callable[[list[float]],list[float]]]|None' = None
     ):
     '''
     Compute the optimal value to associate to probabilistic facts.
     By now, I only allow constraints on the probability value of the
     query.
+    query_jacobians are the functions computing the gradient of the
+    lower and upper probability of the query with respect to the
+    optimizable facts (without credal facts, the first one is used
+    for the target): if given, they replace the symbolic derivatives.
     '''
 
     simplified_equation_lp = ""
@@ -135,7 +154,8 @@ def compute_optimal_probability(
     else:
         query_constraint = Problem(
             simplified_equation,
-            opt_facts_names
+            opt_facts_names,
+            query_jacobians[0] if query_jacobians is not None else None
         )
         constraints.append({
             'type' : 'ineq',
@@ -185,9 +205,9 @@ def compute_optimal_probability(
         if credal_facts:
             for idx, prob_eq in enumerate([simplified_equation_lp,simplified_equation_up]):
                 if idx == 0:
-                    problem_to_solve = Problem(prob_eq, opt_facts_names)
+                    problem_to_solve = Problem(prob_eq, opt_facts_names, query_jacobians[0] if query_jacobians is not None else None)
                 else:
-                    problem_to_solve = Problem(f"-({prob_eq})", opt_facts_names)
+                    problem_to_solve = Problem(f"-({prob_eq})", opt_facts_names, negate_jacobian(query_jacobians[1]) if query_jacobians is not None else None)
 
                 res_v = minimize(
                     problem_to_solve.eval_fn,
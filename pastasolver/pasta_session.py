@@ -0,0 +1,63 @@
+'''
+Session to ask multiple queries to the same program.
+'''
+
+from .asp_interface import AspInterface
+from .pasta_parser import PastaParser
+from .pasta_solver import check_lp_up
+
+
+class PastaSession:
+    '''
+    Exact inference for many queries on the same program: the program
+    is parsed and grounded only once and, for every query, only the
+    rules for the query and the evidence are grounded.
+    Example:
+        session = PastaSession("examples/inference/bird_4.lp")
+        lp, up = session.inference("fly(1)")
+        lp, up = session.inference("fly(2)", "bird(1)")
+    '''
+    def __init__(
+        self,
+        filename : str,
+        from_string : str = "",
+        verbose : bool = False,
+        pedantic : bool = False,
+        normalize_prob : bool = False,
+        stop_if_inconsistent : bool = True,
+        k : int = 100,
+        streaming : bool = False,
+        logspace : bool = False
+        ) -> None:
+        # the query is a placeholder: the rules for the queries are
+        # added by the interface
+        self.parser = PastaParser(filename, "__placeholder__")
+        self.parser.parse(from_string)
+        self.parser.query = ""
+
+        self.interface = AspInterface(
+            self.parser.probabilistic_facts,
+            self.parser.get_asp_program(),
+            verbose=verbose,
+            pedantic=pedantic,
+            stop_if_inconsistent=stop_if_inconsistent,
+            normalize_prob=normalize_prob,
+            n_probabilistic_ics=self.parser.n_probabilistic_ics,
+            k_credal=k,
+            streaming=streaming,
+            logspace=logspace
+        )
+        self.interface.init_session()
+
+
+    def inference(self, query : str, evidence : str = "") -> 'tuple[float,float]':
+        '''
+        Exact inference for the query, possibly with evidence.
+        '''
+        self.interface.compute_probabilities_session(query, evidence)
+        lp = self.interface.lower_probability_query
+        up = self.interface.upper_probability_query
+
+        check_lp_up(lp, up)
+
+        return lp, up
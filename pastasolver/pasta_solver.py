@@ -5,8 +5,14 @@ import math
 import statistics
 import multiprocessing
 
+import numpy as np
+
 from .pasta_parser import PastaParser
-from .asp_interface import AspInterface
+from .asp_interface import AspInterface, wilson_interval, get_lp_up_from_counts, get_lp_up_intervals
+from .solver_config import SolverConfig
+from .compiled_query import CompiledQuery
+from .slicer import slice_program
+from .shared_worlds import SharedWorldsCache, MAX_FACTS
 from .utils import *
 from . import generator
 # from . import learning_utilities
@@ -45,7 +51,19 @@ class Pasta:
         naive_dt : bool = False,
         lpmln : bool = False,
         processes : int = 1,
-        aspmc : bool = False
+        aspmc : bool = False,
+        streaming : bool = False,
+        logspace : bool = False,
+        threads : int = 1,
+        solver_configuration : str = "",
+        solver_arguments : 'list[str]' = [],
+        autotune : bool = False,
+        cache_dir : str = "",
+        missing_page : int = 1,
+        slicing : bool = False,
+        seed : 'int|None' = None,
+        target_ci_width : float = -1,
+        confidence : float = 0.95
         ) -> None:
         self.filename = filename
         self.query = query
@@ -68,6 +86,35 @@ class Pasta:
         self.lpmln : bool = lpmln
         self.processes : int = processes
         self.aspmc : bool = aspmc
+        # aggregate the worlds during the enumeration (exact inference)
+        self.streaming : bool = streaming
+        # accumulate the probabilities in log-space (exact inference and MAP)
+        self.logspace : bool = logspace
+        # options for clingo (see SolverConfig)
+        self.solver_config : SolverConfig = SolverConfig(threads, solver_configuration, solver_arguments, autotune, self.verbose)
+        # directory of the on-disk cache of the worlds
+        self.cache_dir : str = cache_dir
+        # page of the worlds without answer sets listed with pedantic
+        self.missing_page : int = missing_page
+        # remove the probabilistic facts irrelevant to the query
+        # before exact inference (see slicer)
+        self.slicing : bool = slicing
+        # probability that the components removed by the slicer have
+        # an answer set
+        self.consistency_factor : float = 1
+        # seed of the random generators used for sampling (None: not
+        # reproducible)
+        self.seed : 'int|None' = seed
+        # sampling stops when the confidence intervals of the lower and
+        # upper probability are tighter than target_ci_width (-1: take
+        # all the samples)
+        self.target_ci_width : float = target_ci_width
+        self.confidence : float = confidence
+        # confidence intervals of the lower and upper probability and
+        # number of samples taken by the last approximate_solve (None
+        # for MH and Gibbs sampling)
+        self.confidence_intervals : 'tuple[tuple[float,float],tuple[float,float]]|None' = None
+        self.taken_samples : int = 0
         self.interface : AspInterface
         self.parser : PastaParser
 
@@ -271,26 +318,63 @@ class Pasta:
             stop_if_inconsistent=self.stop_if_inconsistent,
             normalize_prob=self.normalize_prob,
             upper = not self.consider_lower_prob,
-            continuous_facts=self.parser.continuous_facts if keep_hybrid else {}
+            continuous_facts=self.parser.continuous_facts if keep_hybrid else {},
+            seed=self.seed
         )
 
 
-    def test_consistency(self, just_test : bool = False, from_string : str = "") -> None:
+    def test_consistency(self, just_test : bool = False, from_string : str = "", sampling : bool = False) -> 'list[str]':
         '''
-        Test the consistency of a program by sampling.
+        Test the consistency of a program with the solver or, if
+        sampling, by sampling worlds. Returns the inconsistent worlds
+        found.
         '''
         self.setup_sampling(from_string)
-        tested, inconsistent, iterations = self.interface.check_inconsistency_by_sampling(just_test)
-        ratio = len(inconsistent) / 2**len(self.interface.prob_facts_dict)
-        if ratio == 0:
-            if len(tested) == 2**len(self.interface.prob_facts_dict):
+        n_worlds = 2**len(self.interface.prob_facts_dict)
+        if not sampling:
+            inconsistent, n_calls = self.interface.check_consistency(just_test)
+            if len(inconsistent) == 0:
+                print("Program consistent")
+            else:
+                print("Inconsistent program")
+                print(f"Inconsistent worlds (- for any value): {inconsistent}")
+            print(f"Solver calls: {n_calls}")
+            return inconsistent
+
+        tested, inconsistent_set, iterations = self.interface.check_inconsistency_by_sampling(just_test)
+        if len(inconsistent_set) == 0:
+            if len(tested) == n_worlds:
                 print("Program consistent")
             else:
-                print(f"Tested {len(tested)} out of {2**len(self.interface.prob_facts_dict)} worlds ({(len(tested)/2**len(self.interface.prob_facts_dict))*100}%) in {iterations} iterations: probably consistent")
+                print(f"Tested {len(tested)} out of {n_worlds} worlds ({(len(tested)/n_worlds)*100}%) in {iterations} iterations: probably consistent")
         else:
             print("Inconsistent program")
-            print(f"Inconsistent worlds: {inconsistent}")
-            print(f"Tested {len(tested)} out of {2**len(self.interface.prob_facts_dict)} worlds ({(len(tested)/2**len(self.interface.prob_facts_dict))*100}%) in {iterations} iterations")
+            print(f"Inconsistent worlds: {sorted(inconsistent_set)}")
+            print(f"Tested {len(tested)} out of {n_worlds} worlds ({(len(tested)/n_worlds)*100}%) in {iterations} iterations")
+        return sorted(inconsistent_set)
+
+
+    def probability_inconsistent(self, approximate : bool = False, from_string : str = "") -> 'tuple[float,tuple[float,float]]':
+        '''
+        Computes the probability of the worlds without answer sets
+        (one minus the normalizing factor of --normalize), exactly or
+        by sampling. Returns the probability and its confidence
+        interval, at level self.confidence (the probability itself if
+        exact).
+        '''
+        if approximate and not 0 < self.confidence < 1:
+            print_error_and_exit("The confidence must be between 0 and 1.")
+        self.setup_sampling(from_string)
+        if not approximate:
+            p_inconsistent, n_calls = self.interface.compute_probability_inconsistent()
+            if self.verbose:
+                print(f"Solver calls: {n_calls}")
+            return p_inconsistent, (p_inconsistent, p_inconsistent)
+
+        n_inconsistent, n_solved = self.interface.sample_probability_inconsistent()
+        if self.verbose:
+            print(f"Solved worlds: {n_solved} for {self.samples} samples")
+        return n_inconsistent / self.samples, wilson_interval(n_inconsistent, self.samples, self.confidence)
 
 
     def approximate_solve(self, arguments : argparse.Namespace, from_string : str = "") -> 'tuple[float,float]':
@@ -302,57 +386,129 @@ class Pasta:
         if self.processes > 16:
             print_error_and_exit("Too many processes, max 16 for safety.")
 
+        if not 0 < self.confidence < 1:
+            print_error_and_exit("The confidence must be between 0 and 1.")
+        if self.target_ci_width >= 0 and self.evidence != "" and not arguments.rejection:
+            print_error_and_exit("--target-ci-width is supported only for sampling without evidence and rejection sampling.")
+
         results : 'list[tuple[float,float]]' = []
+        counts_results : 'list[tuple[tuple[int,int,int,int],int,tuple[int,int]]]' = []
         # set the number of samples per process
         self.interface.n_samples = int(self.samples / self.processes)
+        # every process stops on its own samples: the intervals computed
+        # on the samples of all the processes are about sqrt(processes)
+        # times tighter
+        if self.target_ci_width >= 0:
+            self.interface.target_ci_width = self.target_ci_width * math.sqrt(self.processes)
+        self.interface.confidence = self.confidence
+        self.confidence_intervals = None
+
+        # independent streams of random numbers for the processes
+        seeds = np.random.SeedSequence(self.seed).spawn(self.processes)
+
+        # the processes sampling without evidence and with rejection
+        # sampling share the results of the worlds
+        n_facts = len(self.interface.prob_facts_dict)
+        if self.processes > 1 and (self.evidence == "" or arguments.rejection) and n_facts <= MAX_FACTS:
+            self.interface.shared_cache = SharedWorldsCache(min(self.samples, 2**n_facts))
 
         if self.pedantic:
             print(f"Spawning {self.processes} processes")
-        with multiprocessing.Pool(processes=self.processes) as pool:
-            if self.evidence == "" and (arguments.rejection is False and arguments.mh is False and arguments.gibbs is False):
-                for i in pool.imap_unordered(self.interface.sample_query, [1]*self.processes):
-                    results.append(i)
-                # i = self.interface.sample_query()
-                # results.append(i)
-            elif self.evidence != "":
-                if arguments.rejection:
-                    for i in pool.imap_unordered(self.interface.rejection_sampling, [1]*self.processes):
-                        results.append(i)
-                elif arguments.mh:
-                    for i in pool.imap_unordered(self.interface.mh_sampling, [1]*self.processes):
-                        results.append(i)
-                elif arguments.gibbs:
-                    for i in pool.imap_unordered(self.interface.gibbs_sampling, [arguments.block]*self.processes):
-                        results.append(i)
+        try:
+            with multiprocessing.Pool(processes=self.processes) as pool:
+                if self.evidence == "" and (arguments.rejection is False and arguments.mh is False and arguments.gibbs is False):
+                    for i in pool.imap_unordered(self.interface.sample_query_counts, seeds):
+                        counts_results.append(i)
+                    # i = self.interface.sample_query()
+                    # results.append(i)
+                elif self.evidence != "":
+                    if arguments.rejection:
+                        for i in pool.imap_unordered(self.interface.rejection_sampling_counts, seeds):
+                            counts_results.append(i)
+                    elif arguments.mh:
+                        for i in pool.imap_unordered(self.interface.mh_sampling, seeds):
+                            results.append(i)
+                    elif arguments.gibbs:
+                        for i in pool.starmap(self.interface.gibbs_sampling, [(arguments.block, seed) for seed in seeds]):
+                            results.append(i)
+                    else:
+                        print_error_and_exit("Specify a sampling method")
                 else:
-                    print_error_and_exit("Specify a sampling method")
-            else:
-                print_error_and_exit("Missing evidence")
-
+                    print_error_and_exit("Missing evidence")
+                # the processes exit normally and close their
+                # attachments to the shared cache
+                pool.close()
+                pool.join()
+        finally:
+            if self.interface.shared_cache is not None:
+                self.interface.shared_cache.close()
+                self.interface.shared_cache = None
+
+        if len(counts_results) > 0:
+            # the counts of the processes are summed
+            counts : 'tuple[int,int,int,int]' = tuple(map(sum, zip(*(c for c, _, _ in counts_results))))  # type: ignore
+            self.taken_samples = sum(n_taken for _, n_taken, _ in counts_results)
+            self.confidence_intervals = get_lp_up_intervals(counts, self.confidence)
+            lookups = sum(stats[0] for _, _, stats in counts_results)
+            if self.verbose and lookups > 0:
+                hits = sum(stats[1] for _, _, stats in counts_results)
+                print(f"Shared cache: {hits} hits out of {lookups} lookups (hit rate {hits / lookups})")
+            if self.pedantic:
+                print(f"Results: {counts_results}")
+            return get_lp_up_from_counts(counts)
+
+        self.taken_samples = self.interface.n_samples * self.processes
         if self.pedantic:
             print(f"Results: {results}")
         return statistics.mean([result[0] for result in results]), statistics.mean([result[1] for result in results])
 
 
-    def setup_interface(self, from_string : str = "", approx : bool = False) -> None:
+    def setup_interface(
+        self,
+        from_string : str = "",
+        approx : bool = False,
+        streaming : bool = False,
+        logspace : bool = False,
+        many_queries : bool = False,
+        sliced : bool = False
+        ) -> None:
         '''
-        Setup clingo interface
+        Setup clingo interface.
+        If many_queries, the rules for the queries are added by
+        the interface (see inference_many).
+        If sliced, the probabilistic facts irrelevant to the query
+        and the evidence are removed.
         '''
-        self.parser = PastaParser(self.filename, self.query, self.evidence, self.for_asp_solver, self.naive_dt, self.lpmln)
+        query = "__placeholder__" if many_queries else self.query
+        self.parser = PastaParser(self.filename, query, self.evidence, self.for_asp_solver, self.naive_dt, self.lpmln)
         self.parser.parse(from_string, approx)
+        if many_queries:
+            self.parser.query = ""
 
-        if self.minimal is False:
+        if self.minimal is False or many_queries:
             content_find_minimal_set = []
         else:
             content_find_minimal_set = self.parser.get_content_to_compute_minimal_set_facts()
 
         asp_program = self.parser.get_asp_program(self.lpmln)
+        prob_facts = self.parser.probabilistic_facts
+        self.consistency_factor = 1
+        if sliced and not (approx or many_queries or self.lpmln or self.for_asp_solver or self.pedantic):
+            if self.minimal:
+                # the minimal set would be computed on the whole program
+                print_error_and_exit("Cannot use --minimal and --slice.")
+            asp_program, prob_facts, irrelevant, self.consistency_factor = slice_program(asp_program, prob_facts)
+            if self.verbose:
+                print(f"Irrelevant probabilistic facts: {irrelevant}")
+                print(f"Probability that the other components have an answer set: {self.consistency_factor}")
+            if self.consistency_factor < 1 and self.stop_if_inconsistent and not self.normalize_prob:
+                print_error_and_exit(f"Found worlds without answer sets (probability {1 - self.consistency_factor}).")
 
         # if not self.consider_lower_prob and self.query != "":
         #     asp_program.append(f":- not {self.query}.")
 
         self.interface = AspInterface(
-            self.parser.probabilistic_facts,
+            prob_facts,
             asp_program,
             self.evidence,
             content_find_minimal_set,
@@ -370,10 +526,17 @@ class Pasta:
             # constraints=self.parser.constraints_list,
             # objective_function=self.parser.objective_function,
             optimizable_facts=self.parser.optimizable_facts,
-            reducible_facts=self.parser.reducible_facts
+            reducible_facts=self.parser.reducible_facts,
+            streaming=streaming,
+            logspace=logspace,
+            solver_config=self.solver_config,
+            cache_dir=self.cache_dir,
+            seed=self.seed
         )
 
-        if self.minimal:
+        self.interface.missing_worlds_page = self.missing_page
+
+        if self.minimal and not many_queries:
             self.interface.compute_minimal_set_facts()
 
         if self.pedantic and self.minimal:
@@ -497,17 +660,120 @@ class Pasta:
         '''
         Exact inference
         '''
-        self.setup_interface(from_string)
+        self.setup_interface(from_string, streaming=self.streaming, logspace=self.logspace, sliced=self.slicing)
         # self.interface.identify_useless_variables()
-        self.interface.compute_probabilities()
+        if self.processes > 1:
+            self.parallel_inference()
+        else:
+            self.interface.compute_probabilities(aggregate_cached=True)
         lp = self.interface.lower_probability_query
         up = self.interface.upper_probability_query
+        if self.evidence == "" and not self.normalize_prob:
+            # the components removed by the slicer multiply the
+            # probability of the worlds with an answer set
+            lp *= self.consistency_factor
+            up *= self.consistency_factor
+        if self.slicing and self.verbose:
+            # the component of the query and the removed ones
+            p_consistent = self.interface.consistent_prob * self.consistency_factor
+            print(f"Probability that the program has an answer set: {p_consistent}")
 
         check_lp_up(lp, up)
 
         return lp, up
 
     
+    def parallel_inference(self) -> None:
+        '''
+        Exact inference where the worlds are split into cubes, by
+        fixing the value of some probabilistic facts, and each cube
+        is enumerated by a different process.
+        '''
+        if self.processes > 16:
+            print_error_and_exit("Too many processes, max 16 for safety.")
+
+        if self.interface.load_cached_worlds(aggregate_cached=True):
+            self.interface.compute_probabilities_from_worlds()
+            return
+
+        cubes = self.interface.get_cubes(self.processes)
+        if self.pedantic:
+            print(f"Spawning {self.processes} processes for {len(cubes)} cubes")
+        with multiprocessing.Pool(processes=self.processes) as pool:
+            results = list(pool.imap_unordered(self.interface.compute_probabilities_cube, cubes))
+        self.interface.merge_cubes(results)
+
+
+    def anytime_inference(self, epsilon : float, from_string : str = "") -> 'tuple[tuple[float,float],tuple[float,float]]':
+        '''
+        Exact inference that stops when the bounds on the lower and
+        on the upper probability differ by less than epsilon: the most
+        probable worlds are computed first and the worlds not computed
+        can contribute with at most their total probability.
+        Returns the (min, max) bounds for the lower and for the upper
+        probability, that contain the exact values.
+        With normalization, the bounds of a stopped enumeration are
+        not divided by the normalizing factor, that is not known yet:
+        they also contain the normalized values, since the normalizing
+        factor is at least the probability of the computed worlds.
+        If the enumeration completes, the values are normalized as in
+        inference.
+        '''
+        if epsilon <= 0:
+            print_error_and_exit("Epsilon must be greater than 0.")
+        if self.lpmln or self.aspmc:
+            print_error_and_exit("Anytime inference is available only for the credal semantics.")
+        if self.pedantic:
+            print_error_and_exit("Anytime inference does not store the worlds, cannot be used with --pedantic.")
+        self.setup_interface(from_string, streaming=True, logspace=self.logspace)
+        # the bounds are computed from the streamed worlds
+        self.interface.streaming = True
+        self.interface.anytime_epsilon = epsilon
+        self.interface.compute_probabilities()
+        (lp_min, lp_max), (up_min, up_max) = self.interface.anytime_bounds
+        check_lp_up(lp_min, up_max)
+
+        return (lp_min, lp_max), (up_min, up_max)
+
+
+    def compile(self, query : str = "", from_string : str = "") -> CompiledQuery:
+        '''
+        Enumerates the worlds once and returns a CompiledQuery, to
+        compute the lower and upper probability of the query for
+        different probabilities of the facts with evaluate.
+        '''
+        if query:
+            self.query = query
+        # the worlds must be stored
+        self.setup_interface(from_string)
+        self.interface.compute_probabilities()
+        return CompiledQuery(self.interface.model_handler, self.normalize_prob)
+
+
+    def sensitivity(self, query : str = "", from_string : str = "") -> 'dict[str,tuple[float,float]]':
+        '''
+        Computes the partial derivatives of the lower and upper
+        probability of the query with respect to the probability of
+        every probabilistic fact (see CompiledQuery.gradient).
+        '''
+        return self.compile(query, from_string).gradient()
+
+
+    def inference_many(self, queries : 'list[str]', from_string : str = "") -> 'list[tuple[float,float]]':
+        '''
+        Exact inference for many queries with a single enumeration.
+        Returns the lower and upper probability of every query.
+        '''
+        if self.lpmln or self.aspmc:
+            print_error_and_exit("Many queries are available only for the credal semantics.")
+        self.setup_interface(from_string, logspace=self.logspace, many_queries=True)
+        results = self.interface.compute_probabilities_many(queries)
+        for lp, up in results:
+            check_lp_up(lp, up)
+
+        return results
+
+    
     def _get_cnf_aspmc(self, from_string : str = ""):
         '''
         Gets the CNF representation of the program from aspmc.
@@ -588,7 +854,7 @@ class Pasta:
         Most probable explanation (MPE) is MAP where no evidence is present
         i.e., find the world with highest probability where the query is true.
         '''
-        self.setup_interface(from_string)
+        self.setup_interface(from_string, logspace=self.logspace)
         if len(self.parser.map_id_list) == 0:
             print_error_and_exit("Specify at least one map fact.")
         if len(self.parser.map_id_list) == len(self.interface.prob_facts_dict) and not self.consider_lower_prob and not self.stop_if_inconsistent and not self.normalize_prob:
@@ -666,14 +932,14 @@ def main():
         pr = cProfile.Profile()
         pr.enable()
 
-    if args.query == "" and (not args.lpmln) and (args.test is None) and (args.uxor is None) and (args.dtn is None) and (args.dt is None):
+    if args.query == "" and (not args.queries) and (not args.lpmln) and (args.test is None) and (not args.p_inconsistent) and (args.uxor is None) and (args.dtn is None) and (args.dt is None):
         print_error_and_exit("Missing query")
     elif args.lpmln:
         if args.query == "" and not args.all:
             print_error_and_exit("Specify a query or use --all")
         if args.all:
             args.query = "__placeholder__"
-    elif args.test is not None:
+    elif args.test is not None or args.p_inconsistent:
         args.query = "__placeholder__"
     elif args.convert:
         args.query = "asdf"
@@ -717,11 +983,26 @@ def main():
                          naive_dt=args.dtn,
                          lpmln=args.lpmln,
                          processes=args.processes,
-                         aspmc=args.aspmc
+                         aspmc=args.aspmc,
+                         streaming=args.streaming,
+                         logspace=args.logspace,
+                         threads=args.threads,
+                         solver_configuration=args.solver_configuration,
+                         solver_arguments=args.solver_arguments.split(),
+                         autotune=args.autotune,
+                         cache_dir=args.cache_dir,
+                         missing_page=args.missing_page,
+                         slicing=args.slice,
+                         seed=args.seed,
+                         target_ci_width=args.target_ci_width,
+                         confidence=args.confidence
                         )
 
     if args.convert:
         pasta_solver.convert()
+    elif args.p_inconsistent:
+        p_inconsistent, interval = pasta_solver.probability_inconsistent(args.approximate)
+        print_p_inconsistent(p_inconsistent, interval, args.approximate, args.confidence)
     elif args.abduction:
         if args.approximate:
             lower_p, upper_p, abd_explanations = pasta_solver.approximate_abduction(
@@ -749,6 +1030,8 @@ def main():
     elif (args.approximate or args.approximate_hybrid) and not (args.dt or args.dtn or args.dtopt):
         lower_p, upper_p = pasta_solver.approximate_solve(args)
         print_prob(lower_p, upper_p)
+        if pasta_solver.confidence_intervals is not None:
+            print_confidence_intervals(pasta_solver.confidence_intervals, pasta_solver.confidence, pasta_solver.taken_samples)
     elif args.pl:
         pasta_solver.parameter_learning()
     elif args.map:
@@ -778,7 +1061,7 @@ def main():
         best_util, utility_atoms = pasta_solver.decision_theory_improved()
         print(f"Utility: {best_util}\nChoice: {utility_atoms}")
     elif args.test is not None:
-        pasta_solver.test_consistency(args.test == 1)
+        pasta_solver.test_consistency(args.test == 1, sampling=args.test_sampling)
     elif args.uxor:
         pasta_solver.test_unsat_xor(args)
     elif args.optimize or args.cf:
@@ -819,6 +1102,19 @@ def main():
                 print(f"{name}: {sel}")
         else:
             print("Solution not found")
+    elif args.anytime_epsilon > 0:
+        bounds_lp, bounds_up = pasta_solver.anytime_inference(args.anytime_epsilon)
+        print_bounds(bounds_lp, bounds_up)
+    elif args.sensitivity:
+        compiled = pasta_solver.compile()
+        lower_p, upper_p = compiled.evaluate()
+        print_prob(lower_p, upper_p)
+        print_sensitivity(compiled.gradient())
+    elif args.queries:
+        queries = split_queries(args.queries)
+        for query, (lower_p, upper_p) in zip(queries, pasta_solver.inference_many(queries)):
+            print(f"Query: {query}")
+            print_prob(lower_p, upper_p)
     else:
         if args.lpmln:
             prob = pasta_solver.inference_lpmln()
@@ -830,7 +1126,7 @@ def main():
             lower_p, upper_p = pasta_solver.inference()
         if args.lpmln and args.all:
             for w in pasta_solver.interface.model_handler.worlds_dict:
-                print(f"{w}: {pasta_solver.interface.model_handler.worlds_dict[w].prob}")
+                print(f"{' '.join(map(str, w))}: {pasta_solver.interface.model_handler.worlds_dict[w].prob}")
         else:
             print_prob(lower_p, upper_p, args.lpmln)
 
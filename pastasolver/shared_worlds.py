@@ -0,0 +1,143 @@
+'''
+Cache of the sampled worlds shared by the sampling processes (see
+approximate_solve): a world sampled by many processes is solved by
+only one of them.
+The cache is an open addressing hash table in shared memory, keyed
+by the id of the world. Every slot is a single 64 bit word with the
+id (plus one, 0 marks an empty slot) and the result of the world
+(VALUE_BITS bits), so it is written with a single store and the
+processes use the table without locks. If two processes write the
+same slot at the same time, one of the results is lost and that
+world is solved again when sampled: the cache is always correct.
+'''
+
+from multiprocessing import shared_memory, util
+
+import numpy as np
+
+# bits of the result of a world
+VALUE_BITS = 4
+# maximum length of the worlds (the ids and the results fit in a
+# signed 64 bit word)
+MAX_FACTS = 63 - VALUE_BITS - 1
+# bounds on the number of slots of the table
+MIN_SLOTS = 2**10
+MAX_SLOTS = 2**22
+# slots inspected before considering a world not in the cache
+MAX_PROBES = 16
+
+# multiplier of the Fibonacci hashing of the ids
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+MASK_64 = 2**64 - 1
+
+# shared memory blocks attached by this process, by name, with their
+# table: a cache is unpickled for every task of the pool, but each
+# process attaches to the block only once
+attached_blocks : 'dict[str,tuple[shared_memory.SharedMemory,np.ndarray]]' = {}
+
+
+def close_attached_blocks() -> None:
+    '''
+    Closes the shared memory blocks attached by this process. Called
+    when the process exits.
+    '''
+    while len(attached_blocks) > 0:
+        _, (shm, table) = attached_blocks.popitem()
+        del table
+        shm.close()
+
+
+class SharedWorldsCache:
+    '''
+    Hash table of the results of the worlds in shared memory.
+    The worlds are strings of T and F of the same length (see
+    sample_worlds).
+    When pickled (to be sent to the processes of the pool), only the
+    name of the shared memory block is stored: the unpickled object
+    uses the attachment of its process to the same block (see
+    attached_blocks), closed when the process exits.
+    '''
+    def __init__(self, n_worlds : int) -> None:
+        '''
+        Creates a table for (about) n_worlds worlds.
+        '''
+        self.n_slots : int = MIN_SLOTS
+        while self.n_slots < 2 * n_worlds and self.n_slots < MAX_SLOTS:
+            self.n_slots *= 2
+        self.shm = shared_memory.SharedMemory(create=True, size=self.n_slots * 8)
+        self.table : np.ndarray = np.ndarray((self.n_slots,), dtype=np.int64, buffer=self.shm.buf)
+        self.table[:] = 0
+        self.owner : bool = True
+        # lookups and hits of this process
+        self.lookups : int = 0
+        self.hits : int = 0
+
+
+    def __getstate__(self) -> 'dict[str,str|int]':
+        return {"name": self.shm.name, "n_slots": self.n_slots}
+
+
+    def __setstate__(self, state : 'dict[str,str|int]') -> None:
+        self.n_slots = int(state["n_slots"])
+        name = str(state["name"])
+        if name not in attached_blocks:
+            if len(attached_blocks) == 0:
+                util.Finalize(None, close_attached_blocks, exitpriority=10)
+            shm = shared_memory.SharedMemory(name=name)
+            attached_blocks[name] = (shm, np.ndarray((self.n_slots,), dtype=np.int64, buffer=shm.buf))
+        self.shm, self.table = attached_blocks[name]
+        self.owner = False
+        self.lookups = 0
+        self.hits = 0
+
+
+    def get_slot(self, key : int) -> int:
+        '''
+        Index of the first slot for the key.
+        '''
+        return ((key * HASH_MULTIPLIER) & MASK_64) >> (64 - self.n_slots.bit_length() + 1)
+
+
+    def get(self, w_id : str) -> 'int|None':
+        '''
+        Returns the result of the world, None if not in the cache.
+        '''
+        self.lookups += 1
+        key = int(w_id.replace('T', '1').replace('F', '0') or '0', 2) + 1
+        slot = self.get_slot(key)
+        for _ in range(MAX_PROBES):
+            entry = int(self.table[slot])
+            if entry == 0:
+                return None
+            if entry >> VALUE_BITS == key:
+                self.hits += 1
+                return entry & (2**VALUE_BITS - 1)
+            slot = (slot + 1) & (self.n_slots - 1)
+        return None
+
+
+    def put(self, w_id : str, value : int) -> None:
+        '''
+        Stores the result of the world (less than 2**VALUE_BITS).
+        If the slots for the world are full, it is not stored.
+        '''
+        key = int(w_id.replace('T', '1').replace('F', '0') or '0', 2) + 1
+        slot = self.get_slot(key)
+        for _ in range(MAX_PROBES):
+            entry = int(self.table[slot])
+            if entry == 0 or entry >> VALUE_BITS == key:
+                self.table[slot] = (key << VALUE_BITS) | value
+                return
+            slot = (slot + 1) & (self.n_slots - 1)
+
+
+    def close(self) -> None:
+        '''
+        Releases the shared memory and removes it, if created by this
+        process. The attachments of the other processes are closed
+        when they exit (see close_attached_blocks).
+        '''
+        del self.table
+        if self.owner:
+            self.shm.close()
+            self.shm.unlink()
@@ -0,0 +1,195 @@
+'''
+Relevance slicing and decomposition of a program before exact inference.
+The ground program is split into the components of the graph where
+two atoms are connected if they appear in the same rule: the worlds
+factorize over the components. The probabilistic facts outside the
+component of the query and of the evidence cannot change the answer
+sets of that component, so they are removed from the program, halving
+the number of worlds to enumerate for every one of them.
+The other components matter only through the probability that they
+have an answer set, which multiplies the lower and upper probability.
+A component has an answer set for every world if it has no constraints
+and default negation is applied only to probabilistic facts (safe
+component): its facts are set to false. The other components are
+solved separately, by enumerating their worlds, and their facts are
+set to the values of a world with an answer set.
+'''
+
+import clingo
+
+from . import utils
+from .generator import Generator
+
+# atoms of the query and of the evidence in the exact encoding
+ROOT_SYMBOLS = [clingo.Function(name) for name in ["q", "nq", "e", "ne"]]
+
+
+class Component:
+    '''
+    Component of the ground program not connected to the query.
+    Every rule is stored as (choice, head, body, lower bound), where
+    the body is a list of (literal, weight) and the lower bound is
+    None for normal rules.
+    '''
+    def __init__(self) -> None:
+        self.facts : 'dict[str,int]' = {}
+        self.rules : 'list[tuple[bool,list[int],list[tuple[int,int]],int|None]]' = []
+        self.safe : bool = True
+
+
+def get_components(asp_program : 'list[str]', prob_facts : 'dict[str,float]') -> 'list[Component]':
+    '''
+    Grounds the program and returns the components that are not
+    connected to the query and the evidence and contain probabilistic
+    facts. If there is no query (nor evidence), returns no components.
+    '''
+    rules : 'list[tuple[bool,list[int],list[tuple[int,int]],int|None]]' = []
+    parent : 'dict[int,int]' = {}
+
+    def find(atom : int) -> int:
+        parent.setdefault(atom, atom)
+        while parent[atom] != atom:
+            parent[atom] = parent[parent[atom]]
+            atom = parent[atom]
+        return atom
+
+    class RulesObserver:
+        '''
+        Collects the ground rules.
+        '''
+        def rule(self, choice : bool, head : 'list[int]', body : 'list[int]') -> None:
+            rules.append((choice, head, [(lit, 1) for lit in body], None))
+
+        def weight_rule(self, choice : bool, head : 'list[int]', lower_bound : int, body : 'list[tuple[int,int]]') -> None:
+            rules.append((choice, head, body, lower_bound))
+
+    ctl = clingo.Control(["-Wnone"])
+    ctl.register_observer(RulesObserver())
+    try:
+        for clause in asp_program:
+            ctl.add('base', [], clause)
+        ctl.ground([("base", [])])
+    except RuntimeError:
+        utils.print_error_and_exit('Syntax error, parsing failed.')
+
+    facts_atoms : 'dict[str,int]' = {}
+    for fact in prob_facts:
+        atom = ctl.symbolic_atoms[clingo.parse_term(fact)]
+        if atom is not None and not atom.is_fact:
+            facts_atoms[fact] = atom.literal
+    facts_literals = set(facts_atoms.values())
+
+    for _, head, body, _ in rules:
+        atoms = head + [abs(lit) for lit, _ in body]
+        for atom in atoms[1:]:
+            parent[find(atom)] = find(atoms[0])
+
+    roots = set()
+    for symbol in ROOT_SYMBOLS:
+        atom = ctl.symbolic_atoms[symbol]
+        if atom is not None and not atom.is_fact:
+            roots.add(find(atom.literal))
+    if len(roots) == 0:
+        return []
+
+    components : 'dict[int,Component]' = {}
+    for fact, atom in facts_atoms.items():
+        if find(atom) not in roots:
+            components.setdefault(find(atom), Component()).facts[fact] = atom
+    for choice, head, body, lower_bound in rules:
+        atoms = head + [abs(lit) for lit, _ in body]
+        if len(atoms) == 0 or find(atoms[0]) not in components:
+            continue
+        component = components[find(atoms[0])]
+        component.rules.append((choice, head, body, lower_bound))
+        if not (choice or len(head) > 0) or any(weight < 0 or (lit < 0 and -lit not in facts_literals) for lit, weight in body):
+            component.safe = False
+
+    return list(components.values())
+
+
+def get_irrelevant_facts(asp_program : 'list[str]', prob_facts : 'dict[str,float]') -> 'list[str]':
+    '''
+    Returns the probabilistic facts (in the order of prob_facts)
+    of the safe components.
+    '''
+    irrelevant : 'set[str]' = set()
+    for component in get_components(asp_program, prob_facts):
+        if component.safe:
+            irrelevant.update(component.facts)
+    return [fact for fact in prob_facts if fact in irrelevant]
+
+
+def solve_component(component : Component, prob_facts : 'dict[str,float]') -> 'tuple[float,dict[str,bool]|None]':
+    '''
+    Enumerates the worlds of a component (its ground rules are
+    added to a new control). Returns the probability that it has
+    an answer set and a world with an answer set (None if there
+    are no such worlds).
+    '''
+    ctl = clingo.Control(["0", "--project", "-Wnone"])
+    atoms : 'dict[int,int]' = {}
+    with ctl.backend() as backend:
+        def get_atom(atom : int) -> int:
+            if atom not in atoms:
+                atoms[atom] = backend.add_atom()
+            return atoms[atom]
+
+        def get_literal(lit : int) -> int:
+            return get_atom(lit) if lit > 0 else -get_atom(-lit)
+
+        for choice, head, body, lower_bound in component.rules:
+            new_head = [get_atom(atom) for atom in head]
+            if lower_bound is None:
+                backend.add_rule(new_head, [get_literal(lit) for lit, _ in body], choice)
+            else:
+                backend.add_weight_rule(new_head, lower_bound, [(get_literal(lit), weight) for lit, weight in body], choice)
+        backend.add_project([get_atom(atom) for atom in component.facts.values()])
+
+    p_consistent = 0.0
+    witness : 'dict[str,bool]|None' = None
+    with ctl.solve(yield_=True) as handle:  # type: ignore
+        for m in handle:  # type: ignore
+            world = {fact: m.is_true(atoms[atom]) for fact, atom in component.facts.items()}  # type: ignore
+            prob = 1.0
+            for fact, value in world.items():
+                prob *= prob_facts[fact] if value else 1 - prob_facts[fact]
+            p_consistent += prob
+            if witness is None:
+                witness = world
+
+    return p_consistent, witness
+
+
+def slice_program(
+    asp_program : 'list[str]',
+    prob_facts : 'dict[str,float]'
+    ) -> 'tuple[list[str],dict[str,float],list[str],float]':
+    '''
+    Removes the probabilistic facts of the components not connected to
+    the query and the evidence: they are set to false (safe components)
+    or to the values of a world with an answer set. Returns the program,
+    the remaining probabilistic facts, the removed ones, and the
+    probability that the removed components have an answer set.
+    '''
+    to_remove : 'set[str]' = set()
+    new_clauses : 'list[str]' = []
+    removed : 'set[str]' = set()
+    p_consistent = 1.0
+
+    for component in get_components(asp_program, prob_facts):
+        if not component.safe:
+            p_component, witness = solve_component(component, prob_facts)
+            if witness is None:
+                # no world has an answer set: keep the facts, the program
+                # is pathological
+                continue
+            p_consistent *= p_component
+            new_clauses.extend(f"{fact}." for fact, value in witness.items() if value)
+        removed.update(component.facts)
+        for fact in component.facts:
+            to_remove.update(Generator.generate_clauses_for_facts(fact))
+
+    sliced_program = [clause for clause in asp_program if clause not in to_remove] + new_clauses
+    sliced_facts = {fact: prob for fact, prob in prob_facts.items() if fact not in removed}
+    return sliced_program, sliced_facts, [fact for fact in prob_facts if fact in removed], p_consistent
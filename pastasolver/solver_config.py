@@ -0,0 +1,173 @@
+'''
+Configuration of the clingo solver: number of threads, configuration
+portfolio, additional options, and per-task settings (TASK_DEFAULTS,
+or selected by timing some configurations on the program with the
+auto-tuner).
+'''
+
+import time
+
+import clingo
+
+from . import utils
+
+# tasks with different default settings
+ENUMERATION_TASK = "enumeration"
+OPTIMIZATION_TASK = "optimization"
+
+# settings of every task, when not selected by the auto-tuner: the
+# projected enumeration of the worlds uses the configuration for ASP
+# problems (it does not depend on the first model), MPE uses
+# core-guided optimization
+TASK_DEFAULTS : 'dict[str,list[str]]' = {
+    ENUMERATION_TASK: ["--configuration=tweety"],
+    OPTIMIZATION_TASK: ["--opt-strategy=usc"]
+}
+
+# configurations compared by the auto-tuner
+AUTOTUNE_CANDIDATES : 'dict[str,list[list[str]]]' = {
+    ENUMERATION_TASK: [
+        ["--configuration=tweety"],
+        ["--configuration=frumpy"],
+        ["--configuration=jumpy"],
+        ["--configuration=trendy"]
+    ],
+    OPTIMIZATION_TASK: [
+        ["--opt-strategy=usc"],
+        ["--opt-strategy=bb"],
+        ["--configuration=trendy", "--opt-strategy=usc"],
+        ["--configuration=crafty", "--opt-strategy=bb"]
+    ]
+}
+
+# the auto-tuner stops a configuration after this number of
+# models (enumeration) or this number of seconds
+AUTOTUNE_MODELS = 1000
+AUTOTUNE_TIME_LIMIT = 1.0
+
+
+def merge_arguments(arguments : 'list[str]', new_arguments : 'list[str]') -> 'list[str]':
+    '''
+    Adds new_arguments to arguments: an option already present
+    (--name=value) is replaced, since clingo does not accept
+    multiple occurrences of the same option.
+    '''
+    merged = list(arguments)
+    for argument in new_arguments:
+        name = argument.split('=')[0]
+        if argument.startswith("--"):
+            merged = [el for el in merged if el.split('=')[0] != name]
+        merged.append(argument)
+    return merged
+
+
+class SolverConfig:
+    '''
+    Options for clingo.
+    Parameters:
+        - threads: number of threads (--parallel-mode)
+        - configuration: configuration portfolio (--configuration),
+          overrides the one of the task
+        - extra_arguments: other options for clingo, added last
+        - autotune: select the settings of every task by timing the
+          candidates in AUTOTUNE_CANDIDATES (otherwise, the ones in
+          TASK_DEFAULTS are used)
+    '''
+    def __init__(self,
+        threads : int = 1,
+        configuration : str = "",
+        extra_arguments : 'list[str]' = [],
+        autotune : bool = False,
+        verbose : bool = False
+        ) -> None:
+        if threads < 1:
+            utils.print_error_and_exit("The number of threads must be at least 1.")
+        self.threads : int = threads
+        self.configuration : str = configuration
+        self.extra_arguments : 'list[str]' = extra_arguments
+        self.autotune : bool = autotune
+        self.verbose : bool = verbose
+        # settings selected by the auto-tuner, for every task
+        self.tuned : 'dict[str,list[str]]' = {}
+
+
+    def get_arguments(self,
+        task : str,
+        arguments : 'list[str]',
+        clauses : 'list[str]' = [],
+        sequential : bool = False
+        ) -> 'list[str]':
+        '''
+        Returns the arguments for clingo for the task, adding the
+        settings of the task (tuned or from TASK_DEFAULTS) and the
+        configuration to the base arguments. If sequential, a single
+        thread is used (for example, when the models must be
+        enumerated in order). The clauses are needed for the auto-tuner.
+        '''
+        if self.autotune and task not in self.tuned and len(clauses) > 0:
+            self.tuned[task] = self.tune(task, arguments, clauses, sequential)
+        settings = self.tuned.get(task, TASK_DEFAULTS[task])
+
+        res = merge_arguments(arguments, settings)
+        if self.configuration:
+            res = merge_arguments(res, [f"--configuration={self.configuration}"])
+        if self.threads > 1 and not sequential:
+            res = merge_arguments(res, [f"--parallel-mode={self.threads}"])
+        return merge_arguments(res, self.extra_arguments)
+
+
+    def tune(self,
+        task : str,
+        arguments : 'list[str]',
+        clauses : 'list[str]',
+        sequential : bool
+        ) -> 'list[str]':
+        '''
+        Times the candidate settings of the task on the program and
+        returns the fastest one. Every candidate grounds the whole
+        program in a new control (the learned constraints of a solve
+        call would speed up the following ones) and is stopped after
+        AUTOTUNE_MODELS models or AUTOTUNE_TIME_LIMIT seconds: in the
+        latter case, the candidate computing more models wins.
+        '''
+        best_settings : 'list[str]' = TASK_DEFAULTS[task]
+        best_score : 'tuple[float,float]' = (float("inf"), 0)
+
+        for settings in AUTOTUNE_CANDIDATES[task]:
+            candidate = merge_arguments(arguments, settings)
+            if self.threads > 1 and not sequential:
+                candidate = merge_arguments(candidate, [f"--parallel-mode={self.threads}"])
+            candidate = merge_arguments(candidate, self.extra_arguments)
+            ctl = clingo.Control(candidate)
+            try:
+                for clause in clauses:
+                    ctl.add('base', [], clause)
+                ctl.ground([("base", [])])
+            except RuntimeError:
+                utils.print_error_and_exit('Syntax error, parsing failed.')
+
+            n_models = 0
+            def on_model(_ : clingo.Model) -> bool:
+                nonlocal n_models
+                n_models += 1
+                return task == OPTIMIZATION_TASK or n_models < AUTOTUNE_MODELS
+
+            start_time = time.time()
+            with ctl.solve(on_model=on_model, async_=True) as handle:  # type: ignore
+                finished = handle.wait(AUTOTUNE_TIME_LIMIT)  # type: ignore
+                if not finished:
+                    handle.cancel()  # type: ignore
+            elapsed = time.time() - start_time
+
+            # finished candidates are compared by time, the other
+            # ones by number of models computed
+            score = (elapsed, 0) if finished else (float("inf"), -n_models)
+            if self.verbose:
+                print(f"Configuration {' '.join(settings)}: {n_models} models in {elapsed:.3f} s")
+            if score < best_score:
+                best_score = score
+                best_settings = settings
+
+        if self.verbose:
+            print(f"Selected configuration for {task}: {' '.join(best_settings)}")
+        return best_settings
@@ -95,12 +95,53 @@ def clean_term(term: str) -> 'tuple[str,bool]':
     return term, positive
 
 
-def sum_string_list(bl: 'list[str]') -> 'list[int]':
+def split_queries(queries : str) -> 'list[str]':
     '''
-    Sums the elements in the same position of a list of 01-strings.
-    Example: ["011","111"] -> [1,2,2]
+    Splits a comma separated list of queries, ignoring the commas
+    inside parentheses.
+    Example: "path(1,4),fly(1)" -> ["path(1,4)", "fly(1)"]
     '''
-    return list(map(lambda n : sum(int(x) for x in n), zip(*bl)))
+    splitted : 'list[str]' = []
+    depth = 0
+    current = ""
+    for char in queries:
+        if char == ',' and depth == 0:
+            splitted.append(current.strip())
+            current = ""
+        else:
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            current += char
+    splitted.append(current.strip())
+    return [query for query in splitted if len(query) > 0]
+
+
+def sum_bits_list(bl: 'list[int]', n_bits : int) -> 'list[int]':
+    '''
+    Sums the bits in the same position of a list of integer ids
+    of n_bits bits (most significant bit first).
+    Example: ([0b011,0b111], 3) -> [1,2,2]
+    '''
+    return [sum((el >> (n_bits - 1 - i)) & 1 for el in bl) for i in range(n_bits)]
+
+
+def world_id_to_str(w_id : int, n_bits : int) -> str:
+    '''
+    Converts an integer world id into the 01-string used for printing:
+    the i-th character is the truth value of the i-th fact.
+    Example: (5, 4) -> "0101"
+    '''
+    return format(w_id, f"0{n_bits}b") if n_bits > 0 else ""
+
+
+def is_bit_set(w_id : int, index : int, n_bits : int) -> bool:
+    '''
+    Returns True if the fact in position index is true in the world
+    identified by w_id (n_bits facts, most significant bit first).
+    '''
+    return (w_id >> (n_bits - 1 - index)) & 1 == 1
 
 
 def print_map_state(prob : float, atoms_list : 'list[list[str]]', n_map_vars : int) -> None:
@@ -128,6 +169,57 @@ def print_prob(lp : float, up : float, lpmln : bool = False) -> None:
         print(f"Probability for the query: {lp}")
 
 
+def print_bounds(bounds_lp : 'tuple[float,float]', bounds_up : 'tuple[float,float]') -> None:
+    '''
+    Prints the bounds on the lower and upper probability.
+    '''
+    print(f"Lower probability for the query in [{bounds_lp[0]}, {bounds_lp[1]}]")
+    print(f"Upper probability for the query in [{bounds_up[0]}, {bounds_up[1]}]")
+
+
+def print_confidence_intervals(
+    intervals : 'tuple[tuple[float,float],tuple[float,float]]',
+    confidence : float,
+    n_samples : int
+    ) -> None:
+    '''
+    Prints the confidence intervals of the lower and upper probability
+    computed by sampling.
+    '''
+    print(f"{confidence*100:g}% confidence interval for the lower probability: [{intervals[0][0]}, {intervals[0][1]}]")
+    print(f"{confidence*100:g}% confidence interval for the upper probability: [{intervals[1][0]}, {intervals[1][1]}]")
+    print(f"Samples: {n_samples}")
+
+
+def print_p_inconsistent(
+    p_inconsistent : float,
+    interval : 'tuple[float,float]',
+    approximate : bool = False,
+    confidence : float = 0.95
+    ) -> None:
+    '''
+    Prints the probability of the inconsistent worlds and the
+    normalizing factor (with their confidence intervals, if
+    approximate).
+    '''
+    print(f"Probability of the inconsistent worlds: {p_inconsistent}")
+    if approximate:
+        print(f"{confidence*100:g}% confidence interval: [{interval[0]}, {interval[1]}]")
+    print(f"Normalizing factor: {1 - p_inconsistent}")
+    if approximate:
+        print(f"{confidence*100:g}% confidence interval: [{1 - interval[1]}, {1 - interval[0]}]")
+
+
+def print_sensitivity(gradient : 'dict[str,tuple[float,float]]') -> None:
+    '''
+    Prints the partial derivatives of the lower and upper probability
+    with respect to the probabilities of the facts.
+    '''
+    print("Sensitivity (d lower, d upper):")
+    for fact, (d_lp, d_up) in gradient.items():
+        print(f"{fact}: {d_lp} {d_up}")
+
+
 def remove_dominated_explanations(
         abd_exp: 'list[list[str]]',
         set_inclusion: bool = True
@@ -0,0 +1,151 @@
+'''
+Vectorized computation of the probability of the worlds.
+A world is identified by an integer whose bits are the truth values
+of the probabilistic facts (the first fact is the most significant bit).
+'''
+
+import math
+
+import numpy as np
+
+# number of worlds evaluated at once, to bound the memory needed
+# for the intermediate matrix of log-probabilities
+BATCH_SIZE = 1 << 16
+
+
+def ids_to_matrix(ids : 'list[int]', n_facts : int) -> np.ndarray:
+    '''
+    Converts a list of world ids into a boolean matrix with one row
+    for each world and one column for each probabilistic fact.
+    '''
+    if n_facts < 63:
+        shifts = np.arange(n_facts - 1, -1, -1, dtype=np.int64)
+        ids_array = np.fromiter(ids, dtype=np.int64, count=len(ids))
+        return ((ids_array[:, None] >> shifts) & 1).astype(bool)
+
+    # the ids do not fit into 64 bits: unpack their bytes
+    n_bytes = (n_facts + 7) // 8
+    raw = np.frombuffer(b"".join(w_id.to_bytes(n_bytes, "big") for w_id in ids), dtype=np.uint8)
+    bits = np.unpackbits(raw.reshape(len(ids), n_bytes), axis=1)
+    return bits[:, n_bytes * 8 - n_facts:].astype(bool)
+
+
+def bytes_to_matrix(ids : np.ndarray, n_facts : int) -> np.ndarray:
+    '''
+    Same as ids_to_matrix for ids stored as rows of bytes (big endian,
+    see worlds_cache).
+    '''
+    bits = np.unpackbits(np.asarray(ids, dtype=np.uint8).reshape(ids.shape[0], -1), axis=1)
+    return bits[:, bits.shape[1] - n_facts:].astype(bool)
+
+
+def log_world_probabilities(matrix : np.ndarray, probabilities : 'list[float]') -> np.ndarray:
+    '''
+    Computes the log-probability of every world (row) of the matrix:
+    log P(w) = sum_{f_i true} log(p_i) + sum_{f_i false} log(1 - p_i).
+    A fact with probability 1 (0) gives -inf to the worlds where it
+    is false (true).
+    '''
+    probs = np.asarray(probabilities, dtype=np.float64)
+    with np.errstate(divide="ignore"):
+        log_true = np.log(probs)
+        log_false = np.log1p(-probs)
+
+    result = np.empty(matrix.shape[0], dtype=np.float64)
+    for start in range(0, matrix.shape[0], BATCH_SIZE):
+        chunk = matrix[start:start + BATCH_SIZE]
+        result[start:start + BATCH_SIZE] = np.where(chunk, log_true, log_false).sum(axis=1)
+    return result
+
+
+def world_probabilities(matrix : np.ndarray, probabilities : 'list[float]') -> np.ndarray:
+    '''
+    Computes the probability of every world (row) of the matrix.
+    '''
+    return np.exp(log_world_probabilities(matrix, probabilities))
+
+
+def ids_probabilities(ids : 'list[int]', probabilities : 'list[float]') -> np.ndarray:
+    '''
+    Computes the probability of the worlds identified by ids, where
+    probabilities are the probabilities of the facts, in order.
+    '''
+    return world_probabilities(ids_to_matrix(ids, len(probabilities)), probabilities)
+
+
+def log_sum_exp(log_values : np.ndarray) -> float:
+    '''
+    Computes log(sum(exp(log_values))) without underflow.
+    Returns -inf for an empty array.
+    '''
+    if log_values.size == 0:
+        return -math.inf
+    max_value = float(log_values.max())
+    if max_value == -math.inf:
+        return -math.inf
+    return max_value + math.log(float(np.exp(log_values - max_value).sum()))
+
+
+def log_add(log_a : float, log_b : float) -> float:
+    '''
+    Computes log(exp(log_a) + exp(log_b)) without underflow.
+    '''
+    if log_a < log_b:
+        log_a, log_b = log_b, log_a
+    if log_b == -math.inf:
+        return log_a
+    return log_a + math.log1p(math.exp(log_b - log_a))
+
+
+def world_probabilities_many(matrix : np.ndarray, probabilities : np.ndarray) -> np.ndarray:
+    '''
+    Computes the probability of every world (row) of the matrix for
+    every vector of probabilities of the facts (row of probabilities).
+    Returns a matrix with one row for each world and one column for
+    each vector. The log-probabilities are summed with a matrix
+    product, where log(0) is replaced by a finite value small enough
+    to give probability 0 also when summed for all the facts.
+    '''
+    probs = np.asarray(probabilities, dtype=np.float64).reshape(-1, matrix.shape[1])
+    floor = np.finfo(np.float64).min / (matrix.shape[1] + 1)
+    with np.errstate(divide="ignore"):
+        log_true = np.maximum(np.log(probs), floor)
+        log_false = np.maximum(np.log1p(-probs), floor)
+
+    result = np.empty((matrix.shape[0], probs.shape[0]), dtype=np.float64)
+    for start in range(0, matrix.shape[0], BATCH_SIZE):
+        chunk = matrix[start:start + BATCH_SIZE].astype(np.float64)
+        result[start:start + BATCH_SIZE] = np.exp(chunk @ log_true.T + (1 - chunk) @ log_false.T)
+    return result
+
+
+def sums_gradient(matrix : np.ndarray, probabilities : 'list[float]', weights : np.ndarray) -> np.ndarray:
+    '''
+    Computes the gradient, with respect to the probabilities of the
+    facts, of the weighted sums of the probabilities of the worlds
+    sum_w weights[k,w] * P(w), for every row k of weights.
+    The derivative of P(w) with respect to p_i is the product of the
+    factors of the other facts, with sign + if f_i is true in w and -
+    otherwise: the exclusive products are computed with prefix and
+    suffix products, so they are exact also when some p_i is 0 or 1.
+    Returns a matrix with one row for each row of weights and one
+    column for each fact.
+    '''
+    probs = np.asarray(probabilities, dtype=np.float64)
+    n_facts = probs.shape[0]
+    weights = np.asarray(weights, dtype=np.float64).reshape(-1, matrix.shape[0])
+    result = np.zeros((weights.shape[0], n_facts), dtype=np.float64)
+
+    for start in range(0, matrix.shape[0], BATCH_SIZE):
+        chunk = matrix[start:start + BATCH_SIZE]
+        factors = np.where(chunk, probs, 1 - probs)
+        # prefix[:, i] = product of the factors before i,
+        # suffix[:, i] = product of the factors after i
+        prefix = np.ones_like(factors)
+        suffix = np.ones_like(factors)
+        if n_facts > 1:
+            prefix[:, 1:] = np.cumprod(factors[:, :-1], axis=1)
+            suffix[:, :-1] = np.cumprod(factors[:, :0:-1], axis=1)[:, ::-1]
+        derivatives = np.where(chunk, 1.0, -1.0) * prefix * suffix
+        result += weights[:, start:start + BATCH_SIZE] @ derivatives
+    return result
@@ -0,0 +1,112 @@
+'''
+On-disk cache of the enumerated worlds.
+The key is the hash of the ASP program (that contains the rules for
+the query), of the probabilistic facts (in order, since they define
+the id of the worlds), and of the evidence.
+For every world only the id and the counts of the models are
+stored, so the probabilities of the facts can change without
+invalidating the cache. The arrays are memory mapped when loaded and
+the worlds are aggregated with NumPy (see
+ModelsHandler.add_cached_worlds), without building the World objects.
+'''
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .models_handler import World
+
+# change it when the format of the files changes
+CACHE_VERSION = 1
+
+IDS_FILE = "ids.npy"
+COUNTS_FILE = "counts.npy"
+INFO_FILE = "info.json"
+
+
+def get_key(
+    clauses : 'list[str]',
+    prob_facts : 'list[str]',
+    evidence : str
+    ) -> str:
+    '''
+    Computes the key of a program.
+    '''
+    content = json.dumps([CACHE_VERSION, clauses, prob_facts, evidence])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def load_worlds(cache_dir : str, key : str) -> 'tuple[np.ndarray,np.ndarray,int]|None':
+    '''
+    Loads the worlds stored with key. Returns the (memory mapped)
+    arrays of the ids, with a row of bytes for every world, and of
+    the counts of the models (query, not query, all), and the number
+    of computed models, or None if they are not in the cache.
+    '''
+    path = os.path.join(cache_dir, key)
+    if not os.path.isfile(os.path.join(path, INFO_FILE)):
+        return None
+
+    with open(os.path.join(path, INFO_FILE), encoding="utf-8") as info_file:
+        info = json.load(info_file)
+    ids = np.load(os.path.join(path, IDS_FILE), mmap_mode="r")
+    counts = np.load(os.path.join(path, COUNTS_FILE), mmap_mode="r")
+
+    return ids, counts, info["computed_models"]
+
+
+def to_worlds_dict(ids : np.ndarray, counts : np.ndarray) -> 'dict[int,World]':
+    '''
+    Builds the worlds (with probability 0) from the arrays returned by
+    load_worlds, when they must be stored one by one (pedantic mode).
+    '''
+    worlds_dict : 'dict[int,World]' = {}
+    for id_bytes, (mqc, mnqc, mc) in zip(ids, counts.tolist()):
+        w = World(0)
+        w.model_query_count = mqc
+        w.model_not_query_count = mnqc
+        w.model_count = mc
+        worlds_dict[int.from_bytes(id_bytes.tobytes(), "big")] = w
+    return worlds_dict
+
+
+def store_worlds(
+    cache_dir : str,
+    key : str,
+    worlds_dict : 'dict[int,World]',
+    n_facts : int,
+    computed_models : int
+    ) -> None:
+    '''
+    Stores the worlds with key. The ids are stored as rows of
+    bytes (big endian), to support any number of facts.
+    The files are written in a temporary directory that is then
+    renamed, so a cache entry is never read half written.
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key)
+    if os.path.isdir(path):
+        return
+
+    n_bytes = max(1, (n_facts + 7) // 8)
+    ids = np.frombuffer(b"".join(w_id.to_bytes(n_bytes, "big") for w_id in worlds_dict), dtype=np.uint8)
+    counts = np.array(
+        [(w.model_query_count, w.model_not_query_count, w.model_count) for w in worlds_dict.values()],
+        dtype=np.int64
+    )
+
+    tmp_path = tempfile.mkdtemp(dir=cache_dir)
+    np.save(os.path.join(tmp_path, IDS_FILE), ids.reshape(len(worlds_dict), n_bytes))
+    np.save(os.path.join(tmp_path, COUNTS_FILE), counts.reshape(len(worlds_dict), 3))
+    with open(os.path.join(tmp_path, INFO_FILE), "w", encoding="utf-8") as info_file:
+        json.dump({"n_facts": n_facts, "computed_models": computed_models}, info_file)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # another process stored the same entry
+        for filename in os.listdir(tmp_path):
+            os.remove(os.path.join(tmp_path, filename))
+        os.rmdir(tmp_path)
@@ -1,4 +1,6 @@
 import argparse
+import multiprocessing
+import numpy as np
 import pytest
 
 from pastasolver.pasta_solver import Pasta
@@ -63,3 +65,78 @@ def test_approximate_inference(parameters: ArgumentsTest):
         lp, up = pasta_solver.approximate_solve(args)
         assert almost_equal(lp, parameters.expected_lp), f"{parameters.test_name}: wrong lower probability - E: {parameters.expected_lp}, F: {lp}"
         assert almost_equal(up, parameters.expected_up), f"{parameters.test_name}: wrong upper probability - E: {parameters.expected_up}, F: {up}"
+
+
+@pytest.mark.parametrize("program,expected",[
+    ("0.2::a.\n0.7::b.\nr:- a.", {"a": 0.2, "b": 0.7}),
+    # sampled from the distribution
+    ("c:gaussian(0,1).\nr:- above(c,0.5).", {"c_above_0_5": 0.3085})
+])
+def test_sample_worlds(program : str, expected : 'dict[str,float]'):
+    pasta_solver = Pasta("", "r")
+    pasta_solver.setup_sampling(program, keep_hybrid=True)
+    interface = pasta_solver.interface
+    n_samples = 25_000
+    worlds = list(interface.sample_worlds(n_samples))
+    # distinct worlds in every batch of 10000 samples
+    assert len(worlds) <= 2**len(interface.prob_facts_dict) * 3
+    assert sum(count for _, count in worlds) == n_samples
+    for i, fact in enumerate(interface.prob_facts_dict):
+        frequency = sum(count for w_id, count in worlds if w_id[i] == 'T') / n_samples
+        assert abs(frequency - expected[fact]) < 0.02
+
+
+@pytest.mark.parametrize("filename,query,evidence,method,processes",[
+    ("../examples/inference/bird_4.lp", "fly(1)", "", "", 1),
+    ("../examples/inference/bird_4.lp", "fly(1)", "", "", 2),
+    ("../examples/inference/bird_4.lp", "fly(1)", "bird(2)", "rejection", 2),
+    ("../examples/inference/bird_4.lp", "fly(1)", "bird(2)", "mh", 2),
+    ("../examples/inference/bird_4.lp", "fly(1)", "bird(2)", "gibbs", 2)
+])
+def test_seed(filename : str, query : str, evidence : str, method : str, processes : int):
+    args = argparse.Namespace()
+    args.rejection = method == "rejection"
+    args.mh = method == "mh"
+    args.gibbs = method == "gibbs"
+    args.block = 1
+    args.approximate_hybrid = False
+
+    results = [Pasta(filename, query, evidence, samples=2000, processes=processes, seed=42).approximate_solve(args) for _ in range(2)]
+    assert results[0] == results[1]
+
+
+def test_seed_processes():
+    pasta_solver = Pasta("../examples/inference/bird_10.lp", "fly(1)", samples=2000, processes=2, seed=42)
+    pasta_solver.setup_sampling()
+    pasta_solver.interface.n_samples = 1000
+
+    runs = []
+    for _ in range(2):
+        # the seeds of the processes, as in approximate_solve
+        seeds = np.random.SeedSequence(pasta_solver.seed).spawn(pasta_solver.processes)
+        with multiprocessing.Pool(processes=pasta_solver.processes) as pool:
+            runs.append([counts for counts, _, _ in pool.map(pasta_solver.interface.sample_query_counts, seeds)])
+    # the processes sample different worlds, the same in every run
+    assert runs[0][0] != runs[0][1]
+    assert runs[0] == runs[1]
+
+
+@pytest.mark.parametrize("evidence,method,expected_lp,expected_up",[
+    ("", "", 0.25, 0.5),
+    ("bird(2)", "rejection", 0.125, 0.5)
+])
+def test_target_ci_width(evidence : str, method : str, expected_lp : float, expected_up : float):
+    args = argparse.Namespace()
+    args.rejection = method == "rejection"
+    args.mh = False
+    args.gibbs = False
+    args.approximate_hybrid = False
+
+    pasta_solver = Pasta("../examples/inference/bird_4.lp", "fly(1)", evidence, samples=100_000, seed=42, target_ci_width=0.05)
+    lp, up = pasta_solver.approximate_solve(args)
+    assert pasta_solver.confidence_intervals is not None
+    (lp_min, lp_max), (up_min, up_max) = pasta_solver.confidence_intervals
+    assert pasta_solver.taken_samples < 100_000
+    assert lp_max - lp_min <= 0.05 and up_max - up_min <= 0.05
+    assert lp_min <= lp <= lp_max and up_min <= up <= up_max
+    assert almost_equal(lp, expected_lp, 0.03) and almost_equal(up, expected_up, 0.03)
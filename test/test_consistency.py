@@ -0,0 +1,94 @@
+import pytest
+
+from pastasolver.pasta_solver import Pasta
+from pastasolver.asp_interface import subtract_cube, wilson_interval
+
+from .utils_for_tests import almost_equal
+
+program_inconsistent = '''
+0.3::a.
+0.4::b.
+0.5::c.
+0.6::d.
+h:- a, b.
+r:- c.
+:- c, d, not h.
+'''
+
+program_consistent = '''
+0.3::a.
+0.4::b.
+0.5::c.
+0.6::d.
+h:- a.
+h:- b.
+r:- c.
+'''
+
+
+def expand(cube : str) -> 'set[str]':
+    '''
+    Worlds of a cube returned by the consistency check.
+    '''
+    worlds = {""}
+    for value in cube:
+        worlds = {w + v for w in worlds for v in ("TF" if value == "-" else value)}
+    return worlds
+
+
+@pytest.mark.parametrize("program,expected",[
+    (program_inconsistent, {"FFTT", "FTTT", "TFTT"}),
+    (program_consistent, set()),
+    ("0.5::a.\n0.5::b.\nr:- b.\n:- a.", {"TT", "TF"})
+])
+def test_check_consistency(program : str, expected : 'set[str]'):
+    inconsistent = Pasta("", "r").test_consistency(from_string=program)
+    worlds = set().union(*[expand(cube) for cube in inconsistent])
+    assert worlds == expected
+    # the sampling test finds the same worlds
+    assert set(Pasta("", "r", samples=2000).test_consistency(from_string=program, sampling=True)) == expected
+
+
+def test_check_consistency_few_calls():
+    # the facts b(1..20) do not change the answer sets when a is false
+    # and the worlds where a is true have no answer sets
+    program = "0.5::a.\n" + "".join(f"0.5::b({i}).\n" for i in range(20)) + "r:- a, b(X).\n:- a.\n"
+    pasta_solver = Pasta("", "r")
+    pasta_solver.setup_sampling(program)
+    assert pasta_solver.interface.check_consistency() == (["T" + "-" * 20], 2)
+
+
+@pytest.mark.parametrize("cube,other,expected",[
+    ("T-", "F-", ["T-"]),
+    ("T-", "TF", ["TT"]),
+    ("--", "TF", ["F-", "TT"]),
+    ("T-", "--", [])
+])
+def test_subtract_cube(cube : str, other : str, expected : 'list[str]'):
+    assert subtract_cube(cube, other) == expected
+
+
+@pytest.mark.parametrize("program,expected",[
+    (program_inconsistent, 0.5 * 0.6 * (1 - 0.3 * 0.4)),
+    (program_consistent, 0),
+    # overlapping cubes
+    ("0.2::a.\n0.3::b.\n:- a.\n:- b.", 1 - 0.8 * 0.7)
+])
+def test_probability_inconsistent(program : str, expected : float):
+    p_inconsistent, _ = Pasta("", "r").probability_inconsistent(from_string=program)
+    assert almost_equal(p_inconsistent, expected)
+    p_sampled, (low, high) = Pasta("", "r", samples=5000).probability_inconsistent(True, program)
+    assert low <= p_sampled <= high
+    assert abs(p_sampled - expected) < 0.05
+
+
+def test_probability_inconsistent_confidence():
+    intervals = [Pasta("", "r", samples=5000, seed=42, confidence=confidence).probability_inconsistent(True, program_inconsistent)[1] for confidence in [0.9, 0.99]]
+    assert intervals[0][0] > intervals[1][0] and intervals[0][1] < intervals[1][1]
+
+
+def test_wilson_interval():
+    low, high = wilson_interval(0, 1000)
+    assert almost_equal(low, 0) and 0 < high < 0.005
+    low, high = wilson_interval(500, 1000)
+    assert almost_equal(0.5 - low, high - 0.5)
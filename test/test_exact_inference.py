@@ -3,6 +3,7 @@ import pytest
 from .utils_for_tests import almost_equal
 
 from pastasolver.pasta_solver import Pasta
+from pastasolver.pasta_session import PastaSession
 
 
 @pytest.mark.parametrize("filename,query,evidence,test_name,expected_lp,expected_up,normalize",[
@@ -65,4 +66,247 @@ def test_clique_in_1_exit():
 
 def test_smoke_2_qr_exit():
     with pytest.raises(SystemExit):
-        test_exact_inference("../examples/inference/smoke_2.lp", "qr", "", "smoke_2_qr", 0.055408970976253295, 0.13398746701846967, False)
\ No newline at end of file
+        test_exact_inference("../examples/inference/smoke_2.lp", "qr", "", "smoke_2_qr", 0.055408970976253295, 0.13398746701846967, False)
+
+@pytest.mark.parametrize("filename,query,evidence,normalize",[
+    ("../examples/inference/bird_4.lp", "fly(1)", "", False),
+    ("../examples/inference/bird_4.lp", "fly(1)", "bird(1)", False),
+    ("../examples/inference/bird_10.lp", "fly(1)", "", False),
+    ("../examples/inference/clique.lp", "in(1)", "", True),
+    ("../examples/inference/disjunction.lp", "f", "", False),
+    ("../examples/inference/multiple_ad.lp", "qr", "", False),
+    ("../examples/inference/sick.lp", "sick", "", False)
+])
+def test_streaming_inference(
+    filename : str,
+    query : str,
+    evidence : str,
+    normalize : bool
+    ):
+
+    lp, up = Pasta(filename, query, evidence, normalize_prob = normalize).inference()
+    pasta_solver = Pasta(filename, query, evidence, normalize_prob = normalize, streaming = True)
+    lp_s, up_s = pasta_solver.inference()
+
+    assert len(pasta_solver.interface.model_handler.worlds_dict) == 0
+    assert almost_equal(lp_s, lp), f"{filename}: wrong lower probability - E: {lp}, F: {lp_s}"
+    assert almost_equal(up_s, up), f"{filename}: wrong upper probability - E: {up}, F: {up_s}"
+
+
+@pytest.mark.parametrize("filename,query,evidence,normalize,streaming",[
+    ("../examples/inference/bird_4.lp", "fly(1)", "", False, False),
+    ("../examples/inference/bird_4.lp", "fly(1)", "bird(1)", False, False),
+    ("../examples/inference/bird_10.lp", "fly(1)", "", False, True),
+    ("../examples/inference/clique.lp", "in(1)", "", True, False),
+    ("../examples/inference/clique.lp", "in(1)", "", True, True),
+    ("../examples/inference/sick.lp", "sick", "", False, False)
+])
+def test_logspace_inference(
+    filename : str,
+    query : str,
+    evidence : str,
+    normalize : bool,
+    streaming : bool
+    ):
+
+    lp, up = Pasta(filename, query, evidence, normalize_prob = normalize).inference()
+    lp_l, up_l = Pasta(filename, query, evidence, normalize_prob = normalize, streaming = streaming, logspace = True).inference()
+
+    assert abs(lp_l - lp) < 10e-9, f"{filename}: wrong lower probability - E: {lp}, F: {lp_l}"
+    assert abs(up_l - up) < 10e-9, f"{filename}: wrong upper probability - E: {up}, F: {up_l}"
+
+
+@pytest.mark.parametrize("filename,queries,normalize",[
+    ("../examples/inference/bird_4.lp", [("fly(1)", ""), ("fly(2)", "bird(1)"), ("fly(1)", ""), ("fly(3)", "fly(2)")], False),
+    ("../examples/inference/clique.lp", [("in(1)", ""), ("in(2)", "")], True),
+    ("../examples/inference/sick.lp", [("sick", ""), ("sick", "walk")], False)
+])
+def test_session_inference(
+    filename : str,
+    queries : 'list[tuple[str,str]]',
+    normalize : bool
+    ):
+
+    session = PastaSession(filename, normalize_prob = normalize)
+    for query, evidence in queries:
+        lp, up = Pasta(filename, query, evidence, normalize_prob = normalize).inference()
+        lp_s, up_s = session.inference(query, evidence)
+
+        assert almost_equal(lp_s, lp), f"{filename} {query}: wrong lower probability - E: {lp}, F: {lp_s}"
+        assert almost_equal(up_s, up), f"{filename} {query}: wrong upper probability - E: {up}, F: {up_s}"
+
+
+@pytest.mark.parametrize("filename,queries,evidence,normalize",[
+    ("../examples/inference/bird_4.lp", ["fly(1)", "fly(2)", "nofly(3)"], "", False),
+    ("../examples/inference/bird_4.lp", ["fly(1)", "fly(2)"], "bird(1)", False),
+    ("../examples/inference/clique.lp", ["in(1)", "in(2)", "in(3)"], "", True),
+    ("../examples/inference/transmission.lp", ["qr", "transmit(a,d)", "path(a,f)"], "", False),
+    ("../examples/inference/smoke.lp", ["qry", "smokes(b)"], "smokes(d)", False)
+])
+def test_inference_many(
+    filename : str,
+    queries : 'list[str]',
+    evidence : str,
+    normalize : bool
+    ):
+
+    results = Pasta(filename, "", evidence, normalize_prob = normalize).inference_many(queries)
+    assert len(results) == len(queries)
+    for query, (lp_m, up_m) in zip(queries, results):
+        lp, up = Pasta(filename, query, evidence, normalize_prob = normalize).inference()
+        assert almost_equal(lp_m, lp), f"{filename} {query}: wrong lower probability - E: {lp}, F: {lp_m}"
+        assert almost_equal(up_m, up), f"{filename} {query}: wrong upper probability - E: {up}, F: {up_m}"
+
+
+def test_inference_many_evidence_normalize():
+    # inconsistent when b, c and d are true
+    program = "0.4::a.\n0.6::b.\n0.3::c.\n0.7::d.\nqr:- a, c.\nqs:- b.\nev:- a.\nev:- d.\n:- b, c, d.\n0{x}1:- b."
+    queries = ["qr", "qs", "x"]
+    results = Pasta("", "", "ev", normalize_prob = True).inference_many(queries, program)
+    for query, (lp_m, up_m) in zip(queries, results):
+        lp, up = Pasta("", query, "ev", normalize_prob = True).inference(program)
+        assert almost_equal(lp_m, lp, 10e-8) and almost_equal(up_m, up, 10e-8), f"{query}: E: {(lp, up)}, F: {(lp_m, up_m)}"
+
+
+@pytest.mark.parametrize("lpmln,aspmc",[(True, False), (False, True)])
+def test_inference_many_other_semantics(lpmln : bool, aspmc : bool):
+    with pytest.raises(SystemExit):
+        Pasta("../examples/inference/bird_4.lp", "", lpmln = lpmln, aspmc = aspmc).inference_many(["fly(1)"])
+
+
+@pytest.mark.parametrize("filename,query,evidence,streaming,normalize",[
+    ("../examples/inference/bird_4.lp", "fly(1)", "", False, False),
+    ("../examples/inference/bird_10.lp", "fly(1)", "bird(2)", False, False),
+    ("../examples/inference/bird_10.lp", "fly(2)", "", True, False),
+    ("../examples/inference/clique.lp", "in(1)", "", False, True),
+    ("../examples/inference/transmission.lp", "qr", "", True, False)
+])
+def test_parallel_inference(
+    filename : str,
+    query : str,
+    evidence : str,
+    streaming : bool,
+    normalize : bool
+    ):
+
+    lp, up = Pasta(filename, query, evidence, normalize_prob = normalize).inference()
+    lp_p, up_p = Pasta(filename, query, evidence, normalize_prob = normalize, streaming = streaming, processes = 3).inference()
+    assert almost_equal(lp_p, lp), f"{filename}: wrong lower probability - E: {lp}, F: {lp_p}"
+    assert almost_equal(up_p, up), f"{filename}: wrong upper probability - E: {up}, F: {up_p}"
+
+
+def test_cached_worlds(tmp_path):
+    # the worlds do not depend on the probabilities of the facts,
+    # so the second program uses the cache entry of the first one
+    program = "{}::a.\n{}::b.\nqr:- a.\nqr:- b.\n"
+    cache_dir = str(tmp_path)
+    for prob_a, prob_b in [(0.4, 0.5), (0.4, 0.5), (0.2, 0.7)]:
+        lp, up = Pasta("", "qr", cache_dir = cache_dir).inference(program.format(prob_a, prob_b))
+        expected = 1 - (1 - prob_a) * (1 - prob_b)
+        assert almost_equal(lp, expected) and almost_equal(up, expected)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # a different program has a different entry
+    lp, up = Pasta("", "qr", cache_dir = cache_dir).inference(program.format(0.4, 0.5) + "c:- a, b.\n")
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+@pytest.mark.parametrize("query,evidence,logspace,pedantic",[
+    ("fly(1)", "", False, False),
+    ("fly(1)", "bird(2)", False, False),
+    ("fly(2)", "", True, False),
+    ("fly(1)", "bird(2)", True, False),
+    ("fly(1)", "", False, True)
+])
+def test_cached_worlds_loaded(tmp_path, query : str, evidence : str, logspace : bool, pedantic : bool):
+    filename = "../examples/inference/bird_10.lp"
+    expected_lp, expected_up = Pasta(filename, query, evidence).inference()
+    for _ in range(2):
+        # the second time the worlds are loaded from the cache
+        lp, up = Pasta(filename, query, evidence, logspace = logspace, pedantic = pedantic, cache_dir = str(tmp_path)).inference()
+        assert almost_equal(lp, expected_lp, 10e-8) and almost_equal(up, expected_up, 10e-8)
+
+
+def test_cached_worlds_map(tmp_path):
+    filename = "../examples/map/win_map.lp"
+    expected_prob, expected_states = Pasta(filename, "win").map_inference()
+    for _ in range(2):
+        # the second time the worlds are loaded from the cache
+        prob, states = Pasta(filename, "win", cache_dir = str(tmp_path)).map_inference()
+        assert almost_equal(prob, expected_prob) and states == expected_states
+
+
+def test_cached_worlds_compile(tmp_path):
+    program = "0.5::a.\n0.5::b.\n0.5::c.\nqr:- a.\nqr ; nqr:- b, c.\n"
+    probabilities = {"a": 0.3, "b": 0.8, "c": 0.5}
+    expected_lp, expected_up = Pasta("", "qr").compile(from_string = program).evaluate(probabilities)
+    for _ in range(2):
+        # the second time the worlds are loaded from the cache
+        lp, up = Pasta("", "qr", cache_dir = str(tmp_path)).compile(from_string = program).evaluate(probabilities)
+        assert almost_equal(lp, expected_lp) and almost_equal(up, expected_up)
+
+
+@pytest.mark.parametrize("evidence,probabilities",[
+    ("", [0.3, 0.8, 0.5]),
+    ("", [0.1, 0.1, 0.9]),
+    ("b", [0.6, 0.2, 0.4])
+])
+def test_compiled_query(evidence : str, probabilities : 'list[float]'):
+    program = "{}::a.\n{}::b.\n{}::c.\nqr:- a.\nqr ; nqr:- b, c.\n"
+    compiled = Pasta("", "qr", evidence).compile(from_string = program.format(0.5, 0.5, 0.5))
+    lp_c, up_c = compiled.evaluate(dict(zip(["a", "b", "c"], probabilities)))
+    lp, up = Pasta("", "qr", evidence).inference(program.format(*probabilities))
+    assert almost_equal(lp_c, lp), f"wrong lower probability - E: {lp}, F: {lp_c}"
+    assert almost_equal(up_c, up), f"wrong upper probability - E: {up}, F: {up_c}"
+    for (lp_m, up_m), (lp_e, up_e) in zip(compiled.evaluate_many([{}, {"a": 0.9}]), [compiled.evaluate(), compiled.evaluate({"a": 0.9})]):
+        assert almost_equal(lp_m, lp_e) and almost_equal(up_m, up_e)
+
+
+@pytest.mark.parametrize("evidence,normalize",[
+    ("", False),
+    ("b", False),
+    ("", True)
+])
+def test_sensitivity(evidence : str, normalize : bool):
+    program = "{}::a.\n{}::b.\n{}::c.\nqr:- a.\nqr ; nqr:- b, c.\n:- a, b, c.\n"
+    probabilities = [0.3, 0.6, 0.4]
+    gradient = Pasta("", "qr", evidence, normalize_prob = normalize, stop_if_inconsistent = False).sensitivity(from_string = program.format(*probabilities))
+    eps = 10e-6
+    for index, fact in enumerate(["a", "b", "c"]):
+        plus = list(probabilities)
+        minus = list(probabilities)
+        plus[index] += eps
+        minus[index] -= eps
+        lp_plus, up_plus = Pasta("", "qr", evidence, normalize_prob = normalize, stop_if_inconsistent = False).inference(program.format(*plus))
+        lp_minus, up_minus = Pasta("", "qr", evidence, normalize_prob = normalize, stop_if_inconsistent = False).inference(program.format(*minus))
+        assert abs(gradient[fact][0] - (lp_plus - lp_minus) / (2 * eps)) < 10e-6, f"{fact}: wrong derivative of the lower probability"
+        assert abs(gradient[fact][1] - (up_plus - up_minus) / (2 * eps)) < 10e-6, f"{fact}: wrong derivative of the upper probability"
+
+
+@pytest.mark.parametrize("filename,query,evidence,epsilon",[
+    ("../examples/inference/bird_10.lp", "fly(1)", "", 0.5),
+    ("../examples/inference/bird_10.lp", "fly(1)", "", 0.001),
+    ("../examples/inference/bird_10.lp", "fly(1)", "bird(2)", 0.9),
+    ("../examples/inference/transmission.lp", "qr", "", 0.1)
+])
+def test_anytime_inference(filename : str, query : str, evidence : str, epsilon : float):
+    lp, up = Pasta(filename, query, evidence).inference()
+    (lp_min, lp_max), (up_min, up_max) = Pasta(filename, query, evidence).anytime_inference(epsilon)
+    # the bounds contain the exact values
+    assert lp_min - 10e-8 <= lp <= lp_max + 10e-8, f"{filename}: {lp} not in [{lp_min}, {lp_max}]"
+    assert up_min - 10e-8 <= up <= up_max + 10e-8, f"{filename}: {up} not in [{up_min}, {up_max}]"
+    assert lp_max - lp_min < epsilon and up_max - up_min < epsilon
+
+
+def test_anytime_inference_normalize():
+    program = "\n".join(f"0.{i}::f({i})." for i in range(1, 10)) + "\n0.5::f(10).\nqr:- f(1), f(2).\nqr:- f(3), not f(4).\n:- f(5), f(6), f(7)."
+    lp, up = Pasta("", "qr", normalize_prob=True, stop_if_inconsistent=False).inference(program)
+    (lp_min, lp_max), (up_min, up_max) = Pasta("", "qr", normalize_prob=True, stop_if_inconsistent=False).anytime_inference(0.3, program)
+    assert lp_min - 10e-8 <= lp <= lp_max + 10e-8
+    assert up_min - 10e-8 <= up <= up_max + 10e-8
+    assert lp_max - lp_min < 0.3 and up_max - up_min < 0.3
+
+
+def test_anytime_inference_pedantic():
+    with pytest.raises(SystemExit):
+        Pasta("../examples/inference/bird_4.lp", "fly(1)", pedantic=True).anytime_inference(0.1)
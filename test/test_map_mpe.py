@@ -52,3 +52,24 @@ def test_map_mpe(
     if max_p > 0 and len(atoms_list) > 0:
         assert almost_equal(max_p, expected_map_mpe), test_name + f"{test_name}: wrong MAP/MPE - E: {expected_map_mpe}, F: {max_p}"
         assert check_if_lists_equal(atoms_list, expected_atoms_list), test_name + ": wrong atoms list"
+
+
+@pytest.mark.parametrize("filename, query, expected_map_mpe, expected_atoms_list, upper", [
+    ("../examples/map/gold_map.lp", "valuable(1)", 0.13999999999999999, [['gold(3)', 'gold(1)']], True),
+    ("../examples/map/win_map.lp", "win", 0.192, [['blue', 'red']], False),
+    ("../examples/map/win_mpe.lp", "win", 0.162, [['green', 'not red', 'blue', 'yellow']], False),
+    ("../examples/map/simple_map_disj.lp", "win", 0.048, [['not a', 'b']], False)
+])
+def test_map_mpe_logspace(
+    filename : str,
+    query : str,
+    expected_map_mpe: float,
+    expected_atoms_list : 'list[list[str]]',
+    upper : bool
+    ):
+
+    pasta_solver = Pasta(filename, query, consider_lower_prob=not upper, logspace=True)
+    max_p, atoms_list = pasta_solver.map_inference()
+
+    assert almost_equal(max_p, expected_map_mpe), f"{filename}: wrong MAP/MPE - E: {expected_map_mpe}, F: {max_p}"
+    assert check_if_lists_equal(atoms_list, expected_atoms_list), f"{filename}: wrong atoms list"
@@ -0,0 +1,81 @@
+import pytest
+
+import clingo
+
+from pastasolver.models_handler import ModelsHandler, World
+from pastasolver import utils
+
+from .utils_for_tests import almost_equal
+
+
+@pytest.mark.parametrize("super_w,map_id_list,n_facts,expected",[
+    (0b0101, [0,2], 4, 0b00),
+    (0b0101, [1,3], 4, 0b11),
+    (0b1100, [0,1,3], 4, 0b110),
+    (0b1, [0], 1, 0b1)
+])
+def test_get_sub_world(super_w : int, map_id_list : 'list[int]', n_facts : int, expected : int):
+    assert ModelsHandler.get_sub_world(super_w, map_id_list, n_facts) == expected
+
+
+@pytest.mark.parametrize("w_id,n_facts,expected",[
+    (5, 4, "0101"),
+    (0, 3, "000"),
+    (0, 0, ""),
+    (7, 3, "111")
+])
+def test_world_id_to_str(w_id : int, n_facts : int, expected : str):
+    assert utils.world_id_to_str(w_id, n_facts) == expected
+
+
+def test_get_id_world():
+    mh = ModelsHandler({"a": 0.2, "b": 0.4, "c": 0.5}, "")
+    symbols = [clingo.parse_term(atom) for atom in ["a", "not_b", "c", "q"]]
+    w_id, model_query, _ = mh.get_id_world(symbols, "")
+    assert w_id == 0b101
+    assert model_query
+    assert mh.get_map_word_from_id(w_id, True, []) == ["a", "not b", "c"]
+    mh.add_value(symbols)
+    mh.compute_worlds_probabilities()
+    assert almost_equal(mh.worlds_dict[w_id].prob, 0.2 * 0.6 * 0.5)
+
+
+def test_worlds_without_dict():
+    # the worlds are stored in slots
+    mh = ModelsHandler({"a": 0.2}, "")
+    mh.add_value([clingo.parse_term("a"), clingo.parse_term("q")])
+    assert not hasattr(mh.worlds_dict[1], "__dict__")
+    assert mh.worlds_dict[1].model_query_count == 1
+
+
+@pytest.mark.parametrize("queries,expected",[
+    ("fly(1)", ["fly(1)"]),
+    ("path(1,4),fly(1)", ["path(1,4)", "fly(1)"]),
+    ("a, b(f(1,2),3) ,c", ["a", "b(f(1,2),3)", "c"])
+])
+def test_split_queries(queries : str, expected : 'list[str]'):
+    assert utils.split_queries(queries) == expected
+
+
+@pytest.mark.parametrize("computed,n_facts,offset,limit,expected",[
+    ([0, 2, 3, 6], 3, 0, 10, [1, 4, 5, 7]),
+    ([0, 2, 3, 6], 3, 1, 2, [4, 5]),
+    ([1, 2], 2, 0, 1, [0]),
+    ([0, 1, 2, 3], 2, 0, 5, []),
+    ([5], 40, 2**40 - 3, 10, [2**40 - 2, 2**40 - 1])
+])
+def test_get_missing_worlds(computed : 'list[int]', n_facts : int, offset : int, limit : int, expected : 'list[int]'):
+    mh = ModelsHandler({f"a({i})": 0.5 for i in range(n_facts)}, "")
+    for w_id in computed:
+        mh.worlds_dict[w_id] = World(0)
+    assert mh.get_missing_worlds(offset, limit) == expected
+
+
+def test_streaming_repeated_world():
+    # the models of a world must be consecutive
+    mh = ModelsHandler({"a": 0.2, "b": 0.4}, "")
+    for atoms in [["a", "not_b", "q"], ["a", "not_b"], ["not_a", "b"]]:
+        mh.add_value_streaming([clingo.parse_term(atom) for atom in atoms])
+    with pytest.raises(SystemExit):
+        mh.add_value_streaming([clingo.parse_term(atom) for atom in ["a", "not_b"]])
+        mh.close_streaming()
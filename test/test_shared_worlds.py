@@ -0,0 +1,35 @@
+import pickle
+
+from pastasolver.shared_worlds import SharedWorldsCache, MAX_FACTS, attached_blocks, close_attached_blocks
+
+
+def test_shared_worlds_cache():
+    cache = SharedWorldsCache(100)
+    worlds = ["T" * MAX_FACTS, "T" + "F" * (MAX_FACTS - 1)] + [format(i, "010b").replace("1", "T").replace("0", "F") for i in range(500)]
+    for i, w_id in enumerate(worlds):
+        assert cache.get(w_id) is None
+        cache.put(w_id, i % 16)
+    # attached to the same shared memory, as in the processes
+    other = pickle.loads(pickle.dumps(cache))
+    for i, w_id in enumerate(worlds):
+        assert other.get(w_id) == i % 16
+    assert other.get("T" * 10) is None
+    assert (other.lookups, other.hits) == (len(worlds) + 1, len(worlds))
+    other.close()
+    cache.close()
+
+
+def test_shared_worlds_cache_attached_once():
+    cache = SharedWorldsCache(100)
+    cache.put("TFT", 3)
+    # every task unpickles the cache: the process attaches only once
+    first = pickle.loads(pickle.dumps(cache))
+    second = pickle.loads(pickle.dumps(cache))
+    assert first.shm is second.shm
+    assert cache.shm.name in attached_blocks
+    assert second.get("TFT") == 3
+    first.close()
+    second.close()
+    close_attached_blocks()
+    assert len(attached_blocks) == 0
+    cache.close()
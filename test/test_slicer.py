@@ -0,0 +1,93 @@
+import pytest
+
+from pastasolver.pasta_solver import Pasta
+from pastasolver.pasta_parser import PastaParser
+from pastasolver.slicer import get_irrelevant_facts
+
+from .utils_for_tests import almost_equal
+
+program = '''
+0.3::a.
+0.4::b.
+0.5::c.
+0.6::d.
+0.7::g.
+0.2::f.
+h:- a, b.
+h:- not c.
+x:- d, not g.
+{y}:- x.
+z:- f.
+w:- z, h.
+'''
+
+
+@pytest.mark.parametrize("query,evidence,expected",[
+    ("h", "", ["d", "g"]),
+    ("h", "z", ["d", "g"]),
+    ("x", "", ["a", "b", "c", "f"]),
+    ("y", "w", [])
+])
+def test_get_irrelevant_facts(query : str, evidence : str, expected : 'list[str]'):
+    parser = PastaParser("", query, evidence)
+    parser.parse(program)
+    assert get_irrelevant_facts(parser.get_asp_program(), parser.probabilistic_facts) == expected
+
+
+@pytest.mark.parametrize("rule",[":- z, h.", "v:- z, not h."])
+def test_get_irrelevant_facts_unsafe(rule : str):
+    # the other component is not guaranteed to have an answer set
+    parser = PastaParser("", "x")
+    parser.parse(program + rule)
+    assert get_irrelevant_facts(parser.get_asp_program(), parser.probabilistic_facts) == []
+
+
+@pytest.mark.parametrize("filename,query,evidence",[
+    ("", "h", ""),
+    ("", "h", "z"),
+    ("", "y", ""),
+    ("", "x", ""),
+    ("../examples/inference/bird_4.lp", "fly(1)", ""),
+    ("../examples/inference/path.lp", "path(1,4)", "")
+])
+def test_sliced_inference(filename : str, query : str, evidence : str):
+    from_string = "" if filename else program
+    lp, up = Pasta(filename, query, evidence).inference(from_string)
+    lp_s, up_s = Pasta(filename, query, evidence, slicing=True).inference(from_string)
+    assert almost_equal(lp_s, lp), f"{query}: wrong lower probability - E: {lp}, F: {lp_s}"
+    assert almost_equal(up_s, up), f"{query}: wrong upper probability - E: {up}, F: {up_s}"
+
+
+@pytest.mark.parametrize("query,evidence,normalize",[
+    ("h", "", False),
+    ("h", "", True),
+    ("h", "a", False),
+    ("x", "", False)
+])
+def test_decomposed_inference(query : str, evidence : str, normalize : bool):
+    # the component of d, g and f has no answer set for some worlds
+    from_string = program.replace("w:- z, h.", ":- z, not d.")
+    lp, up = Pasta("", query, evidence, normalize_prob=normalize, stop_if_inconsistent=False).inference(from_string)
+    pasta_solver = Pasta("", query, evidence, normalize_prob=normalize, stop_if_inconsistent=False, slicing=True)
+    lp_s, up_s = pasta_solver.inference(from_string)
+    assert len(pasta_solver.interface.prob_facts_dict) == 3
+    assert almost_equal(lp_s, lp), f"{query}: wrong lower probability - E: {lp}, F: {lp_s}"
+    assert almost_equal(up_s, up), f"{query}: wrong upper probability - E: {up}, F: {up_s}"
+
+
+def test_sliced_consistent_prob():
+    # both the component of the query and the one of d, g and f
+    # have no answer set for some worlds
+    from_string = program.replace("w:- z, h.", ":- z, not d.\n:- a, c.")
+    pasta_solver = Pasta("", "h", stop_if_inconsistent=False)
+    pasta_solver.inference(from_string)
+    assert almost_equal(pasta_solver.interface.consistent_prob, 0.85 * 0.92)
+    pasta_solver = Pasta("", "h", stop_if_inconsistent=False, slicing=True)
+    pasta_solver.inference(from_string)
+    assert almost_equal(pasta_solver.interface.consistent_prob, 0.85)
+    assert almost_equal(pasta_solver.consistency_factor, 0.92)
+
+
+def test_sliced_minimal():
+    with pytest.raises(SystemExit):
+        Pasta("", "h", minimal=True, stop_if_inconsistent=False, slicing=True).inference(program)
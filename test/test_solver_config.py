@@ -0,0 +1,45 @@
+import pytest
+
+from pastasolver.pasta_solver import Pasta
+from pastasolver.solver_config import SolverConfig, merge_arguments, ENUMERATION_TASK, OPTIMIZATION_TASK
+
+from .utils_for_tests import almost_equal
+
+
+@pytest.mark.parametrize("arguments,new_arguments,expected",[
+    (["0", "--project"], ["--configuration=tweety"], ["0", "--project", "--configuration=tweety"]),
+    (["0", "--configuration=tweety"], ["--configuration=crafty"], ["0", "--configuration=crafty"]),
+    (["-Wnone", "--opt-mode=opt"], ["--opt-strategy=usc", "--opt-mode=optN"], ["-Wnone", "--opt-strategy=usc", "--opt-mode=optN"])
+])
+def test_merge_arguments(arguments : 'list[str]', new_arguments : 'list[str]', expected : 'list[str]'):
+    assert merge_arguments(arguments, new_arguments) == expected
+
+
+def test_get_arguments():
+    config = SolverConfig(threads=4, configuration="crafty", extra_arguments=["--restarts=L,100"])
+    arguments = config.get_arguments(ENUMERATION_TASK, ["0", "--project"])
+    assert arguments == ["0", "--project", "--configuration=crafty", "--parallel-mode=4", "--restarts=L,100"]
+    # a single thread when the models must be enumerated in order
+    assert "--parallel-mode=4" not in config.get_arguments(OPTIMIZATION_TASK, ["0"], sequential=True)
+    # without options, the settings of the task are used
+    assert SolverConfig().get_arguments(ENUMERATION_TASK, ["0", "--project"]) == ["0", "--project", "--configuration=tweety"]
+    assert SolverConfig().get_arguments(OPTIMIZATION_TASK, ["0"]) == ["0", "--opt-strategy=usc"]
+
+
+def test_cache_key_without_autotune():
+    pasta_solver = Pasta("../examples/inference/bird_4.lp", "fly(1)", autotune=True)
+    pasta_solver.setup_interface()
+    pasta_solver.interface.get_cache_key()
+    assert pasta_solver.interface.solver_config.tuned == {}
+
+
+@pytest.mark.parametrize("filename,query,threads,configuration,autotune",[
+    ("../examples/inference/bird_10.lp", "fly(1)", 2, "", False),
+    ("../examples/inference/bird_10.lp", "fly(1)", 1, "frumpy", False),
+    ("../examples/inference/transmission.lp", "qr", 1, "", True)
+])
+def test_inference_solver_config(filename : str, query : str, threads : int, configuration : str, autotune : bool):
+    lp, up = Pasta(filename, query).inference()
+    lp_c, up_c = Pasta(filename, query, threads=threads, solver_configuration=configuration, autotune=autotune).inference()
+    assert almost_equal(lp_c, lp), f"{filename}: wrong lower probability - E: {lp}, F: {lp_c}"
+    assert almost_equal(up_c, up), f"{filename}: wrong upper probability - E: {up}, F: {up_c}"
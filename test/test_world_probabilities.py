@@ -0,0 +1,61 @@
+import pytest
+
+import numpy as np
+
+from pastasolver import world_probabilities
+
+
+@pytest.mark.parametrize("ids,n_facts",[
+    ([0b101, 0b000, 0b111], 3),
+    ([0, 1, 2, 3], 2),
+    ([(1 << 69) | 5, 1 << 63, 0], 70)
+])
+def test_ids_to_matrix(ids : 'list[int]', n_facts : int):
+    matrix = world_probabilities.ids_to_matrix(ids, n_facts)
+    assert matrix.shape == (len(ids), n_facts)
+    for row, w_id in zip(matrix, ids):
+        assert "".join("1" if v else "0" for v in row) == format(w_id, f"0{n_facts}b")
+
+
+@pytest.mark.parametrize("ids,probabilities",[
+    ([0b101, 0b010, 0b111, 0b000], [0.2, 0.4, 0.5]),
+    ([0b11, 0b10, 0b01, 0b00], [1, 0.3]),
+    ([0b1, 0b0], [0])
+])
+def test_ids_probabilities(ids : 'list[int]', probabilities : 'list[float]'):
+    # compare with the product over the facts
+    n_facts = len(probabilities)
+    computed = world_probabilities.ids_probabilities(ids, probabilities)
+    for w_id, prob in zip(ids, computed):
+        expected = 1
+        for index, p in enumerate(probabilities):
+            expected *= p if (w_id >> (n_facts - 1 - index)) & 1 else 1 - p
+        assert abs(prob - expected) < 10e-12
+    assert not np.isnan(computed).any()
+
+
+@pytest.mark.parametrize("probabilities",[
+    [0.2, 0.3, 0.9, 0.6],
+    [0.5, 0.1, 0.7, 0.4]
+])
+def test_sums_gradient(probabilities : 'list[float]'):
+    # compare with the central finite differences
+    ids = list(range(16))
+    matrix = world_probabilities.ids_to_matrix(ids, 4)
+    weights = np.array([[1 if bin(w_id).count('1') % 2 else 0 for w_id in ids], [1] * 16], dtype=float)
+    gradient = world_probabilities.sums_gradient(matrix, probabilities, weights)
+    eps = 10e-6
+    for index in range(4):
+        plus = list(probabilities)
+        minus = list(probabilities)
+        plus[index] += eps
+        minus[index] -= eps
+        expected = (weights @ world_probabilities.ids_probabilities(ids, plus) - weights @ world_probabilities.ids_probabilities(ids, minus)) / (2 * eps)
+        assert np.allclose(gradient[:, index], expected, atol=10e-8)
+
+
+def test_sums_gradient_certain_facts():
+    # P(w) = p_0 * (1 - p_1) for the world 10, for every p_0 and p_1
+    matrix = world_probabilities.ids_to_matrix([0b10], 2)
+    gradient = world_probabilities.sums_gradient(matrix, [1, 0], np.array([[1.0]]))
+    assert gradient.tolist() == [[1.0, -1.0]]